@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import (
+    ContadorNotificacoes,
     EnvioOnboarding,
     NotificacaoInterna,
     PerfilEmpresarial,
@@ -41,3 +42,10 @@ class EnvioOnboardingAdmin(admin.ModelAdmin):
     list_display = ("aluno", "canal", "destinatario", "status", "criado_em")
     search_fields = ("aluno__nome", "aluno__email", "destinatario")
     list_filter = ("canal", "status")
+
+
+@admin.register(ContadorNotificacoes)
+class ContadorNotificacoesAdmin(admin.ModelAdmin):
+    list_display = ("usuario", "notificacoes_nao_lidas", "submissoes_pendentes", "propostas_pendentes", "atualizado_em")
+    search_fields = ("usuario__nome", "usuario__email")
+    readonly_fields = ("usuario", "notificacoes_nao_lidas", "submissoes_pendentes", "propostas_pendentes", "atualizado_em")
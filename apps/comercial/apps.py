@@ -5,3 +5,5 @@ class ComercialConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.comercial"
 
+    def ready(self):
+        import apps.comercial.signals
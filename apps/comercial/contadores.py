@@ -0,0 +1,171 @@
+"""
+Contadores do badge de notificações (ContadorNotificacoes).
+
+Os signals de NotificacaoInterna, Submissao e PropostaFinanceira somam ou subtraem
+1 no contador de quem vê o item, depois do commit e com UPDATE ... SET x = x + n.
+Mudanças estruturais (role, monitor do aluno) recalculam os usuários envolvidos, e
+o comando reconciliar_contadores_notificacoes recalcula tudo em lotes.
+
+Quem conta o quê (mesmas regras das listas em comercial.services):
+- notificações não lidas: o destinatário;
+- submissões pendentes: o monitor responsável do aluno e todos os ADMIN;
+- propostas pendentes: os ADM Master.
+"""
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.trilha.models import Submissao
+from apps.usuarios.models import RoleChoices, Usuario
+
+from .eventos import broker
+from .models import ContadorNotificacoes, NotificacaoInterna, PropostaFinanceira, StatusPropostaFinanceira
+
+CAMPOS_CONTADOR = ["notificacoes_nao_lidas", "submissoes_pendentes", "propostas_pendentes"]
+
+
+def _contagem(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(agrupador=Value(1)).annotate(total=Count("pk")).values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def calcular_contadores(usuarios):
+    """Anota em um queryset de Usuario os três contadores, calculados do zero numa query."""
+    submissoes_pendentes = Submissao.objects.filter(aprovado__isnull=True)
+    return usuarios.annotate(
+        notificacoes_nao_lidas=_contagem(NotificacaoInterna.objects.filter(destinatario=OuterRef("pk"), lida=False)),
+        submissoes_pendentes=Case(
+            When(role=RoleChoices.ADMIN, then=_contagem(submissoes_pendentes)),
+            When(
+                role=RoleChoices.MONITOR,
+                then=_contagem(submissoes_pendentes.filter(progresso__aluno__monitor_responsavel=OuterRef("pk"))),
+            ),
+            default=Value(0),
+        ),
+        propostas_pendentes=Case(
+            When(
+                role=RoleChoices.ADMIN,
+                pode_aprovar_financeiro=True,
+                then=_contagem(PropostaFinanceira.objects.filter(status=StatusPropostaFinanceira.PENDENTE)),
+            ),
+            default=Value(0),
+        ),
+    )
+
+
+def recalcular_contadores(usuario_ids=None, batch_size=500):
+    """
+    Recalcula (upsert) os contadores dos usuários informados, ou de todos.
+    Retorna (recalculados, corrigidos), onde corrigidos são os que estavam diferentes.
+    """
+    usuarios = Usuario.objects.order_by("id")
+    if usuario_ids is not None:
+        usuarios = usuarios.filter(id__in=list(usuario_ids))
+    ids = list(usuarios.values_list("id", flat=True))
+
+    recalculados = corrigidos = 0
+    for inicio in range(0, len(ids), batch_size):
+        lote = ids[inicio:inicio + batch_size]
+        atuais = {
+            contador["usuario_id"]: contador
+            for contador in ContadorNotificacoes.objects.filter(usuario_id__in=lote).values("usuario_id", *CAMPOS_CONTADOR)
+        }
+        contadores = []
+        for usuario in calcular_contadores(Usuario.objects.filter(id__in=lote)).only("id"):
+            valores = {campo: getattr(usuario, campo) for campo in CAMPOS_CONTADOR}
+            atual = atuais.get(usuario.id)
+            if atual is None or any(atual[campo] != valor for campo, valor in valores.items()):
+                corrigidos += 1
+            contadores.append(ContadorNotificacoes(usuario_id=usuario.id, **valores))
+
+        ContadorNotificacoes.objects.bulk_create(
+            contadores,
+            update_conflicts=True,
+            unique_fields=["usuario"],
+            update_fields=CAMPOS_CONTADOR + ["atualizado_em"],
+        )
+        recalculados += len(contadores)
+    return recalculados, corrigidos
+
+
+def contador_do_usuario(usuario):
+    """Contador do usuário; na primeira consulta ele é calculado e gravado."""
+    contador = ContadorNotificacoes.objects.filter(usuario_id=usuario.id).first()
+    if contador is None:
+        recalcular_contadores([usuario.id])
+        contador = ContadorNotificacoes.objects.get(usuario_id=usuario.id)
+    return contador
+
+
+def _aplicar_no_commit(campo, deltas, filtro_papel=None, delta_papel=0):
+    """
+    Depois do commit soma deltas[usuario_id] no campo de cada usuário e `delta_papel`
+    em todos os usuários que casam com `filtro_papel`; em seguida avisa os streams.
+    """
+    deltas = {usuario_id: delta for usuario_id, delta in deltas.items() if usuario_id and delta}
+    if not deltas and not delta_papel:
+        return
+
+    def _aplicar():
+        avisados = set(deltas)
+        por_delta = {}
+        for usuario_id, delta in deltas.items():
+            por_delta.setdefault(delta, []).append(usuario_id)
+        for delta, usuario_ids in por_delta.items():
+            ContadorNotificacoes.objects.filter(usuario_id__in=usuario_ids).update(
+                **{campo: F(campo) + delta}, atualizado_em=timezone.now()
+            )
+        if delta_papel:
+            papel = list(Usuario.objects.filter(filtro_papel).values_list("id", flat=True))
+            ContadorNotificacoes.objects.filter(usuario_id__in=papel).update(
+                **{campo: F(campo) + delta_papel}, atualizado_em=timezone.now()
+            )
+            avisados.update(papel)
+        broker().publicar(avisados)
+
+    transaction.on_commit(_aplicar)
+
+
+def variar_notificacoes_nao_lidas(deltas):
+    """deltas: {destinatario_id: n}."""
+    _aplicar_no_commit("notificacoes_nao_lidas", deltas)
+
+
+def variar_submissoes_pendentes(deltas_por_monitor):
+    """deltas_por_monitor: {monitor_id ou None: n}; os ADMIN recebem a soma."""
+    _aplicar_no_commit(
+        "submissoes_pendentes",
+        deltas_por_monitor,
+        filtro_papel=Q(role=RoleChoices.ADMIN),
+        delta_papel=sum(deltas_por_monitor.values()),
+    )
+
+
+def variar_propostas_pendentes(delta):
+    _aplicar_no_commit(
+        "propostas_pendentes",
+        {},
+        filtro_papel=Q(role=RoleChoices.ADMIN, pode_aprovar_financeiro=True),
+        delta_papel=delta,
+    )
+
+
+def recalcular_no_commit(usuario_ids):
+    """Para mudanças estruturais (role, monitor do aluno): recalcula os envolvidos do zero."""
+    usuario_ids = {usuario_id for usuario_id in usuario_ids if usuario_id}
+    if not usuario_ids:
+        return
+
+    def _recalcular():
+        recalcular_contadores(usuario_ids)
+        broker().publicar(usuario_ids)
+
+    transaction.on_commit(_recalcular)
@@ -0,0 +1,86 @@
+"""
+Broker dos eventos de notificação que alimentam o stream SSE do badge do Monitor.
+
+Cada usuário tem um número de versão que sobe quando seu ContadorNotificacoes
+muda (ver comercial.contadores). O stream só relê o total quando a versão muda.
+
+NOTIFICACOES_BROKER = "banco" (padrão fora do DEBUG) guarda as versões em
+SinalNotificacoes e cada stream consulta a própria linha a cada INTERVALO_BANCO
+segundos, devolvendo a conexão entre uma consulta e outra; funciona com vários
+workers e várias instâncias. "memoria" (padrão no DEBUG) guarda as versões no
+processo e acorda os streams na hora, mas só enxerga o que foi publicado no
+mesmo processo: serve para o runserver ou um único worker.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from .models import SinalNotificacoes
+
+# Uma consulta por chave primária a cada heartbeat do stream (views.INTERVALO_HEARTBEAT)
+INTERVALO_BANCO = 25
+
+
+class BrokerMemoria:
+    def __init__(self):
+        self._condicao = threading.Condition()
+        self._versoes = {}
+
+    def versao(self, usuario_id):
+        with self._condicao:
+            return self._versoes.get(usuario_id, 0)
+
+    def publicar(self, usuario_ids):
+        with self._condicao:
+            for usuario_id in usuario_ids:
+                self._versoes[usuario_id] = self._versoes.get(usuario_id, 0) + 1
+            self._condicao.notify_all()
+
+    def aguardar(self, usuario_id, versao, timeout):
+        """Bloqueia até a versão do usuário mudar ou o timeout passar; devolve a versão atual."""
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._versoes.get(usuario_id, 0) != versao, timeout)
+            return self._versoes.get(usuario_id, 0)
+
+
+class BrokerBanco:
+    def versao(self, usuario_id):
+        return SinalNotificacoes.objects.filter(usuario_id=usuario_id).values_list("versao", flat=True).first() or 0
+
+    def publicar(self, usuario_ids):
+        usuario_ids = set(usuario_ids)
+        existentes = set(
+            SinalNotificacoes.objects.filter(usuario_id__in=usuario_ids).values_list("usuario_id", flat=True)
+        )
+        SinalNotificacoes.objects.filter(usuario_id__in=existentes).update(versao=F("versao") + 1)
+        SinalNotificacoes.objects.bulk_create(
+            [SinalNotificacoes(usuario_id=usuario_id, versao=1) for usuario_id in usuario_ids - existentes],
+            ignore_conflicts=True,
+        )
+
+    def aguardar(self, usuario_id, versao, timeout):
+        fim = time.monotonic() + timeout
+        while True:
+            atual = self.versao(usuario_id)
+            if not connection.in_atomic_block:
+                # O stream não segura uma conexão do banco enquanto dorme
+                connection.close()
+            restante = fim - time.monotonic()
+            if atual != versao or restante <= 0:
+                return atual
+            time.sleep(min(INTERVALO_BANCO, restante))
+            if time.monotonic() >= fim:
+                # Quem chamou volta a aguardar e a primeira coisa que faz é consultar
+                return versao
+
+
+_brokers = {"memoria": BrokerMemoria(), "banco": BrokerBanco()}
+
+
+def broker():
+    return _brokers[getattr(settings, "NOTIFICACOES_BROKER", "banco")]
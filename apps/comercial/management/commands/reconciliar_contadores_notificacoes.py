@@ -0,0 +1,57 @@
+"""
+Management command para recalcular os contadores do badge de notificações
+(ContadorNotificacoes) a partir das tabelas. Os signals mantêm os contadores no
+dia a dia; rode este comando após o deploy da tabela, depois de cargas feitas
+fora do ORM ou periodicamente para corrigir desvios.
+
+Uso:
+    python manage.py reconciliar_contadores_notificacoes
+    python manage.py reconciliar_contadores_notificacoes --usuarios 3 7
+    python manage.py reconciliar_contadores_notificacoes --batch-size 1000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.comercial.contadores import recalcular_contadores
+from apps.comercial.eventos import broker
+from apps.usuarios.models import RoleChoices, Usuario
+
+
+class Command(BaseCommand):
+    help = "Recalcula os contadores do badge de notificações de monitores, admins e comercial"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--usuarios",
+            nargs="+",
+            type=int,
+            help="IDs dos usuários a recalcular (padrão: todos fora os alunos sem contador)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Quantidade de usuários recalculados por query (padrão: 500)",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options["usuarios"]:
+            usuario_ids = options["usuarios"]
+        else:
+            usuario_ids = list(
+                Usuario.objects.filter(~Q(role=RoleChoices.ALUNO) | Q(contador_notificacoes__isnull=False))
+                .values_list("id", flat=True)
+            )
+
+        self.stdout.write(self.style.NOTICE(f"Recalculando contadores de {len(usuario_ids)} usuários..."))
+        recalculados, corrigidos = recalcular_contadores(usuario_ids, batch_size=options["batch_size"])
+        broker().publicar(usuario_ids)
+
+        duracao = time.monotonic() - inicio
+        estilo = self.style.WARNING if corrigidos else self.style.SUCCESS
+        self.stdout.write(
+            estilo(f"{recalculados} contadores recalculados, {corrigidos} estavam divergentes ({duracao:.2f}s)")
+        )
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comercial', '0001_initial'),
+        ('usuarios', '0004_usuario_foto_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SinalNotificacoes',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sinal_notificacoes', serialize=False, to='usuarios.usuario')),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sinal de notificacoes',
+                'verbose_name_plural': 'Sinais de notificacoes',
+            },
+        ),
+    ]
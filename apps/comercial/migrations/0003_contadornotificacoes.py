@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comercial', '0002_sinalnotificacoes'),
+        ('usuarios', '0004_usuario_foto_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificacoes',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificacoes', serialize=False, to='usuarios.usuario')),
+                ('notificacoes_nao_lidas', models.IntegerField(default=0)),
+                ('submissoes_pendentes', models.IntegerField(default=0)),
+                ('propostas_pendentes', models.IntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de notificacoes',
+                'verbose_name_plural': 'Contadores de notificacoes',
+            },
+        ),
+    ]
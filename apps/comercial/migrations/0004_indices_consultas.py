@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comercial', '0003_contadornotificacoes'),
+        ('usuarios', '0005_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacaointerna',
+            index=models.Index(fields=['destinatario', 'lida', '-criada_em'], name='notificacao_dest_lida_idx'),
+        ),
+        migrations.AlterField(
+            model_name='notificacaointerna',
+            name='destinatario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes_recebidas', to='usuarios.usuario'),
+        ),
+    ]
@@ -97,6 +97,7 @@ class NotificacaoInterna(models.Model):
         "usuarios.Usuario",
         on_delete=models.CASCADE,
         related_name="notificacoes_recebidas",
+        db_index=False,  # coberto por notificacao_dest_lida_idx
     )
     tipo = models.CharField(max_length=30, choices=TipoNotificacao.choices, default=TipoNotificacao.SISTEMA)
     titulo = models.CharField(max_length=255)
@@ -118,6 +119,10 @@ class NotificacaoInterna(models.Model):
         ordering = ["lida", "-criada_em"]
         verbose_name = "Notificacao interna"
         verbose_name_plural = "Notificacoes internas"
+        indexes = [
+            # Lista do destinatário (não lidas primeiro) e contagem de não lidas
+            models.Index(fields=["destinatario", "lida", "-criada_em"], name="notificacao_dest_lida_idx"),
+        ]
 
     def marcar_como_lida(self):
         if not self.lida:
@@ -206,3 +211,45 @@ class EnvioOnboarding(models.Model):
         ordering = ["-criado_em"]
         verbose_name = "Envio de onboarding"
         verbose_name_plural = "Envios de onboarding"
+
+
+class SinalNotificacoes(models.Model):
+    """
+    Versão das notificações de cada usuário, incrementada a cada mudança que afeta o badge.
+    Usada pelo stream SSE quando há mais de uma instância (ver comercial.eventos).
+    """
+
+    usuario = models.OneToOneField(
+        "usuarios.Usuario",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="sinal_notificacoes",
+    )
+    versao = models.PositiveBigIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sinal de notificacoes"
+        verbose_name_plural = "Sinais de notificacoes"
+
+
+class ContadorNotificacoes(models.Model):
+    """
+    Totais do badge de notificações de cada usuário, mantidos por signals a cada
+    mudança (ver comercial.contadores) e conferidos pelo reconciliar_contadores_notificacoes.
+    """
+
+    usuario = models.OneToOneField(
+        "usuarios.Usuario",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="contador_notificacoes",
+    )
+    notificacoes_nao_lidas = models.IntegerField(default=0)
+    submissoes_pendentes = models.IntegerField(default=0)
+    propostas_pendentes = models.IntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contador de notificacoes"
+        verbose_name_plural = "Contadores de notificacoes"
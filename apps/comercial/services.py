@@ -17,6 +17,7 @@ from apps.financeiro.models import Contrato, ContratoStatus, OrigemParcela, Parc
 from apps.trilha.models import Submissao
 from apps.usuarios.models import RoleChoices, Usuario
 
+from .contadores import contador_do_usuario
 from .models import (
     CanalOnboarding,
     DificuldadeDiagnostico,
@@ -525,11 +526,13 @@ def propostas_pendentes_para_usuario(usuario: Usuario):
 
 
 def total_notificacoes(usuario: Usuario) -> int:
-    total = notificacoes_internas(usuario).filter(lida=False).count()
+    """Total do badge, lido do ContadorNotificacoes do usuário (uma busca por chave primária)."""
+    contador = contador_do_usuario(usuario)
+    total = contador.notificacoes_nao_lidas
     if usuario.pode_validar:
-        total += submissoes_pendentes_para_usuario(usuario).count()
+        total += contador.submissoes_pendentes
     if usuario.is_admin_master:
-        total += propostas_pendentes_para_usuario(usuario).count()
+        total += contador.propostas_pendentes
     return total
 
 
@@ -0,0 +1,126 @@
+"""
+Signals do app Comercial - mantêm os ContadorNotificacoes (badge de notificações)
+e, por tabela, avisam o stream SSE quando muda algo que entra em total_notificacoes.
+
+O estado anterior de cada objeto é lido no pre_save; o post_save/post_delete
+calcula a diferença (+1/-1) e agenda o UPDATE para depois do commit.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.trilha.models import ProgressoAluno, Submissao
+from apps.usuarios.models import Usuario
+
+from .contadores import (
+    recalcular_no_commit,
+    variar_notificacoes_nao_lidas,
+    variar_propostas_pendentes,
+    variar_submissoes_pendentes,
+)
+from .models import NotificacaoInterna, PropostaFinanceira, StatusPropostaFinanceira
+
+
+def _guardar_estado_anterior(instance, *campos):
+    if instance._state.adding or instance.pk is None:
+        instance._estado_anterior = None
+    else:
+        instance._estado_anterior = type(instance).objects.filter(pk=instance.pk).values(*campos).first()
+
+
+def _estado_anterior(instance, created):
+    return None if created else getattr(instance, "_estado_anterior", None)
+
+
+# Notificações internas: conta para o destinatário enquanto não lida
+
+@receiver(pre_save, sender=NotificacaoInterna)
+def guardar_estado_notificacao(sender, instance, **kwargs):
+    _guardar_estado_anterior(instance, "destinatario_id", "lida")
+
+
+@receiver(post_save, sender=NotificacaoInterna)
+def contar_notificacao(sender, instance, created, **kwargs):
+    deltas = {}
+    anterior = _estado_anterior(instance, created)
+    if anterior and not anterior["lida"]:
+        deltas[anterior["destinatario_id"]] = -1
+    if not instance.lida:
+        deltas[instance.destinatario_id] = deltas.get(instance.destinatario_id, 0) + 1
+    variar_notificacoes_nao_lidas(deltas)
+
+
+@receiver(post_delete, sender=NotificacaoInterna)
+def descontar_notificacao(sender, instance, **kwargs):
+    if not instance.lida:
+        variar_notificacoes_nao_lidas({instance.destinatario_id: -1})
+
+
+# Submissões: contam para o monitor do aluno (e para os ADMIN) enquanto pendentes
+
+def _monitor_da_submissao(instance):
+    return ProgressoAluno.objects.filter(id=instance.progresso_id).values_list(
+        "aluno__monitor_responsavel_id", flat=True
+    ).first()
+
+
+@receiver(pre_save, sender=Submissao)
+def guardar_estado_submissao(sender, instance, **kwargs):
+    _guardar_estado_anterior(instance, "aprovado")
+
+
+@receiver(post_save, sender=Submissao)
+def contar_submissao(sender, instance, created, **kwargs):
+    anterior = _estado_anterior(instance, created)
+    estava_pendente = anterior is not None and anterior["aprovado"] is None
+    delta = (instance.aprovado is None) - estava_pendente
+    if delta:
+        variar_submissoes_pendentes({_monitor_da_submissao(instance): delta})
+
+
+@receiver(post_delete, sender=Submissao)
+def descontar_submissao(sender, instance, **kwargs):
+    # Na exclusão de um aluno o progresso ainda existe aqui: o collector apaga as submissões antes
+    if instance.aprovado is None:
+        variar_submissoes_pendentes({_monitor_da_submissao(instance): -1})
+
+
+# Propostas financeiras: contam para os ADM Master enquanto pendentes
+
+@receiver(pre_save, sender=PropostaFinanceira)
+def guardar_estado_proposta(sender, instance, **kwargs):
+    _guardar_estado_anterior(instance, "status")
+
+
+@receiver(post_save, sender=PropostaFinanceira)
+def contar_proposta(sender, instance, created, **kwargs):
+    anterior = _estado_anterior(instance, created)
+    estava_pendente = anterior is not None and anterior["status"] == StatusPropostaFinanceira.PENDENTE
+    delta = (instance.status == StatusPropostaFinanceira.PENDENTE) - estava_pendente
+    if delta:
+        variar_propostas_pendentes(delta)
+
+
+@receiver(post_delete, sender=PropostaFinanceira)
+def descontar_proposta(sender, instance, **kwargs):
+    if instance.status == StatusPropostaFinanceira.PENDENTE:
+        variar_propostas_pendentes(-1)
+
+
+# Usuários: troca de role, de ADM Master ou de monitor do aluno muda o que cada um conta
+
+@receiver(pre_save, sender=Usuario)
+def guardar_estado_usuario(sender, instance, **kwargs):
+    _guardar_estado_anterior(instance, "role", "pode_aprovar_financeiro", "monitor_responsavel_id")
+
+
+@receiver(post_save, sender=Usuario)
+def recalcular_contadores_do_usuario(sender, instance, created, **kwargs):
+    anterior = _estado_anterior(instance, created)
+    if anterior is None:
+        return
+    envolvidos = set()
+    if anterior["role"] != instance.role or anterior["pode_aprovar_financeiro"] != instance.pode_aprovar_financeiro:
+        envolvidos.add(instance.id)
+    if anterior["monitor_responsavel_id"] != instance.monitor_responsavel_id:
+        envolvidos.update([anterior["monitor_responsavel_id"], instance.monitor_responsavel_id])
+    recalcular_no_commit(envolvidos)
@@ -1,14 +1,37 @@
+import threading
 from datetime import timedelta
 from decimal import Decimal
 
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from apps.core.consultas import atualizar_estatisticas, planos_das_queries
 from apps.financeiro.models import Contrato, ContratoStatus, OrigemParcela, Parcela, TipoParcela
+from apps.trilha.models import Mundo, ProgressoAluno, StatusProgresso, Step, Submissao
 from apps.usuarios.models import RoleChoices, Usuario
 
-from .models import EnvioOnboarding, NotificacaoInterna, PerfilEmpresarial, PropostaFinanceira, StatusPropostaFinanceira
+from apps.trilha.services import validar_submissoes_em_lote
+
+from . import eventos
+from .contadores import CAMPOS_CONTADOR, calcular_contadores, recalcular_contadores
+from .models import (
+    ContadorNotificacoes,
+    EnvioOnboarding,
+    NotificacaoInterna,
+    PerfilEmpresarial,
+    PropostaFinanceira,
+    SinalNotificacoes,
+    StatusPropostaFinanceira,
+)
+from .services import notificacoes_internas, resumo_cadastros, total_notificacoes
+from .views import _eventos_total_notificacoes
 
 
 class ComercialFlowTests(TestCase):
@@ -273,3 +296,323 @@ class ComercialFlowTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Nao e possivel reescrever o parcelamento")
         self.assertEqual(contrato.parcelas.filter(ativa=True).count(), 2)
+
+
+class StreamNotificacoesTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create(email="admin@mindhub.com", senha="123", role=RoleChoices.ADMIN)
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.outro_monitor = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com", senha="123", role=RoleChoices.ALUNO, monitor_responsavel=self.monitor
+        )
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+
+    def versoes(self, *usuarios):
+        return [eventos.broker().versao(usuario.id) for usuario in usuarios]
+
+    def criar_submissao(self):
+        mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mes 1")
+        step = Step.objects.create(mundo=mundo, ordem=1, titulo="Step", instrucoes="-")
+        progresso = ProgressoAluno.objects.create(aluno=self.aluno, step=step, status=StatusProgresso.PENDENTE_VALIDACAO)
+        return Submissao.objects.create(progresso=progresso, resposta_texto="ok")
+
+    def test_stream_envia_total_na_conexao(self):
+        NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+
+        response = self.client.get(reverse("comercial:api_stream_notificacoes"), **{"wsgi.multithread": True})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        conteudo = iter(response.streaming_content)
+        self.assertEqual(next(conteudo), b"retry: 5000\n\n")
+        self.assertEqual(next(conteudo), b'event: total\ndata: {"total": 1}\n\n')
+        response.close()
+
+    def test_servidor_sem_threads_recebe_o_total_e_reconecta_depois(self):
+        # Worker sync: o stream não pode segurar o processo
+        NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+
+        response = self.client.get(reverse("comercial:api_stream_notificacoes"), **{"wsgi.multithread": False})
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            b'retry: 30000\n\nevent: total\ndata: {"total": 1}\n\n',
+        )
+
+    def test_stream_reenvia_total_so_quando_muda(self):
+        stream = _eventos_total_notificacoes(self.monitor)
+        next(stream)
+        self.assertIn('"total": 0', next(stream))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submissao = self.criar_submissao()
+        self.assertIn('"total": 1', next(stream))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+        self.assertIn('"total": 2', next(stream))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submissao.aprovar(self.admin)
+        self.assertIn('"total": 1', next(stream))
+        stream.close()
+
+    def test_submissao_avisa_so_o_monitor_do_aluno_e_admins(self):
+        antes = self.versoes(self.admin, self.monitor, self.outro_monitor)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.criar_submissao()
+        depois = self.versoes(self.admin, self.monitor, self.outro_monitor)
+
+        self.assertGreater(depois[0], antes[0])
+        self.assertGreater(depois[1], antes[1])
+        self.assertEqual(depois[2], antes[2])
+
+    def test_broker_em_memoria_acorda_quem_espera(self):
+        central = eventos.BrokerMemoria()
+        resultado = []
+        espera = threading.Thread(target=lambda: resultado.append(central.aguardar(self.monitor.id, 0, timeout=5)))
+        espera.start()
+        central.publicar([self.monitor.id])
+        espera.join(timeout=5)
+
+        self.assertEqual(resultado, [1])
+        self.assertEqual(central.aguardar(self.monitor.id, 1, timeout=0), 1)
+
+    @override_settings(NOTIFICACOES_BROKER="banco")
+    def test_broker_no_banco(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+            NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+
+        self.assertEqual(SinalNotificacoes.objects.get(usuario=self.monitor).versao, 2)
+        self.assertEqual(eventos.broker().aguardar(self.monitor.id, 0, timeout=0), 2)
+
+    @override_settings(NOTIFICACOES_BROKER="banco")
+    def test_broker_no_banco_consulta_uma_vez_por_intervalo(self):
+        with mock.patch.object(eventos, "INTERVALO_BANCO", 0.05), self.assertNumQueries(1):
+            self.assertEqual(eventos.broker().aguardar(self.monitor.id, 0, timeout=0.05), 0)
+
+
+class ContadorNotificacoesTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create(email="admin@mindhub.com", senha="123", role=RoleChoices.ADMIN)
+        self.master = Usuario.objects.create(
+            email="master@mindhub.com", senha="123", role=RoleChoices.ADMIN, pode_aprovar_financeiro=True
+        )
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.outro_monitor = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com", senha="123", role=RoleChoices.ALUNO, monitor_responsavel=self.monitor
+        )
+        mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mes 1")
+        self.steps = [Step.objects.create(mundo=mundo, ordem=ordem, titulo="Step", instrucoes="-") for ordem in (1, 2, 3)]
+        recalcular_contadores()
+
+    def assertContadoresCorretos(self):
+        esperado = {
+            usuario.id: tuple(getattr(usuario, campo) for campo in CAMPOS_CONTADOR)
+            for usuario in calcular_contadores(Usuario.objects.all())
+        }
+        atual = {
+            contador["usuario_id"]: tuple(contador[campo] for campo in CAMPOS_CONTADOR)
+            for contador in ContadorNotificacoes.objects.values("usuario_id", *CAMPOS_CONTADOR)
+        }
+        self.assertEqual(atual, esperado)
+
+    def submeter(self, step):
+        progresso = ProgressoAluno.objects.create(aluno=self.aluno, step=step, status=StatusProgresso.PENDENTE_VALIDACAO)
+        return Submissao.objects.create(progresso=progresso, resposta_texto="ok")
+
+    def test_contadores_acompanham_as_mudancas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacao = NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+            NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+            submissoes = [self.submeter(step) for step in self.steps]
+        self.assertContadoresCorretos()
+        self.assertEqual(total_notificacoes(self.monitor), 5)
+        self.assertEqual(total_notificacoes(self.admin), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacao.marcar_como_lida()
+            submissoes[0].aprovar(self.monitor)
+            submissoes[1].delete()
+        self.assertContadoresCorretos()
+        self.assertEqual(total_notificacoes(self.monitor), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            validar_submissoes_em_lote(self.admin, [{"id": submissoes[2].id, "aprovado": True}])
+        self.assertContadoresCorretos()
+        self.assertEqual(total_notificacoes(self.admin), 0)
+
+    def test_propostas_e_troca_de_monitor(self):
+        contrato = Contrato.objects.create(
+            aluno=self.aluno, valor_total_negociado="1200.00", data_assinatura=timezone.localdate(), criado_por=self.admin
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            proposta = PropostaFinanceira.objects.create(
+                aluno=self.aluno, contrato=contrato, criada_por=self.monitor, motivo="Renegociar"
+            )
+            self.submeter(self.steps[0])
+        self.assertContadoresCorretos()
+        self.assertEqual(total_notificacoes(self.master), 2)
+        self.assertEqual(total_notificacoes(self.admin), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            proposta.status = StatusPropostaFinanceira.REJEITADA
+            proposta.save()
+            self.aluno.monitor_responsavel = self.outro_monitor
+            self.aluno.save()
+        self.assertContadoresCorretos()
+        self.assertEqual(total_notificacoes(self.monitor), 0)
+        self.assertEqual(total_notificacoes(self.outro_monitor), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aluno.delete()
+        self.assertContadoresCorretos()
+        self.assertEqual(total_notificacoes(self.outro_monitor), 0)
+
+    def test_total_e_uma_busca_por_chave_primaria(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submeter(self.steps[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(total_notificacoes(self.monitor), 1)
+
+    def test_contador_criado_na_primeira_leitura(self):
+        ContadorNotificacoes.objects.all().delete()
+        NotificacaoInterna.objects.create(destinatario=self.monitor, titulo="Oi", mensagem="-")
+
+        self.assertEqual(total_notificacoes(self.monitor), 1)
+        self.assertTrue(ContadorNotificacoes.objects.filter(usuario=self.monitor).exists())
+
+    def test_reconciliar_corrige_divergencias(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submeter(self.steps[0])
+        ContadorNotificacoes.objects.filter(usuario=self.monitor).update(submissoes_pendentes=40)
+
+        saida = StringIO()
+        call_command("reconciliar_contadores_notificacoes", stdout=saida)
+
+        self.assertIn("1 estavam divergentes", saida.getvalue())
+        self.assertContadoresCorretos()
+
+
+class IndicesNotificacoesTests(TestCase):
+    """Confere via EXPLAIN que as consultas de notificações usam notificacao_dest_lida_idx."""
+
+    @classmethod
+    def setUpTestData(cls):
+        usuarios = Usuario.objects.bulk_create(
+            [
+                Usuario(email=f"monitor{indice}@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+                for indice in range(100)
+            ]
+        )
+        NotificacaoInterna.objects.bulk_create(
+            [
+                NotificacaoInterna(destinatario=usuario, titulo="Aviso", mensagem="-", lida=posicao % 4 != 0)
+                for usuario in usuarios
+                for posicao in range(30)
+            ]
+        )
+        cls.usuario = usuarios[7]
+        atualizar_estatisticas()
+
+    def planos(self, funcao, *args):
+        with CaptureQueriesContext(connection) as contexto:
+            funcao(*args)
+        planos = planos_das_queries(contexto.captured_queries, "comercial_notificacaointerna")
+        self.assertTrue(planos)
+        for plano in planos:
+            self.assertNotIn("comercial_notificacaointerna", plano.varreduras, f"{plano.sql}\n{plano.texto}")
+            self.assertIn("notificacao_dest_lida_idx", plano.indices, f"{plano.sql}\n{plano.texto}")
+        return planos
+
+    def test_lista_do_destinatario_sai_na_ordem_do_indice(self):
+        planos = self.planos(lambda usuario: list(notificacoes_internas(usuario)[:20]), self.usuario)
+        self.assertFalse(any(plano.ordena_em_memoria for plano in planos))
+
+    def test_contagens_de_nao_lidas(self):
+        self.planos(resumo_cadastros, self.usuario)
+        self.planos(recalcular_contadores, [self.usuario.id])
+
+
+@override_settings(ORCAMENTO_QUERIES="erro")
+class OrcamentoQueriesTests(TestCase):
+    """As telas e ações do comercial cabem no @orcamento_queries com vários cadastros na base."""
+
+    def setUp(self):
+        self.admin_master = Usuario.objects.create(
+            email="master@mindhub.com", senha="123", role=RoleChoices.ADMIN, pode_aprovar_financeiro=True
+        )
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        alunos = Usuario.objects.bulk_create(
+            [
+                Usuario(
+                    email=f"aluno{indice}@mindhub.com",
+                    senha="123",
+                    role=RoleChoices.ALUNO,
+                    nome=f"Aluno {indice}",
+                    monitor_responsavel=self.monitor,
+                )
+                for indice in range(20)
+            ]
+        )
+        PerfilEmpresarial.objects.bulk_create(
+            [PerfilEmpresarial(aluno=aluno, nome_empresa=f"Empresa {aluno.id}", nicho="CAFE") for aluno in alunos]
+        )
+        contratos = Contrato.objects.bulk_create(
+            [Contrato(aluno=aluno, valor_total_negociado="1200.00", data_assinatura=timezone.localdate()) for aluno in alunos]
+        )
+        Parcela.objects.bulk_create(
+            [
+                Parcela(
+                    contrato=contrato,
+                    numero=numero,
+                    valor="400.00",
+                    data_vencimento=timezone.localdate() + timedelta(days=30 * numero),
+                )
+                for contrato in contratos
+                for numero in range(1, 4)
+            ]
+        )
+        self.aluno = alunos[0]
+
+    def chamar(self, usuario, nome, *args, metodo="get", **kwargs):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+        response = getattr(self.client, metodo)(reverse(f"comercial:{nome}", args=args), **kwargs)
+        self.assertLess(response.status_code, 500)
+        self.assertIn("Server-Timing", response)
+        return response
+
+    def test_telas_do_cadastro(self):
+        for usuario in (self.monitor, self.admin_master):
+            self.assertEqual(self.chamar(usuario, "cadastros").status_code, 200)
+            self.assertEqual(self.chamar(usuario, "cadastro_detalhe", self.aluno.id).status_code, 200)
+            self.assertEqual(self.chamar(usuario, "api_total_notificacoes").status_code, 200)
+
+    def test_proposta_rejeitada_e_notificacao_lida(self):
+        response = self.chamar(
+            self.monitor,
+            "criar_proposta",
+            self.aluno.id,
+            metodo="post",
+            data={
+                "motivo": "Reprogramar caixa do aluno",
+                "quantidade_parcelas": 2,
+                "valor_parcela": "350.00",
+                "primeiro_vencimento": (timezone.localdate() + timedelta(days=15)).isoformat(),
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        proposta = PropostaFinanceira.objects.get(aluno=self.aluno)
+
+        self.chamar(self.admin_master, "rejeitar_proposta", proposta.id, metodo="post", data={"observacao_admin": "Não"})
+        proposta.refresh_from_db()
+        self.assertEqual(proposta.status, StatusPropostaFinanceira.REJEITADA)
+
+        notificacao = NotificacaoInterna.objects.get(destinatario=self.admin_master, aluno=self.aluno)
+        self.chamar(self.admin_master, "marcar_notificacao_lida", notificacao.id, metodo="post")
+        notificacao.refresh_from_db()
+        self.assertTrue(notificacao.lida)
@@ -13,4 +13,5 @@ urlpatterns = [
     path("propostas/<int:proposta_id>/rejeitar/", views.rejeitar_proposta, name="rejeitar_proposta"),
     path("notificacoes/<int:notificacao_id>/lida/", views.marcar_notificacao_lida, name="marcar_notificacao_lida"),
     path("api/notificacoes/total/", views.api_total_notificacoes, name="api_total_notificacoes"),
+    path("api/notificacoes/stream/", views.api_stream_notificacoes, name="api_stream_notificacoes"),
 ]
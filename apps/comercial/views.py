@@ -1,16 +1,21 @@
+import json
+import time
 from decimal import Decimal, InvalidOperation
 
 from django.contrib import messages
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST
 
+from apps.core.orcamento import orcamento_queries
 from apps.financeiro.models import Contrato, MetodoPagamentoContrato, TipoParcela
 from apps.usuarios.models import RoleChoices, Usuario
 
+from . import eventos
 from .forms import CadastroAlunoOnboardingForm, ParecerPropostaFinanceiraForm, PropostaFinanceiraForm
 from .models import NotificacaoInterna, PropostaFinanceira
 from .permissions import admin_master_required, cadastro_access_required, cadastro_edit_required
@@ -169,6 +174,7 @@ def _capturar_parcelas_planejadas(request, form: CadastroAlunoOnboardingForm) ->
     return parcelas
 
 
+@orcamento_queries(10)
 @cadastro_access_required
 def cadastros(request):
     usuario = request.usuario
@@ -185,6 +191,7 @@ def cadastros(request):
     )
 
 
+@orcamento_queries(100, repeticoes=30)
 @cadastro_edit_required
 def cadastro_novo(request):
     usuario = request.usuario
@@ -228,6 +235,7 @@ def cadastro_novo(request):
     )
 
 
+@orcamento_queries(30, repeticoes=10)
 @cadastro_access_required
 def cadastro_detalhe(request, aluno_id):
     usuario = request.usuario
@@ -302,6 +310,7 @@ def cadastro_detalhe(request, aluno_id):
     )
 
 
+@orcamento_queries(15)
 @cadastro_access_required
 @require_POST
 def criar_proposta(request, aluno_id):
@@ -321,6 +330,7 @@ def criar_proposta(request, aluno_id):
     return redirect("comercial:cadastro_detalhe", aluno_id=aluno_id)
 
 
+@orcamento_queries(45, repeticoes=12)
 @admin_master_required
 @require_POST
 def aprovar_proposta(request, proposta_id):
@@ -334,6 +344,7 @@ def aprovar_proposta(request, proposta_id):
     return redirect("trilha:monitor_notificacoes")
 
 
+@orcamento_queries(10)
 @admin_master_required
 @require_POST
 def rejeitar_proposta(request, proposta_id):
@@ -347,6 +358,7 @@ def rejeitar_proposta(request, proposta_id):
     return redirect("trilha:monitor_notificacoes")
 
 
+@orcamento_queries(8)
 @cadastro_access_required
 @require_POST
 def marcar_notificacao_lida(request, notificacao_id):
@@ -356,6 +368,70 @@ def marcar_notificacao_lida(request, notificacao_id):
     return redirect(destino)
 
 
+@orcamento_queries(10)
 @cadastro_access_required
 def api_total_notificacoes(request):
     return JsonResponse({"total": total_notificacoes(request.usuario)})
+
+
+INTERVALO_HEARTBEAT = 25
+# Abaixo do timeout padrão de request do Cloud Run (300s)
+DURACAO_MAXIMA_STREAM = 240
+# Servidor sem threads (gunicorn sync): o stream vira uma consulta com reconexão espaçada
+RETRY_SEM_THREADS_MS = 30000
+
+
+def _eventos_total_notificacoes(usuario):
+    """
+    Gera os eventos SSE do badge: envia o total na abertura e depois só quando o
+    broker avisa que algo mudou para o usuário. Comentários de heartbeat mantêm a
+    conexão viva; depois de DURACAO_MAXIMA_STREAM o stream fecha e o EventSource reconecta.
+    """
+    central = eventos.broker()
+    fim = time.monotonic() + DURACAO_MAXIMA_STREAM
+    ultimo_total = None
+    yield "retry: 5000\n\n"
+    while True:
+        versao = central.versao(usuario.id)
+        total = total_notificacoes(usuario)
+        if total != ultimo_total:
+            ultimo_total = total
+            yield f"event: total\ndata: {json.dumps({'total': total})}\n\n"
+
+        if not connection.in_atomic_block:
+            # Não segura uma conexão do banco enquanto espera
+            connection.close()
+
+        while True:
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            nova_versao = central.aguardar(usuario.id, versao, timeout=min(INTERVALO_HEARTBEAT, restante))
+            if nova_versao != versao:
+                break
+            yield ": ping\n\n"
+
+
+def _evento_total_unico(usuario):
+    yield f"retry: {RETRY_SEM_THREADS_MS}\n\n"
+    yield f"event: total\ndata: {json.dumps({'total': total_notificacoes(usuario)})}\n\n"
+
+
+@orcamento_queries(4)
+@cadastro_access_required
+def api_stream_notificacoes(request):
+    """
+    Stream SSE do total de notificações. Cada aba aberta ocupa uma thread do
+    servidor enquanto o stream dura (gunicorn com worker gthread, ver
+    gunicorn.conf.py). Num servidor sem threads o stream seguraria o worker
+    inteiro: aí só o total atual é enviado e o EventSource reconecta em
+    RETRY_SEM_THREADS_MS, como o polling antigo.
+    """
+    if request.META.get("wsgi.multithread"):
+        eventos_sse = _eventos_total_notificacoes(request.usuario)
+    else:
+        eventos_sse = _evento_total_unico(request.usuario)
+    response = StreamingHttpResponse(eventos_sse, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
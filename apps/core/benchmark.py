@@ -0,0 +1,192 @@
+"""
+Benchmark das views mais acessadas contra bases sintéticas de vários tamanhos.
+
+Para cada tamanho (TAMANHOS) a base é gerada com gerar_carga e cada endpoint
+(ENDPOINTS) é chamado pelo Client de teste do Django: as primeiras chamadas
+aquecem e ficam de fora, as demais viram percentis de latência (p50/p95/p99)
+e a contagem de queries. O cache é limpo antes de cada chamada, então o que se
+mede é o cálculo da resposta, não o cache; o GC fica desligado durante cada
+chamada, como no timeit.
+
+`comparar` confronta um resultado com o baseline versionado em
+benchmarks/baseline.json: queries não podem aumentar e o p50 pode piorar até a
+tolerância (proporcional, com uma folga absoluta para os endpoints rápidos,
+onde o ruído pesa mais). p95 e p99 ficam registrados mas não reprovam: com 30
+amostras a cauda oscila demais de uma execução para outra.
+"""
+import gc
+import platform
+import statistics
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.financeiro.models import ContratoStatus
+from apps.usuarios.models import RoleChoices, Usuario
+
+from .carga import email_carga, gerar_carga
+from .orcamento import MedicaoQueries
+
+PREFIXO = 'bench'
+SEED = 42
+
+# nome: (monitores, alunos)
+TAMANHOS = {
+    'pequeno': (2, 50),
+    'medio': (10, 1000),
+    'grande': (40, 5000),
+}
+
+TOLERANCIA_LATENCIA = 0.5
+FOLGA_LATENCIA_MS = 5.0
+TOLERANCIA_QUERIES = 0
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    nome: str
+    url: str
+    papel: str  # 'aluno' ou 'monitor': quem faz a chamada
+    com_aluno: bool = False  # a URL recebe o id do aluno
+
+
+ENDPOINTS = [
+    Endpoint('home_trilha', 'trilha:home_trilha', 'aluno'),
+    Endpoint('api_aluno_progresso', 'trilha:api_aluno_progresso', 'aluno'),
+    Endpoint('api_monitor_alunos', 'trilha:api_monitor_alunos', 'monitor'),
+    Endpoint('api_monitor_estatisticas', 'trilha:api_monitor_estatisticas', 'monitor'),
+    Endpoint('dashboard_financeiro', 'financeiro:dashboard', 'monitor'),
+    Endpoint('api_ficha_aluno', 'financeiro:api_ficha_aluno', 'monitor', com_aluno=True),
+]
+
+
+def percentis(tempos):
+    """p50/p95/p99 e média (ms) de uma lista de latências em segundos."""
+    cortes = statistics.quantiles(tempos, n=100, method='inclusive')
+    return {
+        'p50_ms': round(cortes[49] * 1000, 3),
+        'p95_ms': round(cortes[94] * 1000, 3),
+        'p99_ms': round(cortes[98] * 1000, 3),
+        'media_ms': round(statistics.fmean(tempos) * 1000, 3),
+    }
+
+
+def usuarios_do_benchmark():
+    """Monitor 0 da carga e um aluno dele com trilha em andamento e sem bloqueio financeiro."""
+    monitor = Usuario.objects.get(email=email_carga(PREFIXO, 'monitor', 0))
+    aluno = (
+        Usuario.objects.filter(
+            monitor_responsavel=monitor,
+            role=RoleChoices.ALUNO,
+            snapshot__step_atual__isnull=False,
+            contrato__bloqueado_financeiro=False,
+        )
+        .exclude(contrato__status=ContratoStatus.CANCELADO)
+        .order_by('id')
+        .first()
+    )
+    return monitor, aluno
+
+
+def _cliente(usuario):
+    cliente = Client()
+    session = cliente.session
+    session['usuario'] = usuario.email
+    session.save()
+    return cliente
+
+
+def medir_endpoint(endpoint, monitor, aluno, repeticoes=30, aquecimento=3):
+    """Chama o endpoint `aquecimento + repeticoes` vezes e devolve percentis e queries."""
+    cliente = _cliente(aluno if endpoint.papel == 'aluno' else monitor)
+    url = reverse(endpoint.url, args=[aluno.id] if endpoint.com_aluno else [])
+    tempos = []
+    queries = set()
+    for chamada in range(aquecimento + repeticoes):
+        cache.clear()
+        # Como o timeit: coleta antes e sem GC durante a chamada, para as pausas
+        # do coletor não virarem "regressão" no p95
+        gc.collect()
+        gc.disable()
+        try:
+            # execute_wrapper, não CaptureQueriesContext: o log de queries do Django
+            # guarda só as últimas 9000 e a contagem zera quando ele enche
+            medicao = MedicaoQueries()
+            with connection.execute_wrapper(medicao):
+                inicio = time.perf_counter()
+                response = cliente.get(url)
+                duracao = time.perf_counter() - inicio
+        finally:
+            gc.enable()
+        if response.status_code != 200:
+            raise RuntimeError(f'{endpoint.nome} respondeu {response.status_code} ({url})')
+        if chamada >= aquecimento:
+            tempos.append(duracao)
+            queries.add(medicao.total)
+    return {**percentis(tempos), 'queries': max(queries)}
+
+
+def preparar_base(tamanho):
+    """Apaga a base (de teste) e gera a carga do tamanho pedido."""
+    call_command('flush', interactive=False, verbosity=0)
+    monitores, alunos = TAMANHOS[tamanho]
+    return gerar_carga(monitores=monitores, alunos=alunos, seed=SEED, prefixo=PREFIXO)
+
+
+def rodar_benchmark(tamanhos, repeticoes=30, aquecimento=3, endpoints=None, progresso=None):
+    """
+    Mede os endpoints em cada tamanho. Apaga o banco atual: rode só numa base
+    descartável (o comando benchmark cria um banco de teste para isso).
+    """
+    endpoints = endpoints or ENDPOINTS
+    resultados = {}
+    for tamanho in tamanhos:
+        preparar_base(tamanho)
+        monitor, aluno = usuarios_do_benchmark()
+        resultados[tamanho] = {}
+        for endpoint in endpoints:
+            resultados[tamanho][endpoint.nome] = medir_endpoint(endpoint, monitor, aluno, repeticoes, aquecimento)
+            if progresso:
+                progresso(tamanho, endpoint.nome, resultados[tamanho][endpoint.nome])
+    return {
+        'gerado_em': timezone.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'banco': connection.vendor,
+            'python': platform.python_version(),
+            'maquina': platform.machine(),
+        },
+        'repeticoes': repeticoes,
+        'tamanhos': {tamanho: dict(zip(('monitores', 'alunos'), TAMANHOS[tamanho])) for tamanho in tamanhos},
+        'resultados': resultados,
+    }
+
+
+def comparar(resultado, baseline, tolerancia=TOLERANCIA_LATENCIA, folga_ms=FOLGA_LATENCIA_MS,
+             tolerancia_queries=TOLERANCIA_QUERIES):
+    """
+    Lista as regressões de `resultado` em relação ao `baseline` (vazia se nada piorou).
+    Só compara os tamanhos e endpoints presentes nos dois.
+    """
+    regressoes = []
+    for tamanho, endpoints in resultado['resultados'].items():
+        for nome, atual in endpoints.items():
+            referencia = baseline.get('resultados', {}).get(tamanho, {}).get(nome)
+            if referencia is None:
+                continue
+            if atual['queries'] > referencia['queries'] + tolerancia_queries:
+                regressoes.append(
+                    f'{tamanho}/{nome}: {atual["queries"]} queries (baseline {referencia["queries"]})'
+                )
+            limite = max(referencia['p50_ms'] * (1 + tolerancia), referencia['p50_ms'] + folga_ms)
+            if atual['p50_ms'] > limite:
+                regressoes.append(
+                    f'{tamanho}/{nome}: p50 {atual["p50_ms"]:.1f}ms '
+                    f'(baseline {referencia["p50_ms"]:.1f}ms, limite {limite:.1f}ms)'
+                )
+    return regressoes
@@ -0,0 +1,486 @@
+"""
+Gerador de carga sintética para testes de desempenho.
+
+`gerar_carga` cria uma turma inteira com bulk_create: monitores, alunos com
+trilha clonada de um molde, progresso em vários pontos da trilha, submissões
+(as de foto apontam para um único arquivo placeholder), histórico de notas de
+saúde, contratos com parcelas em todos os status e notificações internas.
+
+O resultado é determinístico a partir da semente: cada aluno sorteia os seus
+dados com um Random próprio (semente + índice), então o tamanho do lote não
+muda o que é gerado. As datas são relativas ao momento da execução (ou ao
+`agora` informado).
+
+Como bulk_create não dispara signals, no fim de cada lote são recalculados
+snapshots, bloqueios e resumos financeiros e contadores de notificações.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from apps.comercial.contadores import recalcular_contadores
+from apps.comercial.models import DificuldadeDiagnostico, NichoEmpresa, NotificacaoInterna, PerfilEmpresarial, TipoNotificacao
+from apps.financeiro.models import Contrato, ContratoStatus, MetodoPagamentoContrato, OrigemParcela, Parcela, TipoParcela
+from apps.financeiro.services import atualizar_bloqueio_financeiro, atualizar_resumo_contratos
+from apps.trilha.cache import invalidar_tudo
+from apps.trilha.models import Mundo, NotaSaude, ProgressoAluno, StatusProgresso, Step, Submissao, TipoValidacao
+from apps.trilha.services import atualizar_snapshots
+from apps.usuarios.models import RoleChoices, Usuario
+
+DOMINIO = 'carga.mindhub.local'
+SENHA_PADRAO = 'carga123'
+ARQUIVO_PLACEHOLDER = 'submissoes/carga/placeholder.png'
+
+TIPOS_VALIDACAO = [TipoValidacao.FOTO, TipoValidacao.TEXTO, TipoValidacao.FORMULARIO]
+VALORES_PARCELA = [Decimal('297.00'), Decimal('497.00'), Decimal('997.00')]
+QUANTIDADES_PARCELAS = [1, 3, 6, 10, 12]
+
+
+@dataclass
+class ResultadoCarga:
+    """Linhas criadas por tabela e o tempo total da geração."""
+    monitores: int = 0
+    alunos: int = 0
+    mundos: int = 0
+    steps: int = 0
+    progressos: int = 0
+    submissoes: int = 0
+    notas: int = 0
+    contratos: int = 0
+    parcelas: int = 0
+    notificacoes: int = 0
+    duracao: float = 0.0
+
+    def acumular(self, outro):
+        for campo in fields(self):
+            setattr(self, campo.name, getattr(self, campo.name) + getattr(outro, campo.name))
+
+    @property
+    def linhas_criadas(self):
+        return sum(getattr(self, campo.name) for campo in fields(self) if campo.name != 'duracao')
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas_criadas / self.duracao if self.duracao else 0.0
+
+
+def email_carga(prefixo, papel, indice):
+    return f'{prefixo}.{papel}{indice}@{DOMINIO}'
+
+
+def carga_existe(prefixo):
+    return Usuario.objects.filter(email__startswith=f'{prefixo}.', email__endswith=f'@{DOMINIO}').exists()
+
+
+def garantir_placeholder():
+    """Grava (uma vez) a imagem usada por todas as submissões de foto da carga."""
+    if not default_storage.exists(ARQUIVO_PLACEHOLDER):
+        conteudo = BytesIO()
+        Image.new('RGB', (64, 64), '#e30613').save(conteudo, format='PNG')
+        default_storage.save(ARQUIVO_PLACEHOLDER, ContentFile(conteudo.getvalue()))
+    return ARQUIVO_PLACEHOLDER
+
+
+def molde_trilha(mundos, steps_por_mundo):
+    """[(numero, nome, [(ordem, titulo, tipo_validacao, pontos), ...]), ...] clonado para cada aluno."""
+    return [
+        (
+            numero,
+            f'Mês {numero}',
+            [
+                (ordem, f'Step {numero}.{ordem}', TIPOS_VALIDACAO[(numero + ordem) % len(TIPOS_VALIDACAO)], 10 * ordem)
+                for ordem in range(1, steps_por_mundo + 1)
+            ],
+        )
+        for numero in range(1, mundos + 1)
+    ]
+
+
+@dataclass
+class _PerfilAluno:
+    """O que foi sorteado para um aluno; as linhas de cada tabela saem daqui."""
+    concluidos: int
+    status_atual: str | None
+    inicio: object
+    ultima_atividade: object
+    notas: list
+    parcelas: int
+    valor_parcela: Decimal
+    pagador: str
+    cancelado: bool
+    renegociou: bool
+    nicho: str
+    dificuldades: list
+    notificacoes: int
+
+
+def _sortear_perfil(rng, total_steps, agora):
+    sorteio = rng.random()
+    if sorteio < 0.10:
+        concluidos = 0
+    elif sorteio < 0.15:
+        concluidos = total_steps
+    else:
+        # Mais alunos no começo da trilha que no fim
+        concluidos = min(int(rng.betavariate(2, 3) * total_steps), total_steps - 1)
+
+    status_atual = None
+    if concluidos < total_steps:
+        status_atual = StatusProgresso.PENDENTE_VALIDACAO if rng.random() < 0.35 else StatusProgresso.EM_ANDAMENTO
+
+    inicio = agora - timedelta(days=rng.randint(30, 365), minutes=rng.randint(0, 1439))
+    # 15% inativos (sem submissões há mais de 7 dias); o resto ativo na última semana
+    dias_parado = rng.randint(8, 60) if rng.random() < 0.15 else rng.randint(0, 6)
+    ultima_atividade = max(agora - timedelta(days=dias_parado, minutes=rng.randint(0, 1439)), inicio)
+
+    nota = rng.randint(2, 5)
+    notas = []
+    for _ in range(rng.randint(1, 6)):
+        nota = min(5, max(1, nota + rng.choice((-1, 0, 0, 1))))
+        notas.append(nota)
+    if dias_parado > 7:
+        notas.append(1)
+
+    return _PerfilAluno(
+        concluidos=concluidos,
+        status_atual=status_atual,
+        inicio=inicio,
+        ultima_atividade=ultima_atividade,
+        notas=notas,
+        parcelas=rng.choice(QUANTIDADES_PARCELAS),
+        valor_parcela=rng.choice(VALORES_PARCELA),
+        pagador=rng.choices(('em_dia', 'atrasa', 'parou'), weights=(75, 15, 10))[0],
+        cancelado=rng.random() < 0.08,
+        renegociou=rng.random() < 0.05,
+        nicho=rng.choice(NichoEmpresa.values),
+        dificuldades=rng.sample(DificuldadeDiagnostico.values, rng.randint(1, 3)),
+        notificacoes=rng.randint(0, 3),
+    )
+
+
+@contextmanager
+def _datas_sorteadas():
+    """
+    Desliga o auto_now_add das datas que a carga sorteia (envio, nota, notificação)
+    para o bulk_create gravá-las; sem isso todas sairiam com o horário da geração.
+    """
+    campos = [
+        Submissao._meta.get_field('data_envio'),
+        NotaSaude._meta.get_field('data'),
+        NotificacaoInterna._meta.get_field('criada_em'),
+    ]
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo in campos:
+            campo.auto_now_add = True
+
+
+def _entre(rng, inicio, fim):
+    return inicio + (fim - inicio) * rng.random()
+
+
+@dataclass(frozen=True)
+class _ParametrosCarga:
+    """O que todo lote precisa saber; vai por pickle para os processos do pool."""
+    seed: int
+    prefixo: str
+    senha: str
+    trilha: list
+    placeholder: str
+    monitor_ids: list
+    agora: object
+
+
+def gerar_carga(monitores=10, alunos=1000, seed=42, prefixo='carga', mundos=6, steps_por_mundo=4,
+                batch_size=1000, workers=1, agora=None, progresso=None):
+    """
+    Gera `monitores` monitores e `alunos` alunos (distribuídos entre eles) com
+    todos os dados relacionados. Cada lote de `batch_size` alunos roda numa
+    transação; com `workers` > 1 os lotes rodam em paralelo num pool de
+    processos (só no PostgreSQL: o SQLite trava com escritas concorrentes).
+    `progresso(feitos, total)` é chamado ao fim de cada lote. As datas são
+    sorteadas para trás a partir de `agora` (padrão: o momento da chamada).
+    Os e-mails são <prefixo>.monitorN / <prefixo>.alunoN @carga.mindhub.local.
+    """
+    inicio_geracao = time.monotonic()
+    senha = make_password(SENHA_PADRAO)
+    monitores_criados = Usuario.objects.bulk_create([
+        Usuario(
+            email=email_carga(prefixo, 'monitor', indice),
+            senha=senha,
+            role=RoleChoices.MONITOR,
+            nome=f'Monitor {indice}',
+            telefone=f'(11) 97{indice:07d}',
+        )
+        for indice in range(monitores)
+    ])
+    parametros = _ParametrosCarga(
+        seed=seed,
+        prefixo=prefixo,
+        senha=senha,
+        trilha=molde_trilha(mundos, steps_por_mundo),
+        placeholder=garantir_placeholder(),
+        monitor_ids=[monitor.id for monitor in monitores_criados],
+        agora=agora or timezone.now(),
+    )
+    lotes = [(posicao, min(posicao + batch_size, alunos)) for posicao in range(0, alunos, batch_size)]
+    resultado = ResultadoCarga(monitores=len(monitores_criados))
+    feitos = 0
+
+    def acumular(parcial):
+        nonlocal feitos
+        resultado.acumular(parcial)
+        feitos += parcial.alunos
+        if progresso:
+            progresso(feitos, alunos)
+
+    if workers > 1:
+        # Os processos filhos não podem herdar conexões abertas com o banco
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(_gerar_lote, parametros, inicio, fim) for inicio, fim in lotes]
+            for futuro in as_completed(futuros):
+                acumular(futuro.result())
+    else:
+        for inicio, fim in lotes:
+            acumular(_gerar_lote(parametros, inicio, fim))
+
+    recalcular_contadores(
+        parametros.monitor_ids
+        + list(Usuario.objects.filter(role=RoleChoices.ADMIN).values_list('id', flat=True))
+    )
+    invalidar_tudo()
+    resultado.duracao = time.monotonic() - inicio_geracao
+    return resultado
+
+
+def _gerar_lote(parametros, inicio, fim):
+    """Gera os alunos de índice [inicio, fim) numa transação e devolve o que foi criado."""
+    with transaction.atomic(), _datas_sorteadas():
+        return _gravar_lote(parametros, range(inicio, fim))
+
+
+def _gravar_lote(parametros, indices):
+    agora = parametros.agora
+    hoje = timezone.localdate(agora)
+    trilha = parametros.trilha
+    monitor_ids = parametros.monitor_ids
+    total_steps = sum(len(steps) for _, _, steps in trilha)
+    perfis = [_sortear_perfil(random.Random(f'{parametros.seed}:{indice}'), total_steps, agora) for indice in indices]
+    rngs = [random.Random(f'{parametros.seed}:{indice}:linhas') for indice in indices]
+
+    novos_alunos = Usuario.objects.bulk_create([
+        Usuario(
+            email=email_carga(parametros.prefixo, 'aluno', indice),
+            senha=parametros.senha,
+            role=RoleChoices.ALUNO,
+            nome=f'Aluno {indice}',
+            telefone=f'(11) 98{indice:07d}',
+            monitor_responsavel_id=monitor_ids[indice % len(monitor_ids)] if monitor_ids else None,
+        )
+        for indice in indices
+    ])
+    aluno_ids = [aluno.id for aluno in novos_alunos]
+
+    PerfilEmpresarial.objects.bulk_create([
+        PerfilEmpresarial(
+            aluno=aluno,
+            nome_empresa=f'Empresa {indice}',
+            nicho=perfil.nicho,
+            dificuldades=perfil.dificuldades,
+            monitor_responsavel_snapshot_id=aluno.monitor_responsavel_id,
+        )
+        for indice, aluno, perfil in zip(indices, novos_alunos, perfis)
+    ])
+
+    # Trilha clonada do molde, como clonar_trilha_base faz a partir da Trilha Base
+    novos_mundos = Mundo.objects.bulk_create([
+        Mundo(aluno=aluno, numero=numero, nome=nome)
+        for aluno in novos_alunos
+        for numero, nome, _ in trilha
+    ])
+    novos_steps = Step.objects.bulk_create([
+        Step(mundo=mundo, ordem=ordem, titulo=titulo, instrucoes='-', tipo_validacao=tipo, pontos=pontos)
+        for mundo, (_, _, steps) in zip(novos_mundos, trilha * len(novos_alunos))
+        for ordem, titulo, tipo, pontos in steps
+    ])
+    total_steps = len(novos_steps) // len(novos_alunos)
+
+    progressos = []
+    for numero_aluno, (aluno, perfil, rng) in enumerate(zip(novos_alunos, perfis, rngs)):
+        steps_aluno = novos_steps[numero_aluno * total_steps:(numero_aluno + 1) * total_steps]
+        for step in steps_aluno[:perfil.concluidos]:
+            data_inicio = _entre(rng, perfil.inicio, perfil.ultima_atividade)
+            progressos.append(ProgressoAluno(
+                aluno=aluno,
+                step=step,
+                status=StatusProgresso.CONCLUIDO,
+                data_inicio=data_inicio,
+                data_conclusao=_entre(rng, data_inicio, perfil.ultima_atividade),
+            ))
+        if perfil.status_atual:
+            progressos.append(ProgressoAluno(
+                aluno=aluno,
+                step=steps_aluno[perfil.concluidos],
+                status=perfil.status_atual,
+                data_inicio=perfil.ultima_atividade,
+            ))
+    progressos = ProgressoAluno.objects.bulk_create(progressos)
+
+    submissoes = []
+    rng_por_aluno = dict(zip(aluno_ids, rngs))
+    perfil_por_aluno = dict(zip(aluno_ids, perfis))
+    monitor_por_aluno = {aluno.id: aluno.monitor_responsavel_id for aluno in novos_alunos}
+    for progresso in progressos:
+        rng = rng_por_aluno[progresso.aluno_id]
+        foto = progresso.step.tipo_validacao == TipoValidacao.FOTO
+        if progresso.status == StatusProgresso.EM_ANDAMENTO and rng.random() >= 0.3:
+            continue
+        if progresso.status == StatusProgresso.CONCLUIDO:
+            envio = progresso.data_conclusao - timedelta(hours=rng.randint(1, 48))
+            aprovado = True
+        elif progresso.status == StatusProgresso.PENDENTE_VALIDACAO:
+            envio = perfil_por_aluno[progresso.aluno_id].ultima_atividade
+            aprovado = None
+        else:
+            # Em andamento depois de uma reprovação
+            envio = progresso.data_inicio
+            aprovado = False
+        submissoes.append(Submissao(
+            progresso=progresso,
+            arquivo=parametros.placeholder if foto else None,
+            resposta_texto='' if foto else 'Resposta gerada para teste de carga',
+            data_envio=envio,
+            validado_por_id=monitor_por_aluno[progresso.aluno_id] if aprovado is not None else None,
+            data_validacao=envio + timedelta(hours=rng.randint(1, 72)) if aprovado is not None else None,
+            aprovado=aprovado,
+            feedback='' if aprovado is not False else 'Refazer com mais detalhes',
+        ))
+    submissoes = Submissao.objects.bulk_create(submissoes)
+
+    notas = []
+    for aluno, perfil, rng in zip(novos_alunos, perfis, rngs):
+        for posicao, nota in enumerate(perfil.notas, start=1):
+            automatica = posicao == len(perfil.notas) and nota == 1
+            notas.append(NotaSaude(
+                aluno=aluno,
+                nota=nota,
+                automatica=automatica,
+                data=perfil.inicio + (agora - perfil.inicio) * posicao / (len(perfil.notas) + 1),
+                observacao='Inatividade detectada' if automatica else '',
+            ))
+    notas = NotaSaude.objects.bulk_create(notas)
+
+    novos_contratos = Contrato.objects.bulk_create([
+        Contrato(
+            aluno=aluno,
+            valor_total_negociado=perfil.valor_parcela * perfil.parcelas,
+            data_assinatura=timezone.localtime(perfil.inicio).date(),
+            metodo_pagamento=rng.choice(MetodoPagamentoContrato.values),
+            status=ContratoStatus.CANCELADO if perfil.cancelado else ContratoStatus.ATIVO,
+        )
+        for aluno, perfil, rng in zip(novos_alunos, perfis, rngs)
+    ])
+
+    parcelas = []
+    renegociadas = []
+    for contrato, perfil, rng in zip(novos_contratos, perfis, rngs):
+        parcelas_contrato = []
+        for numero in range(1, perfil.parcelas + 1):
+            vencimento = contrato.data_assinatura + timedelta(days=30 * (numero - 1))
+            pagamento = vencimento + timedelta(days=rng.randint(-3, 10))
+            # em_dia paga tudo (às vezes com atraso); atrasa deixa em aberto o que venceu
+            # há menos de 30 dias; parou deixa de pagar da metade do contrato em diante
+            pago = pagamento <= hoje and (
+                perfil.pagador == 'em_dia'
+                or (perfil.pagador == 'atrasa' and vencimento + timedelta(days=30) < hoje)
+                or (perfil.pagador == 'parou' and numero <= perfil.parcelas // 2)
+            )
+            parcelas_contrato.append(Parcela(
+                contrato=contrato,
+                numero=numero,
+                valor=perfil.valor_parcela,
+                data_vencimento=vencimento,
+                data_pagamento=pagamento if pago else None,
+                link_pagamento_ou_pix=f'https://pagamentos.mindhub.com/carga/{contrato.aluno_id}/{numero}',
+                tipo_parcela=TipoParcela.ENTRADA if numero == 1 else TipoParcela.RECORRENTE,
+            ))
+        abertas = [parcela for parcela in parcelas_contrato if not parcela.data_pagamento]
+        if perfil.renegociou and not perfil.cancelado and abertas:
+            original = abertas[0]
+            original.ativa = False
+            original.ja_renegociada = True
+            renegociadas.append((original, perfil.parcelas + 1, hoje + timedelta(days=rng.randint(5, 40))))
+        parcelas.extend(parcelas_contrato)
+    Parcela.objects.bulk_create(parcelas)
+    parcelas_renegociacao = Parcela.objects.bulk_create([
+        Parcela(
+            contrato_id=original.contrato_id,
+            numero=numero,
+            valor=original.valor,
+            data_vencimento=vencimento,
+            link_pagamento_ou_pix=original.link_pagamento_ou_pix,
+            origem=OrigemParcela.RENEGOCIACAO,
+            parcela_origem=original,
+        )
+        for original, numero, vencimento in renegociadas
+    ])
+
+    notificacoes = []
+    for aluno, perfil, rng in zip(novos_alunos, perfis, rngs):
+        if not aluno.monitor_responsavel_id:
+            continue
+        if perfil.status_atual == StatusProgresso.PENDENTE_VALIDACAO:
+            notificacoes.append(NotificacaoInterna(
+                destinatario_id=aluno.monitor_responsavel_id,
+                aluno=aluno,
+                titulo=f'Nova submissão de {aluno.nome}',
+                mensagem='Há uma submissão aguardando validação.',
+                criada_em=perfil.ultima_atividade,
+            ))
+        for _ in range(perfil.notificacoes):
+            lida = rng.random() < 0.7
+            criada_em = _entre(rng, perfil.inicio, agora)
+            notificacoes.append(NotificacaoInterna(
+                destinatario_id=aluno.monitor_responsavel_id,
+                aluno=aluno,
+                tipo=rng.choice(TipoNotificacao.values),
+                titulo=f'Atualização de {aluno.nome}',
+                mensagem='Notificação gerada para teste de carga.',
+                lida=lida,
+                criada_em=criada_em,
+                lida_em=criada_em + timedelta(hours=rng.randint(1, 48)) if lida else None,
+            ))
+    notificacoes = NotificacaoInterna.objects.bulk_create(notificacoes)
+
+    atualizar_snapshots(aluno_ids)
+    contrato_ids = [contrato.id for contrato in novos_contratos]
+    atualizar_bloqueio_financeiro(contrato_ids)
+    atualizar_resumo_contratos(contrato_ids)
+
+    return ResultadoCarga(
+        alunos=len(novos_alunos),
+        mundos=len(novos_mundos),
+        steps=len(novos_steps),
+        progressos=len(progressos),
+        submissoes=len(submissoes),
+        notas=len(notas),
+        contratos=len(novos_contratos),
+        parcelas=len(parcelas) + len(parcelas_renegociacao),
+        notificacoes=len(notificacoes),
+    )
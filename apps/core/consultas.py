@@ -0,0 +1,79 @@
+"""
+Plano de execução (EXPLAIN) das queries, para conferir o uso dos índices.
+
+Funciona com PostgreSQL e SQLite. `planos_das_queries` roda EXPLAIN sobre as
+queries capturadas com CaptureQueriesContext; `PlanoExecucao` diz quais índices
+o banco usou e quais tabelas ele leu por inteiro.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+
+_INDICE_POSTGRES = re.compile(r'(?:Index Scan|Index Only Scan)(?: Backward)? using (\w+)|Bitmap Index Scan on (\w+)')
+_VARREDURA_POSTGRES = re.compile(r'Seq Scan on (\w+)')
+_ORDENACAO_POSTGRES = re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE)
+_INDICE_SQLITE = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+_VARREDURA_SQLITE = re.compile(r'\bSCAN (\w+)')
+_ORDENACAO_SQLITE = re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)')
+
+
+@dataclass(frozen=True)
+class PlanoExecucao:
+    sql: str
+    texto: str
+
+    @property
+    def _postgres(self):
+        return connection.vendor == 'postgresql'
+
+    @property
+    def indices(self):
+        """Nomes dos índices usados em alguma parte do plano."""
+        padrao = _INDICE_POSTGRES if self._postgres else _INDICE_SQLITE
+        return {encontrado.group(encontrado.lastindex) for encontrado in padrao.finditer(self.texto)}
+
+    @property
+    def varreduras(self):
+        """Tabelas lidas por inteiro (Seq Scan / SCAN), com ou sem índice."""
+        padrao = _VARREDURA_POSTGRES if self._postgres else _VARREDURA_SQLITE
+        return set(padrao.findall(self.texto))
+
+    @property
+    def ordena_em_memoria(self):
+        """True se o banco ordena o resultado em vez de ler na ordem de um índice."""
+        padrao = _ORDENACAO_POSTGRES if self._postgres else _ORDENACAO_SQLITE
+        return bool(padrao.search(self.texto))
+
+    def le_tabela(self, tabela):
+        return re.search(rf'\b{re.escape(tabela)}\b', self.sql) is not None
+
+
+def plano_execucao(sql, params=None):
+    prefixo = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefixo} {sql}', params)
+        linhas = cursor.fetchall()
+    return PlanoExecucao(sql=sql, texto='\n'.join(str(linha[-1]) for linha in linhas))
+
+
+def planos_das_queries(queries_capturadas, tabela=None):
+    """
+    Planos das queries capturadas (CaptureQueriesContext.captured_queries) que
+    leem o banco (SELECT, UPDATE, DELETE), opcionalmente só das que citam `tabela`.
+    """
+    planos = []
+    for query in queries_capturadas:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            continue
+        plano = plano_execucao(sql)
+        if tabela is None or plano.le_tabela(tabela):
+            planos.append(plano)
+    return planos
+
+
+def atualizar_estatisticas():
+    """ANALYZE: o planejador passa a conhecer o volume e a distribuição atuais."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
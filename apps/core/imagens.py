@@ -0,0 +1,117 @@
+"""
+Variantes WebP (miniatura e média) das imagens enviadas - Mindhub OS.
+
+As variantes ficam ao lado do original no storage (`foto.jpg` → `foto.thumb.webp`,
+`foto.medio.webp`) e seus nomes são guardados num JSONField do model
+(ex.: Submissao.arquivo_variantes), junto com o nome do original que as gerou.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+logger = logging.getLogger(__name__)
+
+# nome → (lado máximo em px, qualidade WebP)
+VARIANTES = {
+    'thumb': (320, 70),
+    'medio': (1280, 80),
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='variantes')
+
+
+def nome_variante(nome_original, variante):
+    base, _ = os.path.splitext(nome_original)
+    return f'{base}.{variante}.webp'
+
+
+def gerar_variantes(nome_original, storage=None):
+    """
+    Gera as variantes WebP de um arquivo do storage e devolve o dict a ser salvo
+    no model: {'original': nome, 'thumb': nome_thumb, 'medio': nome_medio}.
+    Arquivos que não são imagem (ou imagens grandes demais para o Pillow abrir,
+DecompressionBombError) devolvem só {'original': nome}.
+    """
+    storage = storage or default_storage
+    variantes = {'original': nome_original}
+    try:
+        with storage.open(nome_original, 'rb') as arquivo:
+            imagem = Image.open(arquivo)
+            imagem = ImageOps.exif_transpose(imagem)
+            imagem.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return variantes
+
+    if imagem.mode not in ('RGB', 'RGBA'):
+        imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() else 'RGB')
+
+    for variante, (lado, qualidade) in VARIANTES.items():
+        copia = imagem.copy()
+        copia.thumbnail((lado, lado), Image.LANCZOS)
+        buffer = BytesIO()
+        copia.save(buffer, 'WEBP', quality=qualidade, method=4)
+
+        nome = nome_variante(nome_original, variante)
+        if storage.exists(nome):
+            storage.delete(nome)
+        variantes[variante] = storage.save(nome, ContentFile(buffer.getvalue()))
+
+    return variantes
+
+
+def precisa_variantes(arquivo, variantes):
+    """True quando o arquivo atual ainda não teve variantes geradas."""
+    return bool(arquivo) and (variantes or {}).get('original') != arquivo.name
+
+
+def url_variante(arquivo, variantes, variante):
+    """URL da variante pedida; cai para o original enquanto ela não existe."""
+    if not arquivo:
+        return None
+    nome = (variantes or {}).get(variante)
+    if nome and variantes.get('original') == arquivo.name:
+        return arquivo.storage.url(nome)
+    return arquivo.url
+
+
+def _executar_em_segundo_plano(funcao, *args):
+    def _tarefa():
+        try:
+            funcao(*args)
+        finally:
+            # A thread do pool abre sua própria conexão com o banco
+            connections.close_all()
+    _executor.submit(_tarefa)
+
+
+def _processar(model, pk, campo_arquivo, campo_variantes, nome_original, campo_aluno):
+    from apps.trilha.cache import invalidar_alunos  # usuarios.models importa este módulo
+
+    try:
+        variantes = gerar_variantes(nome_original)
+        # update() só grava se o arquivo não mudou nesse meio tempo; como não dispara
+        # signals, as respostas e ETags da trilha que têm a URL do original caem aqui
+        if model.objects.filter(pk=pk, **{campo_arquivo: nome_original}).update(**{campo_variantes: variantes}):
+            invalidar_alunos(model.objects.filter(pk=pk).values_list(campo_aluno, flat=True))
+    except Exception:
+        logger.exception('Falha ao gerar variantes de %s', nome_original)
+
+
+def agendar_variantes(instance, campo_arquivo, campo_variantes, campo_aluno='pk'):
+    """
+    Depois do commit, gera as variantes do arquivo em uma thread do pool.
+    `campo_aluno` leva do model ao aluno dono do arquivo, cujo cache da trilha é invalidado.
+    """
+    arquivo = getattr(instance, campo_arquivo)
+    if not precisa_variantes(arquivo, getattr(instance, campo_variantes)):
+        return
+
+    args = (type(instance), instance.pk, campo_arquivo, campo_variantes, arquivo.name, campo_aluno)
+    transaction.on_commit(lambda: _executar_em_segundo_plano(_processar, *args))
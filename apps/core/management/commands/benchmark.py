@@ -0,0 +1,117 @@
+"""
+Management command que mede as views mais acessadas (ver apps.core.benchmark)
+contra bases sintéticas pequena, média e grande, grava percentis de latência e
+contagem de queries num JSON e compara com o baseline versionado.
+
+Roda num banco de teste criado e destruído pelo próprio comando (o banco
+configurado não é tocado). Sai com erro se algum endpoint piorou além da
+tolerância: queries não podem aumentar e o p50 pode piorar até --tolerancia
+(p95 e p99 ficam no JSON, só para consulta).
+As latências só são comparáveis na mesma máquina e no mesmo banco do baseline;
+ao trocar de ambiente, regrave o baseline com --atualizar-baseline.
+
+Uso:
+    python manage.py benchmark
+    python manage.py benchmark --tamanhos pequeno medio --repeticoes 50
+    python manage.py benchmark --saida benchmarks/resultados.json --tolerancia 0.4
+    python manage.py benchmark --atualizar-baseline
+"""
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from apps.core.benchmark import TAMANHOS, TOLERANCIA_LATENCIA, comparar, rodar_benchmark
+
+BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Mede latência e queries das views principais e compara com benchmarks/baseline.json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos',
+            nargs='+',
+            choices=list(TAMANHOS),
+            default=list(TAMANHOS),
+            help='Bases medidas (padrão: todas)'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=30,
+            help='Chamadas medidas por endpoint, fora o aquecimento (padrão: 30)'
+        )
+        parser.add_argument(
+            '--saida',
+            default='benchmarks/resultados.json',
+            help='Arquivo JSON com os resultados (padrão: benchmarks/resultados.json)'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=str(BASELINE),
+            help='Baseline para comparação (padrão: benchmarks/baseline.json)'
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=TOLERANCIA_LATENCIA,
+            help=f'Piora aceita no p50, em fração do baseline (padrão: {TOLERANCIA_LATENCIA})'
+        )
+        parser.add_argument(
+            '--atualizar-baseline',
+            action='store_true',
+            help='Grava os resultados no --baseline em vez de comparar'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 2:
+            raise CommandError('--repeticoes deve ser pelo menos 2')
+
+        def progresso(tamanho, endpoint, medicao):
+            self.stdout.write(
+                f'  {tamanho:8} {endpoint:26} p50 {medicao["p50_ms"]:8.1f}ms  '
+                f'p95 {medicao["p95_ms"]:8.1f}ms  {medicao["queries"]:3} queries'
+            )
+
+        nome_original = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(ORCAMENTO_QUERIES='', MEDIA_ROOT=tempfile.mkdtemp(prefix='mindhub-benchmark-')):
+                resultado = rodar_benchmark(
+                    options['tamanhos'], repeticoes=options['repeticoes'], progresso=progresso
+                )
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        destino = Path(options['baseline'] if options['atualizar_baseline'] else options['saida'])
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        self.stdout.write(f'Resultados gravados em {destino}')
+        if options['atualizar_baseline']:
+            return
+
+        baseline_path = Path(options['baseline'])
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'Baseline {baseline_path} não encontrado: nada a comparar'))
+            return
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        if baseline.get('ambiente', {}).get('banco') != resultado['ambiente']['banco']:
+            self.stdout.write(self.style.WARNING(
+                f'Baseline medido em {baseline.get("ambiente", {}).get("banco")}, '
+                f'resultados em {resultado["ambiente"]["banco"]}: as latências não são comparáveis'
+            ))
+
+        regressoes = comparar(resultado, baseline, tolerancia=options['tolerancia'])
+        if regressoes:
+            for regressao in regressoes:
+                self.stdout.write(self.style.ERROR(f'  {regressao}'))
+            raise CommandError(f'{len(regressoes)} regressões em relação ao baseline')
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação ao baseline'))
@@ -0,0 +1,110 @@
+"""
+Management command para gerar uma base sintética grande para testes de desempenho.
+Tudo é criado com bulk_create, em transações por lote (ver apps.core.carga):
+monitores, alunos com trilha, progresso, submissões, notas de saúde,
+contratos com parcelas em todos os status e notificações.
+
+A mesma semente gera os mesmos dados; as datas são relativas ao dia da execução.
+Os usuários gerados entram com a senha "carga123". Use um banco descartável:
+para recomeçar do zero, `python manage.py flush`. --workers divide os lotes
+entre processos e só deve passar de 1 no PostgreSQL.
+
+Uso:
+    python manage.py gerar_carga
+    python manage.py gerar_carga --alunos 100000 --monitores 200 --workers 8
+    python manage.py gerar_carga --alunos 5000 --seed 7 --prefixo turma7
+    python manage.py gerar_carga --mundos 3 --steps 5 --batch-size 2000
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.carga import carga_existe, gerar_carga
+
+
+class Command(BaseCommand):
+    help = 'Gera monitores, alunos e todos os dados relacionados para testes de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alunos',
+            type=int,
+            default=1000,
+            help='Quantidade de alunos (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--monitores',
+            type=int,
+            default=10,
+            help='Quantidade de monitores; os alunos são divididos entre eles (padrão: 10)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Semente do gerador: a mesma semente gera os mesmos dados (padrão: 42)'
+        )
+        parser.add_argument(
+            '--prefixo',
+            default='carga',
+            help='Prefixo dos e-mails gerados, para ter mais de uma carga no banco (padrão: carga)'
+        )
+        parser.add_argument(
+            '--mundos',
+            type=int,
+            default=6,
+            help='Mundos da trilha de cada aluno (padrão: 6)'
+        )
+        parser.add_argument(
+            '--steps',
+            type=int,
+            default=4,
+            help='Steps por mundo (padrão: 4)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Alunos gerados por transação (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processos gerando lotes em paralelo; acima de 1 só com PostgreSQL (padrão: 1)'
+        )
+
+    def handle(self, *args, **options):
+        for opcao in ('alunos', 'monitores', 'mundos', 'steps', 'batch_size', 'workers'):
+            if options[opcao] < 1:
+                raise CommandError(f'--{opcao.replace("_", "-")} deve ser maior que zero')
+        if carga_existe(options['prefixo']):
+            raise CommandError(
+                f"Já existe uma carga com o prefixo '{options['prefixo']}': use outro --prefixo ou limpe o banco"
+            )
+
+        self.stdout.write(self.style.NOTICE(
+            f'Gerando {options["alunos"]} alunos e {options["monitores"]} monitores (seed {options["seed"]})...'
+        ))
+
+        def progresso(feitos, total):
+            if options['verbosity'] >= 1:
+                self.stdout.write(f'  {feitos}/{total} alunos')
+
+        resultado = gerar_carga(
+            monitores=options['monitores'],
+            alunos=options['alunos'],
+            seed=options['seed'],
+            prefixo=options['prefixo'],
+            mundos=options['mundos'],
+            steps_por_mundo=options['steps'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            progresso=progresso,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.alunos} alunos, {resultado.monitores} monitores, {resultado.mundos} mundos, '
+            f'{resultado.steps} steps, {resultado.progressos} progressos, {resultado.submissoes} submissões, '
+            f'{resultado.notas} notas, {resultado.contratos} contratos, {resultado.parcelas} parcelas, '
+            f'{resultado.notificacoes} notificações em {resultado.duracao:.2f}s '
+            f'({resultado.linhas_por_segundo:.0f} linhas/s)'
+        ))
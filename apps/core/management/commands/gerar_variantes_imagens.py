@@ -0,0 +1,99 @@
+"""
+Management command para gerar as variantes WebP (thumb/medio) das imagens já enviadas:
+arquivos das submissões (submissoes/%Y/%m/) e fotos de perfil (fotos_usuarios/).
+O processamento das imagens roda em um pool de processos; o banco é atualizado
+só no processo principal, em lotes com bulk_update, e o cache da trilha dos
+alunos de cada lote é invalidado (bulk_update não dispara signals).
+
+Uso:
+    python manage.py gerar_variantes_imagens
+    python manage.py gerar_variantes_imagens --workers 4 --batch-size 200
+    python manage.py gerar_variantes_imagens --forcar
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.core.imagens import gerar_variantes, precisa_variantes
+from apps.trilha.cache import invalidar_alunos
+from apps.trilha.models import Submissao
+from apps.usuarios.models import Usuario
+
+
+# (model, campo do arquivo, campo das variantes, caminho até o aluno dono)
+ALVOS = [
+    (Submissao, 'arquivo', 'arquivo_variantes', 'progresso__aluno_id'),
+    (Usuario, 'foto', 'foto_variantes', 'pk'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes WebP das fotos de submissões e de perfil já existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 2,
+            help='Processos usados para redimensionar as imagens (padrão: núcleos da máquina)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Registros lidos e gravados por lote (padrão: 100)'
+        )
+        parser.add_argument(
+            '--forcar',
+            action='store_true',
+            help='Regera as variantes mesmo de arquivos já processados'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        # Os processos filhos não podem herdar conexões abertas com o banco:
+        # fecha tudo e sobe o pool (fork de todos os workers) antes da primeira query
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            pool.submit(os.getpid).result()
+            for model, campo_arquivo, campo_variantes, campo_aluno in ALVOS:
+                processados = self.processar(
+                    pool, model, campo_arquivo, campo_variantes, campo_aluno, options['batch_size'], options['forcar']
+                )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {processados} arquivos processados'
+                )
+
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(f'Variantes geradas em {duracao:.2f}s'))
+
+    def processar(self, pool, model, campo_arquivo, campo_variantes, campo_aluno, batch_size, forcar):
+        pendentes = model.objects.exclude(**{campo_arquivo: ''}).exclude(**{f'{campo_arquivo}__isnull': True})\
+            .only('pk', campo_arquivo, campo_variantes).order_by('pk')
+
+        processados = 0
+        ultimo_pk = 0
+        while True:
+            lote = list(pendentes.filter(pk__gt=ultimo_pk)[:batch_size])
+            if not lote:
+                return processados
+            ultimo_pk = lote[-1].pk
+
+            if not forcar:
+                lote = [
+                    obj for obj in lote
+                    if precisa_variantes(getattr(obj, campo_arquivo), getattr(obj, campo_variantes))
+                ]
+            nomes = [getattr(obj, campo_arquivo).name for obj in lote]
+
+            for obj, variantes in zip(lote, pool.map(gerar_variantes, nomes)):
+                setattr(obj, campo_variantes, variantes)
+            model.objects.bulk_update(lote, [campo_variantes])
+            invalidar_alunos(
+                model.objects.filter(pk__in=[obj.pk for obj in lote]).values_list(campo_aluno, flat=True)
+            )
+            processados += len(lote)
@@ -0,0 +1,54 @@
+"""
+Middleware do app Core.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from .orcamento import MedicaoQueries, OrcamentoExcedido
+
+logger = logging.getLogger(__name__)
+
+
+class OrcamentoQueriesMiddleware:
+    """
+    Mede as queries de cada request e confere contra o @orcamento_queries da view.
+
+    ORCAMENTO_QUERIES: "" desliga, "log" avisa no logger apps.core.middleware e
+    "erro" levanta OrcamentoExcedido. Ligado, a resposta ganha o header
+    Server-Timing com o total de queries e o tempo no banco.
+    Respostas em streaming só contam as queries feitas antes do primeiro byte.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        modo = getattr(settings, 'ORCAMENTO_QUERIES', '')
+        if not modo:
+            return self.get_response(request)
+
+        medicao = MedicaoQueries()
+        with connection.execute_wrapper(medicao):
+            response = self.get_response(request)
+        request.medicao_queries = medicao
+        response['Server-Timing'] = f'db;dur={medicao.tempo_ms:.1f};desc="{medicao.total} queries"'
+
+        view = request.resolver_match.func if request.resolver_match else None
+        orcamento = getattr(view, 'orcamento_queries', None)
+        if orcamento is None:
+            return response
+
+        nome = request.resolver_match.view_name
+        if orcamento.tempo_excedido(medicao):
+            logger.warning(
+                'View %s: %.1fms no banco (orçamento %.1fms)', nome, medicao.tempo_ms, orcamento.tempo_ms
+            )
+        excessos = orcamento.excessos(medicao)
+        if excessos:
+            mensagem = f'View {nome} estourou o orçamento de queries: ' + '; '.join(excessos)
+            if modo == 'erro':
+                raise OrcamentoExcedido(mensagem)
+            logger.warning(mensagem)
+        return response
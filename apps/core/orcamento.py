@@ -0,0 +1,87 @@
+"""
+Orçamento de queries por view e detector de N+1.
+
+Cada view declara quantas queries pode fazer com @orcamento_queries(n). Com
+ORCAMENTO_QUERIES ligado, o OrcamentoQueriesMiddleware (core.middleware) mede
+cada request: total de queries, tempo no banco e assinaturas repetidas (a mesma
+query com parâmetros diferentes, o sintoma do N+1). Estourou o orçamento:
+"log" registra um aviso, "erro" levanta OrcamentoExcedido (usado nos testes).
+"""
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+REPETICOES_PADRAO = 3
+
+_LISTA_PARAMETROS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMERO = re.compile(r'\b\d+\b')
+_TEXTO = re.compile(r"'(?:[^']|'')*'")
+
+
+class OrcamentoExcedido(Exception):
+    pass
+
+
+def assinatura_sql(sql):
+    """SQL sem os valores: listas IN de qualquer tamanho, números e textos viram marcadores."""
+    sql = _TEXTO.sub("'?'", sql)
+    sql = _LISTA_PARAMETROS.sub('(%s...)', sql)
+    return _NUMERO.sub('N', ' '.join(sql.split()))
+
+
+@dataclass
+class MedicaoQueries:
+    """execute_wrapper que conta as queries, soma o tempo e agrupa por assinatura."""
+    total: int = 0
+    tempo: float = 0.0
+    assinaturas: Counter = field(default_factory=Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.total += 1
+            self.assinaturas[assinatura_sql(sql)] += 1
+
+    @property
+    def tempo_ms(self):
+        return self.tempo * 1000
+
+    def repetidas(self, minimo=2):
+        """{assinatura: vezes} das queries executadas `minimo` vezes ou mais, da mais repetida à menos."""
+        return {sql: vezes for sql, vezes in self.assinaturas.most_common() if vezes >= minimo}
+
+
+@dataclass(frozen=True)
+class Orcamento:
+    queries: int
+    repeticoes: int = REPETICOES_PADRAO
+    tempo_ms: float | None = None
+
+    def excessos(self, medicao):
+        """Motivos do estouro de queries (vazio se está dentro do orçamento); tempo fica de fora."""
+        motivos = []
+        if medicao.total > self.queries:
+            motivos.append(f'{medicao.total} queries (orçamento {self.queries})')
+        for sql, vezes in medicao.repetidas(self.repeticoes + 1).items():
+            motivos.append(f'{vezes}x a mesma query (máximo {self.repeticoes}): {sql[:200]}')
+        return motivos
+
+    def tempo_excedido(self, medicao):
+        return self.tempo_ms is not None and medicao.tempo_ms > self.tempo_ms
+
+
+def orcamento_queries(queries, repeticoes=REPETICOES_PADRAO, tempo_ms=None):
+    """
+    Declara o orçamento da view: no máximo `queries` queries por request, nenhuma
+    assinatura repetida mais de `repeticoes` vezes e, opcionalmente, `tempo_ms` no
+    banco (tempo só gera aviso, nunca erro).
+    """
+    def decorator(view_func):
+        view_func.orcamento_queries = Orcamento(queries, repeticoes, tempo_ms)
+        return view_func
+
+    return decorator
@@ -0,0 +1,121 @@
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.comercial.contadores import recalcular_contadores
+from apps.financeiro.models import Parcela, ParcelaStatus
+from apps.trilha.models import AlunoSnapshot, NotaSaude, StatusProgresso, Submissao
+from apps.usuarios.models import RoleChoices, Usuario
+
+from .benchmark import ENDPOINTS, comparar, medir_endpoint, percentis, preparar_base, usuarios_do_benchmark
+from .carga import gerar_carga
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='mindhub-carga-'))
+class GerarCargaTests(TestCase):
+    def resumo(self, prefixo):
+        alunos = Usuario.objects.filter(email__startswith=f'{prefixo}.', role=RoleChoices.ALUNO)
+        submissoes = Submissao.objects.filter(progresso__aluno__in=alunos)
+        return {
+            'notas': list(
+                NotaSaude.objects.filter(aluno__in=alunos)
+                .order_by('aluno__nome', 'data')
+                .values_list('aluno__nome', 'nota', 'data')
+            ),
+            'submissoes': list(
+                submissoes.order_by('progresso__aluno__nome', 'progresso__step__titulo', 'data_envio')
+                .values_list('progresso__aluno__nome', 'progresso__step__titulo', 'aprovado', 'data_envio')
+            ),
+            'parcelas': list(
+                Parcela.objects.filter(contrato__aluno__in=alunos)
+                .order_by('contrato__aluno__nome', 'numero')
+                .values_list('contrato__aluno__nome', 'numero', 'valor', 'data_vencimento', 'data_pagamento', 'ativa')
+            ),
+        }
+
+    def test_mesma_semente_gera_os_mesmos_dados(self):
+        agora = timezone.now()
+        gerar_carga(monitores=2, alunos=30, seed=7, prefixo='a', batch_size=30, agora=agora)
+        gerar_carga(monitores=2, alunos=30, seed=7, prefixo='b', batch_size=7, agora=agora)
+        gerar_carga(monitores=2, alunos=30, seed=8, prefixo='c', batch_size=30, agora=agora)
+
+        self.assertEqual(self.resumo('a'), self.resumo('b'))
+        self.assertNotEqual(self.resumo('a')['parcelas'], self.resumo('c')['parcelas'])
+
+    def test_distribuicoes_e_dados_derivados(self):
+        resultado = gerar_carga(monitores=3, alunos=200, seed=1, batch_size=50)
+
+        self.assertEqual(resultado.alunos, 200)
+        self.assertEqual(resultado.steps, 200 * 24)
+        self.assertEqual(AlunoSnapshot.objects.count(), 200)
+
+        status_parcelas = Counter(parcela.get_status() for parcela in Parcela.objects.select_related('contrato'))
+        self.assertEqual(set(status_parcelas), set(ParcelaStatus.values))
+        self.assertEqual(
+            set(Submissao.objects.values_list('progresso__status', flat=True)),
+            {StatusProgresso.CONCLUIDO, StatusProgresso.PENDENTE_VALIDACAO, StatusProgresso.EM_ANDAMENTO},
+        )
+        self.assertTrue(Submissao.objects.filter(arquivo='submissoes/carga/placeholder.png').exists())
+        # As datas sorteadas sobrevivem ao auto_now_add
+        self.assertGreater(len(set(NotaSaude.objects.values_list('data', flat=True))), 1)
+        # Os contadores dos monitores já batem com o que seria calculado do zero
+        monitores = Usuario.objects.filter(role=RoleChoices.MONITOR).values_list('id', flat=True)
+        self.assertEqual(recalcular_contadores(monitores), (3, 0))
+
+    def test_comando_recusa_prefixo_repetido(self):
+        saida = StringIO()
+        call_command('gerar_carga', alunos=5, monitores=1, stdout=saida)
+        self.assertIn('5 alunos', saida.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('gerar_carga', alunos=5, monitores=1, stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='mindhub-benchmark-'))
+class BenchmarkTests(TestCase):
+    def resultado(self, **endpoints):
+        return {'resultados': {'medio': endpoints}}
+
+    def test_percentis(self):
+        medicao = percentis([0.001 * valor for valor in range(1, 101)])
+        self.assertAlmostEqual(medicao['p50_ms'], 50.5)
+        self.assertAlmostEqual(medicao['p95_ms'], 95.05)
+        self.assertAlmostEqual(medicao['media_ms'], 50.5)
+
+    def test_comparar_com_baseline(self):
+        baseline = self.resultado(
+            lento={'p50_ms': 100.0, 'p95_ms': 120.0, 'queries': 4},
+            rapido={'p50_ms': 2.0, 'p95_ms': 3.0, 'queries': 6},
+        )
+        dentro = self.resultado(
+            lento={'p50_ms': 124.0, 'p95_ms': 400.0, 'queries': 4},
+            rapido={'p50_ms': 6.5, 'p95_ms': 30.0, 'queries': 5},
+            novo={'p50_ms': 999.0, 'p95_ms': 999.0, 'queries': 99},
+        )
+        self.assertEqual(comparar(dentro, baseline, tolerancia=0.25, folga_ms=5.0), [])
+
+        fora = self.resultado(
+            lento={'p50_ms': 126.0, 'p95_ms': 120.0, 'queries': 5},
+            rapido={'p50_ms': 7.5, 'p95_ms': 8.0, 'queries': 6},
+        )
+        self.assertEqual(
+            comparar(fora, baseline, tolerancia=0.25, folga_ms=5.0),
+            [
+                'medio/lento: 5 queries (baseline 4)',
+                'medio/lento: p50 126.0ms (baseline 100.0ms, limite 125.0ms)',
+                'medio/rapido: p50 7.5ms (baseline 2.0ms, limite 7.0ms)',
+            ],
+        )
+
+    def test_mede_os_endpoints_numa_base_pequena(self):
+        preparar_base('pequeno')
+        monitor, aluno = usuarios_do_benchmark()
+        self.assertIsNotNone(aluno)
+        for endpoint in ENDPOINTS:
+            medicao = medir_endpoint(endpoint, monitor, aluno, repeticoes=2, aquecimento=1)
+            self.assertGreater(medicao['queries'], 0)
+            self.assertLessEqual(medicao['p50_ms'], medicao['p95_ms'])
@@ -24,8 +24,8 @@ class ParcelaInline(admin.TabularInline):
 
 @admin.register(Contrato)
 class ContratoAdmin(admin.ModelAdmin):
-    list_display = ("id", "aluno", "valor_total_negociado", "data_assinatura", "metodo_pagamento", "status", "asaas_customer_id")
-    list_filter = ("status", "metodo_pagamento", "data_assinatura")
+    list_display = ("id", "aluno", "valor_total_negociado", "data_assinatura", "metodo_pagamento", "status", "status_principal", "saldo_devedor", "bloqueado_financeiro", "asaas_customer_id")
+    list_filter = ("status", "status_principal", "bloqueado_financeiro", "metodo_pagamento", "data_assinatura")
     search_fields = ("aluno__nome", "aluno__email")
     inlines = [ParcelaInline]
 
@@ -4,13 +4,13 @@ from django.shortcuts import redirect
 
 from apps.usuarios.utils import get_usuario_logado
 
-from .services import possui_bloqueio_trilha, sincronizar_nota_saude_financeira
+from .services import possui_bloqueio_trilha
 
 
 def verificar_inadimplencia(usuario) -> bool:
+    # Só leitura: o bloqueio é mantido pelos signals e pelo comando atualizar_bloqueios_financeiros
     if not usuario:
         return False
-    sincronizar_nota_saude_financeira(usuario)
     return possui_bloqueio_trilha(usuario)
 
 
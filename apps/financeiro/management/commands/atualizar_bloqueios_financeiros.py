@@ -0,0 +1,63 @@
+"""
+Management command que recalcula o bloqueio financeiro dos contratos
+(Contrato.bloqueado_financeiro, lido pelo decorator bloquear_inadimplente) e o
+resumo persistido no contrato (status_principal, dias_atraso_maximo...).
+
+Salvar parcela ou contrato já atualiza bloqueio e resumo (ver signals); este
+comando cobre o que muda só com a passagem do tempo: parcelas que vão de
+PENDENTE para ATRASADO (nota de saúde financeira) e de ATRASADO para
+INADIMPLENTE, e os dias de atraso que crescem a cada dia. A nota de saúde
+usa o mesmo lote do comando sincronizar_saude_financeira.
+Deve ser executado diariamente à meia-noite no horário local (TIME_ZONE).
+
+Uso:
+    python manage.py atualizar_bloqueios_financeiros
+    python manage.py atualizar_bloqueios_financeiros --data 2025-01-31
+
+Cron (servidor em UTC):
+    CRON_TZ=America/Sao_Paulo
+    0 0 * * * python manage.py atualizar_bloqueios_financeiros
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from apps.financeiro.services import (
+    atualizar_bloqueio_financeiro,
+    atualizar_resumo_contratos,
+    hoje_local,
+    sincronizar_saude_financeira,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recalcula bloqueio e resumo financeiro dos contratos e a nota de saúde de quem tem parcela vencida'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data',
+            help='Data de referência (AAAA-MM-DD); padrão: hoje no horário local'
+        )
+
+    def handle(self, *args, **options):
+        if options['data']:
+            referencia = parse_date(options['data'])
+            if referencia is None:
+                raise CommandError(f"Data inválida em --data: '{options['data']}' (use AAAA-MM-DD)")
+        else:
+            referencia = hoje_local()
+
+        self.stdout.write(self.style.NOTICE(f'Atualizando bloqueios financeiros em {referencia.strftime("%d/%m/%Y")}...'))
+
+        with transaction.atomic():
+            bloqueados, desbloqueados = atualizar_bloqueio_financeiro(referencia=referencia)
+            resumos = atualizar_resumo_contratos(referencia=referencia)
+
+        notas = sincronizar_saude_financeira(referencia)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Contratos bloqueados: {bloqueados}, desbloqueados: {desbloqueados}; '
+                f'resumos recalculados: {resumos}; notas de saúde financeira criadas: {notas}'
+            )
+        )
@@ -0,0 +1,42 @@
+"""
+Management command que grava a nota de saúde 1 (automática) dos alunos com
+parcela vencida em aberto, em lote (services.sincronizar_saude_financeira).
+
+Salvar parcela ou contrato já grava a nota do aluno afetado (ver signals); o
+comando cobre quem passou a ter parcela vencida só com a passagem do tempo e
+pode rodar quantas vezes for preciso: quem já está com nota 1 fica de fora.
+O atualizar_bloqueios_financeiros da meia-noite já roda o mesmo lote.
+
+Uso:
+    python manage.py sincronizar_saude_financeira
+    python manage.py sincronizar_saude_financeira --data 2025-01-31
+
+Cron (servidor em UTC), de hora em hora:
+    CRON_TZ=America/Sao_Paulo
+    0 * * * * python manage.py sincronizar_saude_financeira
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.financeiro.services import hoje_local, sincronizar_saude_financeira
+
+
+class Command(BaseCommand):
+    help = 'Grava a nota de saúde 1 dos alunos com parcela vencida que ainda não estão com ela'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data',
+            help='Data de referência (AAAA-MM-DD); padrão: hoje no horário local'
+        )
+
+    def handle(self, *args, **options):
+        if options['data']:
+            referencia = parse_date(options['data'])
+            if referencia is None:
+                raise CommandError(f"Data inválida em --data: '{options['data']}' (use AAAA-MM-DD)")
+        else:
+            referencia = hoje_local()
+
+        notas = sincronizar_saude_financeira(referencia)
+        self.stdout.write(self.style.SUCCESS(f'Notas de saúde financeira criadas: {notas}'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:37
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+
+def calcular_bloqueios(apps, schema_editor):
+    Contrato = apps.get_model('financeiro', 'Contrato')
+    Parcela = apps.get_model('financeiro', 'Parcela')
+    limite = timezone.localdate() - timedelta(days=7)
+    inadimplente = Parcela.objects.filter(
+        contrato=OuterRef('pk'),
+        ativa=True,
+        data_pagamento__isnull=True,
+        data_vencimento__lt=limite,
+    )
+    Contrato.objects.filter(Exists(inadimplente), status='ATIVO').update(bloqueado_financeiro=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0004_parcela_ja_renegociada_parcela_parcela_origem_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contrato',
+            name='bloqueado_financeiro',
+            field=models.BooleanField(default=False, editable=False, help_text='Contrato ativo com parcela inadimplente; mantido por services.atualizar_bloqueio_financeiro'),
+        ),
+        migrations.RunPython(calcular_bloqueios, migrations.RunPython.noop),
+    ]
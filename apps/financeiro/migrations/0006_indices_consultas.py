@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0005_contrato_bloqueado_financeiro'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parcela',
+            index=models.Index(fields=['contrato', 'ativa', 'data_vencimento'], name='parcela_ativa_vencimento_idx'),
+        ),
+        migrations.AlterField(
+            model_name='parcela',
+            name='contrato',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='parcelas', to='financeiro.contrato'),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:04
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calcular_resumos(apps, schema_editor):
+    """Mesma regra de services.atualizar_resumo_contratos, contrato a contrato."""
+    Contrato = apps.get_model('financeiro', 'Contrato')
+    Parcela = apps.get_model('financeiro', 'Parcela')
+    hoje = timezone.localdate()
+    agora = timezone.now()
+    parcelas_por_contrato = {}
+    for parcela in Parcela.objects.filter(ativa=True).order_by('data_vencimento', 'numero'):
+        parcelas_por_contrato.setdefault(parcela.contrato_id, []).append(parcela)
+
+    contratos = list(Contrato.objects.all())
+    for contrato in contratos:
+        parcelas = parcelas_por_contrato.get(contrato.id, [])
+        em_aberto = [parcela for parcela in parcelas if not parcela.data_pagamento]
+        cancelado = contrato.status == 'CANCELADO'
+        if cancelado:
+            proxima = parcelas[0] if parcelas else None
+        else:
+            proxima = em_aberto[0] if em_aberto else (parcelas[-1] if parcelas else None)
+
+        dias = 0
+        if cancelado:
+            status = 'CANCELADO'
+        elif proxima is None or proxima.data_pagamento:
+            status = 'PAGO'
+        elif hoje <= proxima.data_vencimento:
+            status = 'PENDENTE'
+        else:
+            dias = (hoje - proxima.data_vencimento).days
+            status = 'ATRASADO' if dias <= 7 else 'INADIMPLENTE'
+
+        contrato.proxima_parcela = proxima
+        contrato.proxima_parcela_vencimento = proxima.data_vencimento if proxima else None
+        contrato.saldo_devedor = Decimal('0.00') if cancelado else sum((p.valor for p in em_aberto), Decimal('0.00'))
+        contrato.status_principal = status
+        contrato.dias_atraso_maximo = dias
+        contrato.resumo_referencia = hoje
+        contrato.resumo_atualizado_em = agora
+
+    Contrato.objects.bulk_update(
+        contratos,
+        [
+            'proxima_parcela',
+            'proxima_parcela_vencimento',
+            'saldo_devedor',
+            'status_principal',
+            'dias_atraso_maximo',
+            'resumo_referencia',
+            'resumo_atualizado_em',
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0006_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contrato',
+            name='dias_atraso_maximo',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='proxima_parcela',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Parcela de referência: a ativa em aberto mais antiga; sem nenhuma, a última ativa (a primeira, se o contrato está cancelado)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='financeiro.parcela'),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='proxima_parcela_vencimento',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='resumo_atualizado_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='resumo_referencia',
+            field=models.DateField(blank=True, editable=False, help_text='Data usada para calcular status_principal e dias_atraso_maximo', null=True),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='saldo_devedor',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Soma das parcelas ativas em aberto (zero se cancelado)', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='status_principal',
+            field=models.CharField(choices=[('PAGO', 'Pago'), ('PENDENTE', 'Pendente'), ('ATRASADO', 'Atrasado'), ('INADIMPLENTE', 'Inadimplente'), ('CANCELADA_RENEGOCIACAO', 'Cancelada (renegociacao)'), ('CANCELADO', 'Cancelado')], default='PAGO', editable=False, help_text='Status mais grave entre as parcelas ativas em resumo_referencia', max_length=30),
+        ),
+        migrations.RunPython(calcular_resumos, migrations.RunPython.noop),
+    ]
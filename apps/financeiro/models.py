@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+from datetime import timedelta
+
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
+DIAS_TOLERANCIA_ATRASO = 7
+
 
 class ContratoStatus(models.TextChoices):
     ATIVO = "ATIVO", "Ativo"
@@ -42,6 +46,79 @@ class ParcelaStatus(models.TextChoices):
     CANCELADO = "CANCELADO", "Cancelado"
 
 
+# Ordem de gravidade usada para escolher o status principal e a parcela de referência do contrato
+PRIORIDADE_STATUS = [ParcelaStatus.INADIMPLENTE, ParcelaStatus.ATRASADO, ParcelaStatus.PENDENTE]
+
+
+class DiasDesde(models.Func):
+    """Dias corridos de `data` até `referencia` (referencia - data), como inteiro."""
+
+    output_field = models.IntegerField()
+
+    def __init__(self, data, referencia, **extra):
+        super().__init__(models.Value(referencia, output_field=models.DateField()), data, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date já é a diferença em dias
+        return super().as_sql(compiler, connection, template="(%(expressions)s)", arg_joiner=" - ", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler,
+            connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+
+def expressao_status_parcela(referencia=None) -> models.Case:
+    """Parcela.get_status em SQL (CASE) para a data de referência; serve para anotar, filtrar e agregar."""
+    referencia = referencia or timezone.localdate()
+    return models.Case(
+        models.When(contrato__status=ContratoStatus.CANCELADO, then=models.Value(ParcelaStatus.CANCELADO)),
+        models.When(ativa=False, ja_renegociada=True, then=models.Value(ParcelaStatus.CANCELADA_RENEGOCIACAO)),
+        models.When(ativa=False, then=models.Value(ParcelaStatus.CANCELADO)),
+        models.When(data_pagamento__isnull=False, then=models.Value(ParcelaStatus.PAGO)),
+        models.When(data_vencimento__gte=referencia, then=models.Value(ParcelaStatus.PENDENTE)),
+        models.When(
+            data_vencimento__gte=referencia - timedelta(days=DIAS_TOLERANCIA_ATRASO),
+            then=models.Value(ParcelaStatus.ATRASADO),
+        ),
+        default=models.Value(ParcelaStatus.INADIMPLENTE),
+        output_field=models.CharField(max_length=30),
+    )
+
+
+class ParcelaQuerySet(models.QuerySet):
+    def com_status(self, referencia=None):
+        """
+        Anota `status` (Parcela.get_status) e `dias_em_atraso` (Parcela.dias_atraso)
+        calculados no banco para a data de referência; os dois valem em filter e order_by.
+        """
+        referencia = referencia or timezone.localdate()
+        return self.annotate(status=expressao_status_parcela(referencia)).annotate(
+            dias_em_atraso=models.Case(
+                models.When(
+                    status__in=[ParcelaStatus.ATRASADO, ParcelaStatus.INADIMPLENTE],
+                    then=DiasDesde("data_vencimento", referencia),
+                ),
+                default=models.Value(0),
+            )
+        )
+
+    def por_gravidade(self):
+        """Ordena pelo status anotado em com_status (PRIORIDADE_STATUS) e depois por vencimento."""
+        return self.order_by(
+            models.Case(
+                *(models.When(status=status, then=models.Value(ordem)) for ordem, status in enumerate(PRIORIDADE_STATUS)),
+                default=models.Value(len(PRIORIDADE_STATUS)),
+            ),
+            "data_vencimento",
+            "numero",
+        )
+
+
 class Contrato(models.Model):
     aluno = models.OneToOneField(
         "usuarios.Usuario",
@@ -78,6 +155,46 @@ class Contrato(models.Model):
         related_name="contratos_criados",
     )
     atualizado_em = models.DateTimeField(auto_now=True)
+    bloqueado_financeiro = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Contrato ativo com parcela inadimplente; mantido por services.atualizar_bloqueio_financeiro",
+    )
+    # Resumo mantido por services.atualizar_resumo_contratos (signals de parcela e
+    # contrato e o comando diário atualizar_bloqueios_financeiros)
+    status_principal = models.CharField(
+        max_length=30,
+        choices=ParcelaStatus.choices,
+        default=ParcelaStatus.PAGO,
+        editable=False,
+        help_text="Status mais grave entre as parcelas ativas em resumo_referencia",
+    )
+    saldo_devedor = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="Soma das parcelas ativas em aberto (zero se cancelado)",
+    )
+    proxima_parcela = models.ForeignKey(
+        "Parcela",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        help_text="Parcela de referência: a ativa em aberto mais antiga; sem nenhuma, a última ativa "
+        "(a primeira, se o contrato está cancelado)",
+    )
+    proxima_parcela_vencimento = models.DateField(null=True, blank=True, editable=False)
+    dias_atraso_maximo = models.PositiveIntegerField(default=0, editable=False)
+    resumo_referencia = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Data usada para calcular status_principal e dias_atraso_maximo",
+    )
+    resumo_atualizado_em = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Contrato"
@@ -90,37 +207,87 @@ class Contrato(models.Model):
         if self.aluno and not self.aluno.is_aluno:
             raise ValidationError("Apenas usuarios com role ALUNO podem ter contrato.")
 
+    def resumo_na_data(self, referencia=None):
+        """
+        (status principal, parcela de referência, dias de atraso) a partir do
+        resumo persistido, sem consultar o banco quando proxima_parcela veio com
+        select_related. Qual é a parcela de referência não depende da data, só o
+        status dela; então vale para qualquer data, não só resumo_referencia.
+        """
+        parcela = self.proxima_parcela
+        if parcela is None:
+            status = ParcelaStatus.CANCELADO if self.status == ContratoStatus.CANCELADO else ParcelaStatus.PAGO
+            return status, None, 0
+        parcela.contrato = self  # get_status e dias_atraso leem o contrato
+        return parcela.get_status(referencia), parcela, parcela.dias_atraso(referencia)
+
+    def _parcelas_prefetch(self):
+        return getattr(self, "_prefetched_objects_cache", {}).get("parcelas")
+
     def parcelas_ordenadas(self):
-        return self.parcelas.filter(ativa=True).order_by("data_vencimento", "numero")
+        """Parcelas ativas por vencimento; com prefetch de "parcelas" não consulta o banco."""
+        prefetch = self._parcelas_prefetch()
+        if prefetch is not None:
+            return sorted(
+                (parcela for parcela in prefetch if parcela.ativa),
+                key=lambda parcela: (parcela.data_vencimento, parcela.numero),
+            )
+        return list(self.parcelas.filter(ativa=True).order_by("data_vencimento", "numero"))
+
+    # Os métodos abaixo usam as parcelas já carregadas quando há prefetch e, sem
+    # ele, filtram pelo status anotado (Parcela.objects.com_status) no banco.
 
     def parcelas_por_status(self, status: str, referencia=None):
-        return [
-            parcela
-            for parcela in self.parcelas_ordenadas()
-            if parcela.get_status(referencia) == status
-        ]
+        if self._parcelas_prefetch() is not None:
+            return [
+                parcela
+                for parcela in self.parcelas_ordenadas()
+                if parcela.get_status(referencia) == status
+            ]
+        return list(
+            self.parcelas.com_status(referencia).filter(ativa=True, status=status).order_by("data_vencimento", "numero")
+        )
 
     def possui_status(self, status: str, referencia=None) -> bool:
-        return any(
-            parcela.get_status(referencia) == status
-            for parcela in self.parcelas_ordenadas()
+        if self._parcelas_prefetch() is not None:
+            return any(
+                parcela.get_status(referencia) == status
+                for parcela in self.parcelas_ordenadas()
+            )
+        return self.parcelas.com_status(referencia).filter(ativa=True, status=status).exists()
+
+    def parcela_mais_grave(self, referencia=None):
+        """
+        Parcela ativa de status mais grave (PRIORIDADE_STATUS), a de vencimento
+        mais antigo entre as de mesmo status; None se não há nenhuma em aberto.
+        """
+        if self._parcelas_prefetch() is not None:
+            status_por_parcela = [(parcela, parcela.get_status(referencia)) for parcela in self.parcelas_ordenadas()]
+            for status in PRIORIDADE_STATUS:
+                for parcela, status_parcela in status_por_parcela:
+                    if status_parcela == status:
+                        return parcela
+            return None
+        return (
+            self.parcelas.com_status(referencia)
+            .filter(ativa=True, status__in=PRIORIDADE_STATUS)
+            .por_gravidade()
+            .first()
         )
 
     def parcela_referencia(self, referencia=None):
-        if self.status == ContratoStatus.CANCELADO:
-            return self.parcelas_ordenadas().first()
+        if self.status != ContratoStatus.CANCELADO:
+            parcela = self.parcela_mais_grave(referencia)
+            if parcela:
+                return parcela
 
-        prioridades = [
-            ParcelaStatus.INADIMPLENTE,
-            ParcelaStatus.ATRASADO,
-            ParcelaStatus.PENDENTE,
-        ]
-        for status in prioridades:
-            parcelas = self.parcelas_por_status(status, referencia)
-            if parcelas:
-                return parcelas[0]
-
-        return self.parcelas_ordenadas().last()
+        if self._parcelas_prefetch() is not None:
+            parcelas = self.parcelas_ordenadas()
+            if not parcelas:
+                return None
+            return parcelas[0] if self.status == ContratoStatus.CANCELADO else parcelas[-1]
+        ativas = self.parcelas.filter(ativa=True).order_by("data_vencimento", "numero")
+        return ativas.first() if self.status == ContratoStatus.CANCELADO else ativas.last()
 
 
 class Parcela(models.Model):
@@ -128,6 +295,7 @@ class Parcela(models.Model):
         Contrato,
         on_delete=models.CASCADE,
         related_name="parcelas",
+        db_index=False,  # coberto por unique_together e parcela_ativa_vencimento_idx
     )
     numero = models.IntegerField(help_text="Número da parcela (1, 2, 3...)")
     valor = models.DecimalField(max_digits=10, decimal_places=2)
@@ -163,11 +331,17 @@ class Parcela(models.Model):
     )
     ja_renegociada = models.BooleanField(default=False)
 
+    objects = ParcelaQuerySet.as_manager()
+
     class Meta:
         ordering = ["data_vencimento", "numero"]
         verbose_name = "Parcela"
         verbose_name_plural = "Parcelas"
         unique_together = ["contrato", "numero"]
+        indexes = [
+            # Parcelas ativas do contrato por vencimento (parcelas_ordenadas, bloqueio financeiro)
+            models.Index(fields=["contrato", "ativa", "data_vencimento"], name="parcela_ativa_vencimento_idx"),
+        ]
 
     def __str__(self):
         return f"Parcela {self.numero} - Contrato {self.contrato.id}"
@@ -187,7 +361,7 @@ class Parcela(models.Model):
             return ParcelaStatus.PENDENTE
 
         dias = (referencia - self.data_vencimento).days
-        if 1 <= dias <= 7:
+        if 1 <= dias <= DIAS_TOLERANCIA_ATRASO:
             return ParcelaStatus.ATRASADO
         return ParcelaStatus.INADIMPLENTE
 
@@ -7,13 +7,22 @@ from datetime import date, timedelta
 from decimal import Decimal
 from urllib.parse import quote
 
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, Exists, OuterRef, Q, QuerySet, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils.dateparse import parse_date
 from django.utils import timezone
 
 from apps.usuarios.models import RoleChoices, Usuario
 
-from .models import Contrato, ContratoStatus, Parcela, ParcelaStatus
+from .models import (
+    DIAS_TOLERANCIA_ATRASO,
+    Contrato,
+    ContratoStatus,
+    Parcela,
+    ParcelaStatus,
+    expressao_status_parcela,
+)
 
 PIX_MINDHUB = "biancafraga.mentoria@gmail.com"
 OBSERVACAO_NOTA_FINANCEIRA = (
@@ -179,19 +188,21 @@ def periodo_opcoes() -> list[dict[str, str]]:
     ]
 
 
+def queryset_alunos_financeiros(usuario: Usuario) -> QuerySet:
+    """Alunos ativos visíveis no financeiro: todos para o admin, só os dele para o monitor."""
+    queryset = Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True)
+    if usuario.is_monitor:
+        queryset = queryset.filter(monitor_responsavel=usuario)
+    return queryset
+
+
 def alunos_financeiros(usuario: Usuario) -> list[Usuario]:
-    parcelas_prefetch = Prefetch(
-        "contrato__parcelas",
-        queryset=Parcela.objects.filter(ativa=True).order_by("data_vencimento", "numero"),
-    )
+    """Alunos com contrato e parcela de referência numa query só (ver Contrato.resumo_na_data)."""
     queryset = (
-        Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True)
-        .select_related("monitor_responsavel", "contrato")
-        .prefetch_related(parcelas_prefetch)
+        queryset_alunos_financeiros(usuario)
+        .select_related("monitor_responsavel", "contrato", "contrato__proxima_parcela")
         .order_by("nome", "email")
     )
-    if usuario.is_monitor:
-        queryset = queryset.filter(monitor_responsavel=usuario)
     return list(queryset)
 
 
@@ -200,13 +211,8 @@ def status_principal_contrato(contrato, referencia: date | None = None) -> str:
         return "SEM_CONTRATO"
     if contrato.status == ContratoStatus.CANCELADO:
         return ParcelaStatus.CANCELADO
-    if contrato.possui_status(ParcelaStatus.INADIMPLENTE, referencia):
-        return ParcelaStatus.INADIMPLENTE
-    if contrato.possui_status(ParcelaStatus.ATRASADO, referencia):
-        return ParcelaStatus.ATRASADO
-    if contrato.possui_status(ParcelaStatus.PENDENTE, referencia):
-        return ParcelaStatus.PENDENTE
-    return ParcelaStatus.PAGO
+    parcela = contrato.parcela_mais_grave(referencia)
+    return parcela.get_status(referencia) if parcela else ParcelaStatus.PAGO
 
 
 def sincronizar_nota_saude_financeira(aluno: Usuario, referencia: date | None = None) -> bool:
@@ -218,9 +224,9 @@ def sincronizar_nota_saude_financeira(aluno: Usuario, referencia: date | None =
         return False
 
     referencia = referencia or hoje_local()
-    if not contrato.possui_status(ParcelaStatus.ATRASADO, referencia) and not contrato.possui_status(
-        ParcelaStatus.INADIMPLENTE, referencia
-    ):
+    # Vencida e em aberto: ATRASADO ou INADIMPLENTE em get_status
+    vencidas = contrato.parcelas.filter(ativa=True, data_pagamento__isnull=True, data_vencimento__lt=referencia)
+    if not vencidas.exists():
         return False
 
     from apps.trilha.models import NotaSaude
@@ -238,28 +244,158 @@ def sincronizar_nota_saude_financeira(aluno: Usuario, referencia: date | None =
     return True
 
 
-def possui_bloqueio_trilha(aluno: Usuario, referencia: date | None = None) -> bool:
-    if not aluno or not aluno.is_aluno:
-        return False
+def sincronizar_saude_financeira(referencia: date | None = None) -> int:
+    """
+    Versão em lote de sincronizar_nota_saude_financeira: uma query encontra os
+    alunos com contrato ativo e parcela vencida em aberto (ATRASADO ou
+    INADIMPLENTE) cuja nota atual não é 1, e um bulk_create grava a nota 1
+    automática de todos eles. Idempotente: quem já está com nota 1 fica de fora.
+    Retorna quantas notas foram criadas.
+    """
+    from apps.trilha.cache import invalidar_alunos
+    from apps.trilha.models import NotaSaude
+    from apps.trilha.services import atualizar_snapshots
 
-    contrato = getattr(aluno, "contrato", None)
-    if not contrato or contrato.status == ContratoStatus.CANCELADO:
-        return False
+    referencia = referencia or hoje_local()
+    vencida = Parcela.objects.filter(
+        contrato__aluno=OuterRef("pk"),
+        ativa=True,
+        data_pagamento__isnull=True,
+        data_vencimento__lt=referencia,
+    )
+    nota_atual = NotaSaude.objects.filter(aluno=OuterRef("pk")).order_by("-data").values("nota")[:1]
+    aluno_ids = list(
+        Usuario.objects.filter(Exists(vencida), role=RoleChoices.ALUNO, contrato__status=ContratoStatus.ATIVO)
+        .alias(nota_atual=Subquery(nota_atual))
+        .filter(Q(nota_atual__isnull=True) | ~Q(nota_atual=1))
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    if not aluno_ids:
+        return 0
+
+    with transaction.atomic():
+        NotaSaude.objects.bulk_create(
+            [
+                NotaSaude(aluno_id=aluno_id, nota=1, automatica=True, observacao=OBSERVACAO_NOTA_FINANCEIRA)
+                for aluno_id in aluno_ids
+            ]
+        )
+        # bulk_create não dispara os signals da trilha
+        atualizar_snapshots(aluno_ids)
+        invalidar_alunos(aluno_ids)
+    return len(aluno_ids)
+
+
+def filtro_parcelas_inadimplentes(referencia: date | None = None) -> Q:
+    """Mesma regra de Parcela.get_status para INADIMPLENTE, em forma de filtro."""
+    referencia = referencia or hoje_local()
+    return Q(
+        ativa=True,
+        data_pagamento__isnull=True,
+        data_vencimento__lt=referencia - timedelta(days=DIAS_TOLERANCIA_ATRASO),
+    )
+
+
+def filtro_parcelas_atrasadas(referencia: date | None = None) -> Q:
+    """Mesma regra de Parcela.get_status para ATRASADO (vencida dentro da tolerância), em forma de filtro."""
+    referencia = referencia or hoje_local()
+    return Q(
+        ativa=True,
+        data_pagamento__isnull=True,
+        data_vencimento__range=(referencia - timedelta(days=DIAS_TOLERANCIA_ATRASO), referencia - timedelta(days=1)),
+    )
+
+
+def atualizar_bloqueio_financeiro(contratos=None, referencia: date | None = None) -> tuple[int, int]:
+    """
+    Recalcula Contrato.bloqueado_financeiro dos contratos informados (ids ou queryset),
+    ou de todos, com um UPDATE para bloquear e outro para desbloquear.
+    Retorna (bloqueados, desbloqueados), contando só os que mudaram de estado.
+    """
+    queryset = Contrato.objects.all() if contratos is None else Contrato.objects.filter(pk__in=contratos)
+    inadimplente = Exists(
+        Parcela.objects.filter(filtro_parcelas_inadimplentes(referencia), contrato=OuterRef("pk"))
+    )
+    bloqueados = queryset.filter(inadimplente, status=ContratoStatus.ATIVO, bloqueado_financeiro=False).update(
+        bloqueado_financeiro=True
+    )
+    desbloqueados = (
+        queryset.filter(bloqueado_financeiro=True)
+        .filter(~inadimplente | ~Q(status=ContratoStatus.ATIVO))
+        .update(bloqueado_financeiro=False)
+    )
+    return bloqueados, desbloqueados
+
+
+def atualizar_resumo_contratos(contratos=None, referencia: date | None = None) -> int:
+    """
+    Recalcula o resumo persistido no Contrato (proxima_parcela e vencimento,
+    saldo_devedor, status_principal, dias_atraso_maximo) dos contratos informados
+    (ids ou queryset), ou de todos, para a data de referência, com dois UPDATE.
+    Retorna quantos contratos foram atualizados.
 
+    A parcela de referência é a ativa em aberto mais antiga: o status de uma
+    parcela em aberto só depende do vencimento, então ela é também a de status
+    mais grave (a mesma de Contrato.parcela_referencia).
+    """
     referencia = referencia or hoje_local()
-    return contrato.possui_status(ParcelaStatus.INADIMPLENTE, referencia)
+    queryset = Contrato.objects.all() if contratos is None else Contrato.objects.filter(pk__in=contratos)
+    cancelado = Q(status=ContratoStatus.CANCELADO)
+    ativas = Parcela.objects.filter(contrato=OuterRef("pk"), ativa=True)
+    em_aberto = ativas.filter(data_pagamento__isnull=True)
+    saldo = em_aberto.order_by().values("contrato").annotate(total=Sum("valor")).values("total")
+
+    atualizados = queryset.update(
+        proxima_parcela=Case(
+            When(cancelado, then=Subquery(ativas.order_by("data_vencimento", "numero").values("pk")[:1])),
+            default=Coalesce(
+                Subquery(em_aberto.order_by("data_vencimento", "numero").values("pk")[:1]),
+                Subquery(ativas.order_by("-data_vencimento", "-numero").values("pk")[:1]),
+            ),
+        ),
+        saldo_devedor=Case(
+            When(cancelado, then=Value(ZERO)),
+            default=Coalesce(Subquery(saldo), Value(ZERO)),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        resumo_referencia=referencia,
+        resumo_atualizado_em=timezone.now(),
+    )
+
+    # O UPDATE enxerga os valores antigos das colunas: o que depende da nova
+    # proxima_parcela vai num segundo UPDATE
+    proxima = Parcela.objects.com_status(referencia).filter(pk=OuterRef("proxima_parcela_id"))
+    queryset.update(
+        proxima_parcela_vencimento=Subquery(proxima.values("data_vencimento")),
+        status_principal=Case(
+            When(cancelado, then=Value(ParcelaStatus.CANCELADO)),
+            default=Coalesce(Subquery(proxima.values("status")), Value(ParcelaStatus.PAGO)),
+        ),
+        dias_atraso_maximo=Coalesce(Subquery(proxima.values("dias_em_atraso")), 0),
+    )
+    return atualizados
+
+
+def possui_bloqueio_trilha(aluno: Usuario) -> bool:
+    """Lê o bloqueio já calculado do contrato do aluno (ver atualizar_bloqueio_financeiro)."""
+    if not aluno or not aluno.is_aluno:
+        return False
+    return Contrato.objects.filter(aluno_id=aluno.id, bloqueado_financeiro=True).exists()
 
 
 def resumo_aluno_financeiro(aluno: Usuario, referencia: date | None = None) -> dict[str, object]:
     referencia = referencia or hoje_local()
     contrato = getattr(aluno, "contrato", None)
     monitor = aluno.monitor_responsavel
-    status_codigo = status_principal_contrato(contrato, referencia)
+    if contrato and contrato.resumo_atualizado_em:
+        status_codigo, parcela_atual, dias_atraso = contrato.resumo_na_data(referencia)
+    else:
+        # Contrato cujo resumo nunca foi calculado (criado por bulk_create, sem signals)
+        status_codigo = status_principal_contrato(contrato, referencia)
+        parcela_atual = contrato.parcela_referencia(referencia) if contrato else None
+        dias_atraso = parcela_atual.dias_atraso(referencia) if parcela_atual else 0
     estilo = status_ui(status_codigo)
-    parcela_atual = contrato.parcela_referencia(referencia) if contrato else None
-
-    if status_codigo in {ParcelaStatus.ATRASADO, ParcelaStatus.INADIMPLENTE}:
-        sincronizar_nota_saude_financeira(aluno, referencia)
 
     return {
         "id": aluno.id,
@@ -280,7 +416,7 @@ def resumo_aluno_financeiro(aluno: Usuario, referencia: date | None = None) -> d
                 "valor": parcela_atual.valor,
                 "data_vencimento": parcela_atual.data_vencimento,
                 "data_vencimento_br": data_brasileira(parcela_atual.data_vencimento),
-                "dias_atraso": parcela_atual.dias_atraso(referencia),
+                "dias_atraso": dias_atraso,
             }
             if parcela_atual
             else None
@@ -326,11 +462,10 @@ def ficha_aluno_financeira(aluno: Usuario, referencia: date | None = None) -> di
         else "Monitor"
     )
     telefone = normalizar_telefone_whatsapp(aluno.telefone)
-    sincronizar_nota_saude_financeira(aluno, referencia)
 
     parcelas = []
-    for parcela in contrato.parcelas.all().order_by("data_vencimento", "numero"):
-        status = parcela.get_status(referencia)
+    for parcela in contrato.parcelas.com_status(referencia).order_by("data_vencimento", "numero"):
+        status = parcela.status
         link_pagamento = parcela.link_pagamento_ou_pix or "Nao informado"
         pode_cobrar = status not in {ParcelaStatus.PAGO, ParcelaStatus.CANCELADO, ParcelaStatus.CANCELADA_RENEGOCIACAO}
         tem_historico_renegociacao = bool(parcela.parcela_origem_id or parcela.ja_renegociada)
@@ -356,7 +491,7 @@ def ficha_aluno_financeira(aluno: Usuario, referencia: date | None = None) -> di
                 "status": status,
                 "status_label": status_ui(status)["label"],
                 "status_badge_class": status_ui(status)["badge_class"],
-                "dias_atraso": parcela.dias_atraso(referencia),
+                "dias_atraso": parcela.dias_em_atraso,
                 "ativa": parcela.ativa,
                 "ja_renegociada": parcela.ja_renegociada,
                 "parcela_origem_id": parcela.parcela_origem_id,
@@ -416,6 +551,64 @@ def ficha_aluno_financeira(aluno: Usuario, referencia: date | None = None) -> di
     }
 
 
+def totais_dashboard_financeiro(
+    usuario: Usuario,
+    periodo_ref: PeriodoFinanceiro,
+    referencia: date | None = None,
+) -> dict[str, object]:
+    """
+    Contagens e valores do dashboard agregados no banco, em duas queries: uma por
+    contrato (quantos cancelados, atrasados e inadimplentes) e uma por parcela,
+    que soma os valores pelo status de expressao_status_parcela na data de referência.
+    Um contrato com parcela inadimplente conta só como inadimplente, nunca como
+    atrasado, e fica fora da previsibilidade do próximo período.
+    """
+    referencia = referencia or hoje_local()
+    contratos = Contrato.objects.filter(aluno__in=queryset_alunos_financeiros(usuario).values("pk"))
+    ativo = ~Q(status=ContratoStatus.CANCELADO)
+
+    totais = contratos.alias(
+        inadimplente=Exists(Parcela.objects.filter(filtro_parcelas_inadimplentes(referencia), contrato=OuterRef("pk"))),
+        atrasado=Exists(Parcela.objects.filter(filtro_parcelas_atrasadas(referencia), contrato=OuterRef("pk"))),
+    ).aggregate(
+        total_base=Count("pk"),
+        total_cancelados=Count("pk", filter=~ativo),
+        total_inadimplentes=Count("pk", filter=ativo & Q(inadimplente=True)),
+        total_atrasados=Count("pk", filter=ativo & Q(inadimplente=False, atrasado=True)),
+    )
+
+    contrato_inadimplente = Exists(
+        Parcela.objects.filter(filtro_parcelas_inadimplentes(referencia), contrato=OuterRef("contrato"))
+    )
+    totais |= (
+        Parcela.objects.filter(contrato__in=contratos.filter(ativo), ativa=True)
+        .alias(status_calculado=expressao_status_parcela(referencia), contrato_inadimplente=contrato_inadimplente)
+        .aggregate(
+            valor_em_atraso=Sum("valor", filter=Q(status_calculado=ParcelaStatus.ATRASADO), default=ZERO),
+            valor_inadimplente=Sum("valor", filter=Q(status_calculado=ParcelaStatus.INADIMPLENTE), default=ZERO),
+            volume_renegociado=Sum(
+                "valor",
+                filter=Q(data_pagamento__isnull=True) & (Q(parcela_origem__isnull=False) | Q(ja_renegociada=True)),
+                default=ZERO,
+            ),
+            faturamento_presumido=Sum(
+                "valor",
+                filter=Q(data_vencimento__range=(periodo_ref.data_inicio, periodo_ref.data_fim)),
+                default=ZERO,
+            ),
+            previsibilidade_proximo_periodo=Sum(
+                "valor",
+                filter=Q(
+                    data_vencimento__range=(periodo_ref.proximo_inicio, periodo_ref.proximo_fim),
+                    contrato_inadimplente=False,
+                ),
+                default=ZERO,
+            ),
+        )
+    )
+    return totais
+
+
 def contexto_dashboard_financeiro(
     usuario: Usuario,
     periodo: str,
@@ -432,82 +625,26 @@ def contexto_dashboard_financeiro(
     )
     alunos = alunos_financeiros(usuario)
     overview = [resumo_aluno_financeiro(aluno, referencia) for aluno in alunos]
-    overview_por_id = {item["id"]: item for item in overview}
-
-    total_base = 0
-    total_ativos = 0
-    total_atrasados = 0
-    total_inadimplentes = 0
-    total_cancelados = 0
-    valor_em_atraso = ZERO
-    valor_inadimplente = ZERO
-    volume_renegociado = ZERO
-    faturamento_presumido = ZERO
-    previsibilidade_proximo_periodo = ZERO
-    farol = []
-
-    for aluno in alunos:
-        contrato = getattr(aluno, "contrato", None)
-        if not contrato:
-            continue
-
-        total_base += 1
-        parcelas = list(contrato.parcelas.filter(ativa=True))
-
-        if contrato.status == ContratoStatus.CANCELADO:
-            total_cancelados += 1
-            continue
-
-        total_ativos += 1
-        tem_inadimplencia = False
-        tem_atraso = False
-
-        for parcela in parcelas:
-            status = parcela.get_status(referencia)
-            if status == ParcelaStatus.ATRASADO:
-                tem_atraso = True
-                valor_em_atraso += parcela.valor
-            elif status == ParcelaStatus.INADIMPLENTE:
-                tem_inadimplencia = True
-                valor_inadimplente += parcela.valor
-
-            if (
-                parcela.ativa
-                and not parcela.data_pagamento
-                and status not in {ParcelaStatus.CANCELADO, ParcelaStatus.CANCELADA_RENEGOCIACAO}
-                and (parcela.parcela_origem_id or parcela.ja_renegociada)
-            ):
-                volume_renegociado += parcela.valor
-
-            if periodo_ref.data_inicio <= parcela.data_vencimento <= periodo_ref.data_fim:
-                faturamento_presumido += parcela.valor
-
-        if tem_inadimplencia:
-            total_inadimplentes += 1
-        elif tem_atraso:
-            total_atrasados += 1
-
-        if not tem_inadimplencia:
-            for parcela in parcelas:
-                if periodo_ref.proximo_inicio <= parcela.data_vencimento <= periodo_ref.proximo_fim:
-                    previsibilidade_proximo_periodo += parcela.valor
-
-        resumo = overview_por_id.get(aluno.id)
-        if resumo and resumo["status_codigo"] in {ParcelaStatus.ATRASADO, ParcelaStatus.INADIMPLENTE, ParcelaStatus.CANCELADO}:
-            farol.append(resumo)
+    farol = [
+        item
+        for item in overview
+        if item["status_codigo"] in {ParcelaStatus.ATRASADO, ParcelaStatus.INADIMPLENTE}
+    ]
+    totais = totais_dashboard_financeiro(usuario, periodo_ref, referencia)
 
+    total_base = totais["total_base"]
     denominador = total_base or 1
     metrics = {
         "total_base": total_base,
-        "total_ativos": total_ativos,
-        "pct_atrasados": round((total_atrasados / denominador) * 100, 1),
-        "pct_inadimplentes": round((total_inadimplentes / denominador) * 100, 1),
-        "pct_cancelados": round((total_cancelados / denominador) * 100, 1),
-        "valor_em_atraso": valor_em_atraso,
-        "valor_inadimplente": valor_inadimplente,
-        "volume_renegociado": volume_renegociado,
-        "faturamento_presumido": faturamento_presumido,
-        "previsibilidade_proximo_periodo": previsibilidade_proximo_periodo,
+        "total_ativos": total_base - totais["total_cancelados"],
+        "pct_atrasados": round((totais["total_atrasados"] / denominador) * 100, 1),
+        "pct_inadimplentes": round((totais["total_inadimplentes"] / denominador) * 100, 1),
+        "pct_cancelados": round((totais["total_cancelados"] / denominador) * 100, 1),
+        "valor_em_atraso": totais["valor_em_atraso"],
+        "valor_inadimplente": totais["valor_inadimplente"],
+        "volume_renegociado": totais["volume_renegociado"],
+        "faturamento_presumido": totais["faturamento_presumido"],
+        "previsibilidade_proximo_periodo": totais["previsibilidade_proximo_periodo"],
         "periodo_selecionado": periodo_ref.chave,
         "periodo_label": periodo_ref.label,
         "data_inicio_filtro": data_brasileira(periodo_ref.data_inicio),
@@ -1,15 +1,25 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from .models import Contrato, Parcela
-from .services import sincronizar_nota_saude_financeira
+from .services import atualizar_bloqueio_financeiro, atualizar_resumo_contratos, sincronizar_nota_saude_financeira
 
 
 @receiver(post_save, sender=Parcela)
 def atualizar_saude_apos_salvar_parcela(sender, instance, **kwargs):
+    atualizar_bloqueio_financeiro([instance.contrato_id])
+    atualizar_resumo_contratos([instance.contrato_id])
     sincronizar_nota_saude_financeira(instance.contrato.aluno)
 
 
+@receiver(post_delete, sender=Parcela)
+def atualizar_bloqueio_apos_excluir_parcela(sender, instance, **kwargs):
+    atualizar_bloqueio_financeiro([instance.contrato_id])
+    atualizar_resumo_contratos([instance.contrato_id])
+
+
 @receiver(post_save, sender=Contrato)
 def atualizar_saude_apos_salvar_contrato(sender, instance, **kwargs):
+    atualizar_bloqueio_financeiro([instance.pk])
+    atualizar_resumo_contratos([instance.pk])
     sincronizar_nota_saude_financeira(instance.aluno)
@@ -1,17 +1,45 @@
 import json
+import tempfile
 from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from apps.trilha.models import NotaSaude
+from apps.core.carga import gerar_carga
+from apps.core.consultas import atualizar_estatisticas, planos_das_queries
+from apps.trilha.models import AlunoSnapshot, NotaSaude
 from apps.usuarios.models import RoleChoices, Usuario
 
-from .models import Contrato, ContratoStatus, OrigemParcela, Parcela, ParcelaStatus, TipoRenegociacao
+from .models import (
+    Contrato,
+    ContratoStatus,
+    OrigemParcela,
+    Parcela,
+    ParcelaStatus,
+    TipoRenegociacao,
+    expressao_status_parcela,
+)
 from .renegociacao_service import RenegociacaoError, executar_renegociacao
-from .services import contexto_dashboard_financeiro
+from .services import (
+    ZERO,
+    alunos_financeiros,
+    atualizar_bloqueio_financeiro,
+    atualizar_resumo_contratos,
+    calcular_periodo_financeiro,
+    contexto_dashboard_financeiro,
+    ficha_aluno_financeira,
+    resumo_aluno_financeiro,
+    sincronizar_saude_financeira,
+    status_principal_contrato,
+    totais_dashboard_financeiro,
+)
 
 
 class FinanceiroTests(TestCase):
@@ -114,7 +142,9 @@ class FinanceiroTests(TestCase):
         self.assertContains(response, "Central Financeira")
 
     def test_contexto_dashboard_periodo_semanal(self):
+        # Quarta-feira: o dia seguinte cai na mesma semana
         hoje = timezone.localdate()
+        hoje += timedelta(days=2 - hoje.weekday())
         Parcela.objects.create(
             contrato=self.contrato,
             numero=1,
@@ -278,3 +308,575 @@ class FinanceiroTests(TestCase):
 
         parcela.refresh_from_db()
         self.assertTrue(parcela.ja_renegociada)
+
+
+class BloqueioFinanceiroTests(TestCase):
+    def setUp(self):
+        self.aluno = Usuario.objects.create(
+            email="bloqueio@mindhub.com",
+            senha="123",
+            role=RoleChoices.ALUNO,
+            nome="Aluno Bloqueio",
+        )
+        self.contrato = Contrato.objects.create(
+            aluno=self.aluno,
+            valor_total_negociado="900.00",
+            data_assinatura=timezone.localdate(),
+            status=ContratoStatus.ATIVO,
+        )
+
+    def criar_parcela(self, dias_atraso, numero=1):
+        return Parcela.objects.create(
+            contrato=self.contrato,
+            numero=numero,
+            valor="300.00",
+            data_vencimento=timezone.localdate() - timedelta(days=dias_atraso),
+        )
+
+    def bloqueado(self):
+        self.contrato.refresh_from_db()
+        return self.contrato.bloqueado_financeiro
+
+    def test_signals_mantem_o_bloqueio(self):
+        atrasada = self.criar_parcela(dias_atraso=3)
+        self.assertFalse(self.bloqueado())
+
+        inadimplente = self.criar_parcela(dias_atraso=8, numero=2)
+        self.assertTrue(self.bloqueado())
+
+        inadimplente.data_pagamento = timezone.localdate()
+        inadimplente.save()
+        self.assertFalse(self.bloqueado())
+
+        inadimplente.data_pagamento = None
+        inadimplente.save()
+        self.assertTrue(self.bloqueado())
+
+        self.contrato.status = ContratoStatus.CANCELADO
+        self.contrato.save()
+        self.assertFalse(self.bloqueado())
+
+        self.contrato.status = ContratoStatus.ATIVO
+        self.contrato.save()
+        self.assertTrue(self.bloqueado())
+
+        inadimplente.delete()
+        self.assertFalse(self.bloqueado())
+        self.assertEqual(atrasada.get_status(), ParcelaStatus.ATRASADO)
+
+    def test_comando_diario_bloqueia_parcela_que_envelheceu(self):
+        parcela = self.criar_parcela(dias_atraso=7)
+        self.assertEqual(parcela.get_status(), ParcelaStatus.ATRASADO)
+        self.assertFalse(self.bloqueado())
+
+        amanha = timezone.localdate() + timedelta(days=1)
+        saida = StringIO()
+        call_command("atualizar_bloqueios_financeiros", "--data", amanha.isoformat(), stdout=saida)
+
+        self.assertTrue(self.bloqueado())
+        self.assertIn("Contratos bloqueados: 1, desbloqueados: 0", saida.getvalue())
+
+    def test_comando_diario_cria_nota_para_parcela_que_venceu(self):
+        Parcela.objects.create(
+            contrato=self.contrato,
+            numero=1,
+            valor="300.00",
+            data_vencimento=timezone.localdate(),
+        )
+        self.assertFalse(NotaSaude.objects.filter(aluno=self.aluno).exists())
+
+        amanha = timezone.localdate() + timedelta(days=1)
+        call_command("atualizar_bloqueios_financeiros", "--data", amanha.isoformat(), stdout=StringIO())
+
+        self.assertEqual(NotaSaude.objects.filter(aluno=self.aluno).first().nota, 1)
+        self.assertFalse(self.bloqueado())
+
+    def test_decorator_so_le_o_bloqueio(self):
+        self.criar_parcela(dias_atraso=10)
+        session = self.client.session
+        session["usuario"] = self.aluno.email
+        session.save()
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse("trilha:home_trilha"))
+
+        self.assertRedirects(response, reverse("financeiro:aviso_inadimplencia"), fetch_redirect_response=False)
+        escritas = [
+            query["sql"] for query in contexto.captured_queries
+            if query["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(escritas, [])
+        self.assertFalse(any("financeiro_parcela" in query["sql"] for query in contexto.captured_queries))
+
+        # A página de aviso usa o mesmo estado persistido: sem bloqueio, volta para a trilha
+        Contrato.objects.filter(pk=self.contrato.pk).update(bloqueado_financeiro=False)
+        response = self.client.get(reverse("financeiro:aviso_inadimplencia"))
+        self.assertRedirects(response, reverse("trilha:home_trilha"), fetch_redirect_response=False)
+
+
+class IndicesParcelasTests(TestCase):
+    """Confere via EXPLAIN que as consultas de parcelas usam o índice (contrato, ativa, data_vencimento)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        alunos = Usuario.objects.bulk_create(
+            [
+                Usuario(email=f"aluno{indice}@mindhub.com", senha="123", role=RoleChoices.ALUNO, monitor_responsavel=cls.monitor)
+                for indice in range(300)
+            ]
+        )
+        contratos = Contrato.objects.bulk_create(
+            [Contrato(aluno=aluno, valor_total_negociado="1200.00") for aluno in alunos]
+        )
+        inicio = timezone.localdate() - timedelta(days=180)
+        Parcela.objects.bulk_create(
+            [
+                Parcela(
+                    contrato=contrato,
+                    numero=numero,
+                    valor="100.00",
+                    data_vencimento=inicio + timedelta(days=30 * numero),
+                    data_pagamento=inicio + timedelta(days=30 * numero) if numero < 6 else None,
+                    ativa=numero != 3,
+                )
+                for contrato in contratos
+                for numero in range(1, 13)
+            ]
+        )
+        cls.aluno = alunos[7]
+        atualizar_estatisticas()
+
+    def planos_de_parcela(self, funcao, *args):
+        with CaptureQueriesContext(connection) as contexto:
+            funcao(*args)
+        planos = planos_das_queries(contexto.captured_queries, "financeiro_parcela")
+        self.assertTrue(planos)
+        for plano in planos:
+            self.assertNotIn("financeiro_parcela", plano.varreduras, f"{plano.sql}\n{plano.texto}")
+        return set().union(*(plano.indices for plano in planos))
+
+    def test_bloqueio_financeiro(self):
+        indices = self.planos_de_parcela(atualizar_bloqueio_financeiro, [self.aluno.contrato.id])
+        self.assertIn("parcela_ativa_vencimento_idx", indices)
+
+    def test_resumo_e_ficha_do_aluno(self):
+        aluno = Usuario.objects.select_related("contrato", "monitor_responsavel").get(pk=self.aluno.pk)
+        self.assertIn("parcela_ativa_vencimento_idx", self.planos_de_parcela(resumo_aluno_financeiro, aluno))
+        self.planos_de_parcela(ficha_aluno_financeira, aluno)
+
+
+@override_settings(ORCAMENTO_QUERIES="erro", MEDIA_ROOT=tempfile.mkdtemp(prefix="mindhub-comprovantes-"))
+class OrcamentoQueriesTests(TestCase):
+    """As views financeiras cabem no @orcamento_queries com uma carteira de vários contratos."""
+
+    def setUp(self):
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        alunos = Usuario.objects.bulk_create(
+            [
+                Usuario(
+                    email=f"aluno{indice}@mindhub.com",
+                    senha="123",
+                    role=RoleChoices.ALUNO,
+                    nome=f"Aluno {indice}",
+                    monitor_responsavel=self.monitor,
+                )
+                for indice in range(20)
+            ]
+        )
+        contratos = Contrato.objects.bulk_create(
+            [Contrato(aluno=aluno, valor_total_negociado="1200.00", data_assinatura=timezone.localdate()) for aluno in alunos]
+        )
+        inicio = timezone.localdate() - timedelta(days=60)
+        Parcela.objects.bulk_create(
+            [
+                Parcela(
+                    contrato=contrato,
+                    numero=numero,
+                    valor="200.00",
+                    data_vencimento=inicio + timedelta(days=30 * numero),
+                    data_pagamento=inicio if numero == 1 and indice % 2 else None,
+                )
+                for indice, contrato in enumerate(contratos)
+                for numero in range(1, 7)
+            ]
+        )
+        atualizar_bloqueio_financeiro()
+        atualizar_resumo_contratos()
+        self.aluno = alunos[0]
+
+    def chamar(self, usuario, nome, *args, metodo="get", **kwargs):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+        response = getattr(self.client, metodo)(reverse(f"financeiro:{nome}", args=args), **kwargs)
+        self.assertLess(response.status_code, 500)
+        self.assertIn("Server-Timing", response)
+        return response
+
+    def test_dashboard_ficha_e_aviso(self):
+        self.assertEqual(self.chamar(self.monitor, "dashboard").status_code, 200)
+        self.assertEqual(self.chamar(self.monitor, "api_ficha_aluno", self.aluno.id).status_code, 200)
+        self.assertEqual(self.chamar(self.aluno, "aviso_inadimplencia").status_code, 200)
+
+    def test_pagar_e_renegociar_parcela(self):
+        vencida, seguinte = self.aluno.contrato.parcelas.order_by("numero")[:2]
+        response = self.chamar(
+            self.monitor,
+            "api_atualizar_parcela",
+            vencida.id,
+            metodo="post",
+            data={
+                "data_pagamento": timezone.localdate().isoformat(),
+                "comprovante": SimpleUploadedFile("comprovante.pdf", b"%PDF-1.4", content_type="application/pdf"),
+            },
+        )
+        self.assertTrue(response.json()["success"])
+        response = self.chamar(
+            self.monitor,
+            "api_renegociar_parcela",
+            seguinte.id,
+            metodo="post",
+            data=json.dumps(
+                {
+                    "tipo_renegociacao": "ADIAR",
+                    "nova_data_vencimento": (timezone.localdate() + timedelta(days=20)).isoformat(),
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertTrue(response.json()["success"])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="mindhub-carga-"))
+class TotaisDashboardTests(TestCase):
+    """As agregações em SQL do dashboard batem com Parcela.get_status aplicado parcela a parcela."""
+
+    @classmethod
+    def setUpTestData(cls):
+        gerar_carga(monitores=2, alunos=60, seed=7, prefixo="totais")
+        cls.monitor = Usuario.objects.get(email="totais.monitor0@carga.mindhub.local")
+        cls.admin = Usuario.objects.create(email="admin@mindhub.com", senha="123", role=RoleChoices.ADMIN)
+
+    def totais_em_python(self, usuario, periodo_ref, referencia):
+        totais = dict.fromkeys(("total_base", "total_cancelados", "total_atrasados", "total_inadimplentes"), 0)
+        totais |= dict.fromkeys(
+            (
+                "valor_em_atraso",
+                "valor_inadimplente",
+                "volume_renegociado",
+                "faturamento_presumido",
+                "previsibilidade_proximo_periodo",
+            ),
+            ZERO,
+        )
+        for aluno in alunos_financeiros(usuario):
+            contrato = getattr(aluno, "contrato", None)
+            if not contrato:
+                continue
+            totais["total_base"] += 1
+            if contrato.status == ContratoStatus.CANCELADO:
+                totais["total_cancelados"] += 1
+                continue
+            parcelas = contrato.parcelas_ordenadas()
+            status = [parcela.get_status(referencia) for parcela in parcelas]
+            inadimplente = ParcelaStatus.INADIMPLENTE in status
+            if inadimplente:
+                totais["total_inadimplentes"] += 1
+            elif ParcelaStatus.ATRASADO in status:
+                totais["total_atrasados"] += 1
+            for parcela, status_parcela in zip(parcelas, status):
+                if status_parcela == ParcelaStatus.ATRASADO:
+                    totais["valor_em_atraso"] += parcela.valor
+                elif status_parcela == ParcelaStatus.INADIMPLENTE:
+                    totais["valor_inadimplente"] += parcela.valor
+                if not parcela.data_pagamento and (parcela.parcela_origem_id or parcela.ja_renegociada):
+                    totais["volume_renegociado"] += parcela.valor
+                if periodo_ref.data_inicio <= parcela.data_vencimento <= periodo_ref.data_fim:
+                    totais["faturamento_presumido"] += parcela.valor
+                if not inadimplente and periodo_ref.proximo_inicio <= parcela.data_vencimento <= periodo_ref.proximo_fim:
+                    totais["previsibilidade_proximo_periodo"] += parcela.valor
+        return totais
+
+    def test_expressao_status_igual_a_get_status(self):
+        hoje = timezone.localdate()
+        for referencia in (hoje - timedelta(days=40), hoje, hoje + timedelta(days=8), hoje + timedelta(days=75)):
+            parcelas = Parcela.objects.select_related("contrato").annotate(
+                status_sql=expressao_status_parcela(referencia)
+            )
+            divergentes = [
+                (parcela.id, parcela.status_sql, parcela.get_status(referencia))
+                for parcela in parcelas
+                if parcela.status_sql != parcela.get_status(referencia)
+            ]
+            self.assertEqual(divergentes, [], referencia)
+
+    def test_totais_iguais_ao_calculo_por_parcela(self):
+        hoje = timezone.localdate()
+        for usuario in (self.admin, self.monitor):
+            for referencia in (hoje - timedelta(days=20), hoje, hoje + timedelta(days=35)):
+                for periodo in ("semanal", "mensal"):
+                    periodo_ref = calcular_periodo_financeiro(periodo, referencia)
+                    with self.subTest(usuario=usuario.email, referencia=referencia, periodo=periodo):
+                        with self.assertNumQueries(2):
+                            totais = totais_dashboard_financeiro(usuario, periodo_ref, referencia)
+                        self.assertEqual(totais, self.totais_em_python(usuario, periodo_ref, referencia))
+
+    def test_totais_com_atraso_e_inadimplencia(self):
+        totais = totais_dashboard_financeiro(self.admin, calcular_periodo_financeiro("mensal"))
+        self.assertEqual(totais["total_base"], 60)
+        self.assertGreater(totais["total_cancelados"], 0)
+        self.assertGreater(totais["total_inadimplentes"], 0)
+        self.assertGreater(totais["valor_em_atraso"], ZERO)
+        self.assertGreater(totais["volume_renegociado"], ZERO)
+
+    def test_visao_geral_nao_le_as_parcelas(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            contexto_dashboard_financeiro(self.monitor, "mensal")
+        parcelas = [query for query in capturadas.captured_queries if query["sql"].startswith('SELECT "financeiro_parcela"')]
+        self.assertEqual(parcelas, [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="mindhub-carga-"))
+class ComStatusTests(TestCase):
+    """Parcela.objects.com_status e os métodos do contrato que filtram por ele batem com get_status."""
+
+    @classmethod
+    def setUpTestData(cls):
+        gerar_carga(monitores=1, alunos=40, seed=11, prefixo="status")
+        aluno = Usuario.objects.create(email="limites@mindhub.com", senha="123", role=RoleChoices.ALUNO)
+        cls.contrato = Contrato.objects.create(aluno=aluno, valor_total_negociado="900.00")
+        cls.hoje = timezone.localdate()
+        # Uma parcela em cada limite da regra de get_status
+        for numero, dias in enumerate((0, 1, 7, 8, -1), start=1):
+            Parcela.objects.create(
+                contrato=cls.contrato, numero=numero, valor="100.00", data_vencimento=cls.hoje - timedelta(days=dias)
+            )
+        Parcela.objects.create(
+            contrato=cls.contrato, numero=6, valor="100.00", data_vencimento=cls.hoje - timedelta(days=30),
+            data_pagamento=cls.hoje,
+        )
+        Parcela.objects.create(
+            contrato=cls.contrato, numero=7, valor="100.00", data_vencimento=cls.hoje - timedelta(days=30),
+            ativa=False, ja_renegociada=True,
+        )
+
+    def referencias(self):
+        return [self.hoje + timedelta(days=dias) for dias in (-45, -8, -1, 0, 1, 7, 8, 30, 90)]
+
+    def test_paridade_com_get_status_e_dias_atraso(self):
+        for referencia in self.referencias():
+            divergentes = [
+                (parcela.id, parcela.status, parcela.dias_em_atraso)
+                for parcela in Parcela.objects.com_status(referencia).select_related("contrato")
+                if (parcela.status, parcela.dias_em_atraso)
+                != (parcela.get_status(referencia), parcela.dias_atraso(referencia))
+            ]
+            self.assertEqual(divergentes, [], referencia)
+
+    def test_limites_da_tolerancia(self):
+        parcelas = self.contrato.parcelas.com_status(self.hoje).order_by("numero")
+        self.assertEqual(
+            [(parcela.status, parcela.dias_em_atraso) for parcela in parcelas],
+            [
+                (ParcelaStatus.PENDENTE, 0),
+                (ParcelaStatus.ATRASADO, 1),
+                (ParcelaStatus.ATRASADO, 7),
+                (ParcelaStatus.INADIMPLENTE, 8),
+                (ParcelaStatus.PENDENTE, 0),
+                (ParcelaStatus.PAGO, 0),
+                (ParcelaStatus.CANCELADA_RENEGOCIACAO, 0),
+            ],
+        )
+        self.assertEqual(
+            Parcela.objects.com_status(self.hoje).filter(contrato=self.contrato, dias_em_atraso__gt=5).count(), 2
+        )
+
+    def test_metodos_do_contrato_iguais_com_e_sem_prefetch(self):
+        contratos = Contrato.objects.order_by("id")
+        carregados = {contrato.id: contrato for contrato in contratos.prefetch_related("parcelas")}
+        for referencia in (self.hoje - timedelta(days=8), self.hoje, self.hoje + timedelta(days=30)):
+            for contrato in contratos:
+                memoria = carregados[contrato.id]
+                with self.subTest(contrato=contrato.id, referencia=referencia):
+                    with self.assertNumQueries(0):
+                        esperado = (
+                            status_principal_contrato(memoria, referencia),
+                            memoria.parcela_referencia(referencia),
+                            [p.id for p in memoria.parcelas_por_status(ParcelaStatus.ATRASADO, referencia)],
+                            memoria.possui_status(ParcelaStatus.INADIMPLENTE, referencia),
+                        )
+                    self.assertEqual(
+                        (
+                            status_principal_contrato(contrato, referencia),
+                            contrato.parcela_referencia(referencia),
+                            [p.id for p in contrato.parcelas_por_status(ParcelaStatus.ATRASADO, referencia)],
+                            contrato.possui_status(ParcelaStatus.INADIMPLENTE, referencia),
+                        ),
+                        esperado,
+                    )
+
+    def test_status_principal_numa_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(status_principal_contrato(self.contrato, self.hoje), ParcelaStatus.INADIMPLENTE)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.contrato.parcela_referencia(self.hoje).numero, 4)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="mindhub-carga-"))
+class ResumoContratoTests(TestCase):
+    """O resumo persistido no Contrato bate com o cálculo a partir das parcelas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        gerar_carga(monitores=2, alunos=40, seed=5, prefixo="resumo")
+        cls.monitor = Usuario.objects.get(email="resumo.monitor0@carga.mindhub.local")
+
+    def assertResumoIgualAoCalculado(self, referencia):
+        for contrato in Contrato.objects.select_related("proxima_parcela"):
+            parcela = contrato.parcela_referencia(referencia)
+            em_aberto = contrato.parcelas.filter(ativa=True, data_pagamento__isnull=True)
+            saldo = ZERO if contrato.status == ContratoStatus.CANCELADO else sum(
+                (item.valor for item in em_aberto), ZERO
+            )
+            with self.subTest(contrato=contrato.id, referencia=referencia):
+                self.assertEqual(contrato.resumo_referencia, referencia)
+                self.assertEqual(contrato.status_principal, status_principal_contrato(contrato, referencia))
+                self.assertEqual(contrato.proxima_parcela, parcela)
+                self.assertEqual(contrato.proxima_parcela_vencimento, parcela.data_vencimento if parcela else None)
+                self.assertEqual(contrato.dias_atraso_maximo, parcela.dias_atraso(referencia) if parcela else 0)
+                self.assertEqual(contrato.saldo_devedor, saldo)
+                self.assertEqual(
+                    contrato.resumo_na_data(referencia)[:2], (contrato.status_principal, contrato.proxima_parcela)
+                )
+
+    def test_resumo_da_carga_e_do_comando_diario(self):
+        self.assertResumoIgualAoCalculado(timezone.localdate())
+
+        for dias in (3, 9, 40):
+            referencia = timezone.localdate() + timedelta(days=dias)
+            call_command("atualizar_bloqueios_financeiros", "--data", referencia.isoformat(), stdout=StringIO())
+            self.assertResumoIgualAoCalculado(referencia)
+
+    def test_resumo_em_outra_data_sem_recalcular(self):
+        # A parcela de referência não muda com a data: o status dela sai certo sem passar pelo comando
+        referencia = timezone.localdate() + timedelta(days=12)
+        for contrato in Contrato.objects.select_related("proxima_parcela"):
+            with self.subTest(contrato=contrato.id), self.assertNumQueries(0):
+                status, parcela, dias = contrato.resumo_na_data(referencia)
+            self.assertEqual(status, status_principal_contrato(contrato, referencia))
+            self.assertEqual(parcela, contrato.parcela_referencia(referencia))
+
+    def test_signals_mantem_o_resumo(self):
+        contrato = Contrato.objects.filter(status=ContratoStatus.ATIVO, saldo_devedor__gt=0).first()
+        parcela = contrato.proxima_parcela
+        parcela.data_pagamento = timezone.localdate()
+        parcela.save()
+
+        contrato.refresh_from_db()
+        self.assertNotEqual(contrato.proxima_parcela_id, parcela.id)
+        self.assertResumoIgualAoCalculado(timezone.localdate())
+
+        contrato.status = ContratoStatus.CANCELADO
+        contrato.save()
+        contrato.refresh_from_db()
+        self.assertEqual((contrato.status_principal, contrato.saldo_devedor), (ParcelaStatus.CANCELADO, ZERO))
+
+    def test_visao_geral_nao_consulta_por_aluno(self):
+        with self.assertNumQueries(3):
+            contexto = contexto_dashboard_financeiro(self.monitor, "mensal")
+        self.assertEqual(len(contexto["alunos"]), 20)
+        esperado = {
+            aluno.id: status_principal_contrato(aluno.contrato)
+            for aluno in Usuario.objects.filter(monitor_responsavel=self.monitor).select_related("contrato")
+        }
+        self.assertEqual({item["id"]: item["status_codigo"] for item in contexto["alunos"]}, esperado)
+        self.assertIn(ParcelaStatus.CANCELADO, esperado.values())
+        # O farol só lista contratos ativos em atraso: cancelados ficam de fora, como no laço antigo
+        self.assertEqual(
+            [item["id"] for item in contexto["farol"]],
+            [
+                item["id"]
+                for item in contexto["alunos"]
+                if esperado[item["id"]] in {ParcelaStatus.ATRASADO, ParcelaStatus.INADIMPLENTE}
+            ],
+        )
+
+
+class SaudeFinanceiraTests(TestCase):
+    """sincronizar_saude_financeira em lote; dashboard e ficha só leem."""
+
+    def setUp(self):
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.alunos = {}
+        for nome in ("atrasado", "inadimplente", "em_dia", "pago", "cancelado", "ja_critico"):
+            aluno = Usuario.objects.create(
+                email=f"{nome}@mindhub.com", senha="123", role=RoleChoices.ALUNO, monitor_responsavel=self.monitor
+            )
+            Contrato.objects.create(
+                aluno=aluno,
+                valor_total_negociado="600.00",
+                status=ContratoStatus.CANCELADO if nome == "cancelado" else ContratoStatus.ATIVO,
+            )
+            self.alunos[nome] = aluno
+        NotaSaude.objects.create(aluno=self.alunos["atrasado"], nota=4)
+        NotaSaude.objects.create(aluno=self.alunos["ja_critico"], nota=1)
+
+        hoje = timezone.localdate()
+        dias_por_aluno = {"atrasado": 3, "inadimplente": 20, "em_dia": -5, "pago": 10, "cancelado": 10, "ja_critico": 10}
+        # bulk_create não dispara signals: simula parcelas que venceram com a passagem do tempo
+        Parcela.objects.bulk_create(
+            [
+                Parcela(
+                    contrato=aluno.contrato,
+                    numero=1,
+                    valor="300.00",
+                    data_vencimento=hoje - timedelta(days=dias_por_aluno[nome]),
+                    data_pagamento=hoje if nome == "pago" else None,
+                )
+                for nome, aluno in self.alunos.items()
+            ]
+        )
+
+    def notas_criticas(self):
+        return set(
+            NotaSaude.objects.filter(nota=1, automatica=True).values_list("aluno__email", flat=True)
+        )
+
+    def test_lote_idempotente(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(sincronizar_saude_financeira(timezone.localdate() - timedelta(days=30)), 0)
+
+        self.assertEqual(sincronizar_saude_financeira(), 2)
+        self.assertEqual(self.notas_criticas(), {"atrasado@mindhub.com", "inadimplente@mindhub.com"})
+        self.assertEqual(AlunoSnapshot.objects.get(aluno=self.alunos["atrasado"]).nota_atual, 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(sincronizar_saude_financeira(), 0)
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command("sincronizar_saude_financeira", stdout=saida)
+        self.assertIn("Notas de saúde financeira criadas: 2", saida.getvalue())
+
+        saida = StringIO()
+        call_command("sincronizar_saude_financeira", stdout=saida)
+        self.assertIn("Notas de saúde financeira criadas: 0", saida.getvalue())
+
+    def test_dashboard_e_ficha_nao_gravam(self):
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.client.get(reverse("financeiro:dashboard")).status_code, 200)
+            for aluno in self.alunos.values():
+                response = self.client.get(reverse("financeiro:api_ficha_aluno", args=[aluno.id]))
+                self.assertEqual(response.status_code, 200)
+
+        escritas = [
+            query["sql"] for query in contexto.captured_queries
+            if query["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(escritas, [])
+        self.assertEqual(self.notas_criticas(), set())
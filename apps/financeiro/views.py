@@ -6,6 +6,7 @@ from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 
+from apps.core.orcamento import orcamento_queries
 from apps.usuarios.models import RoleChoices, Usuario
 from apps.usuarios.utils import get_usuario_logado
 
@@ -27,6 +28,7 @@ def verificar_acesso_financeiro(request):
     return None
 
 
+@orcamento_queries(5)
 def dashboard_financeiro(request):
     usuario = verificar_acesso_financeiro(request)
     if not usuario:
@@ -51,6 +53,7 @@ def dashboard_financeiro(request):
     return render(request, "financeiro/dashboard.html", contexto)
 
 
+@orcamento_queries(10)
 def aviso_inadimplencia(request):
     usuario = get_usuario_logado(request)
     if not usuario or not usuario.is_aluno:
@@ -60,8 +63,6 @@ def aviso_inadimplencia(request):
         return redirect("trilha:home_trilha")
 
     resumo = resumo_aluno_financeiro(usuario)
-    contrato = getattr(usuario, "contrato", None)
-    parcela_critica = contrato.parcela_referencia() if contrato else None
     monitor = usuario.monitor_responsavel
 
     return render(
@@ -71,12 +72,13 @@ def aviso_inadimplencia(request):
             "usuario": usuario,
             "monitor": monitor,
             "resumo": resumo,
-            "parcela_critica": parcela_critica,
+            "parcela_critica": resumo["parcela_atual"],
             "page_title": "Assinatura Suspensa",
         },
     )
 
 
+@orcamento_queries(8)
 def api_ficha_aluno(request, aluno_id):
     usuario = verificar_acesso_financeiro(request)
     if not usuario:
@@ -94,6 +96,7 @@ def api_ficha_aluno(request, aluno_id):
     return JsonResponse(payload)
 
 
+@orcamento_queries(30, repeticoes=10)
 @require_POST
 def api_atualizar_parcela(request, parcela_id):
     usuario = verificar_acesso_financeiro(request)
@@ -129,6 +132,7 @@ def api_atualizar_parcela(request, parcela_id):
     )
 
 
+@orcamento_queries(70, repeticoes=24)
 @require_POST
 def api_renegociar_parcela(request, parcela_id):
     usuario = verificar_acesso_financeiro(request)
@@ -2,7 +2,7 @@
 Admin para o app Trilha.
 """
 from django.contrib import admin
-from .models import Mundo, Step, ProgressoAluno, Submissao, NotaSaude
+from .models import Mundo, Step, ProgressoAluno, Submissao, NotaSaude, AlunoSnapshot, UploadSubmissao
 
 
 @admin.register(Mundo)
@@ -53,3 +53,20 @@ class NotaSaudeAdmin(admin.ModelAdmin):
     search_fields = ['aluno__email', 'observacao']
     raw_id_fields = ['aluno']
     readonly_fields = ['data']
+
+
+@admin.register(AlunoSnapshot)
+class AlunoSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['aluno', 'nota_atual', 'mundo_atual', 'step_atual', 'submissoes_pendentes', 'atualizado_em']
+    list_filter = ['nota_atual']
+    search_fields = ['aluno__email']
+    raw_id_fields = ['aluno', 'mundo_atual', 'step_atual']
+    readonly_fields = ['atualizado_em']
+
+
+@admin.register(UploadSubmissao)
+class UploadSubmissaoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'progresso', 'nome_arquivo', 'recebido', 'tamanho_total', 'submissao', 'criado_em']
+    search_fields = ['progresso__aluno__email', 'nome_arquivo']
+    raw_id_fields = ['progresso', 'submissao']
+    readonly_fields = ['partes', 'criado_em', 'atualizado_em']
@@ -4,34 +4,77 @@ API endpoints para o Monitor Graph View - Mindhub OS.
 import json
 from datetime import timedelta
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.db import IntegrityError, transaction
 from django.db.models import Max, Count, Q
 
+from apps.core.orcamento import orcamento_queries
 from apps.usuarios.models import Usuario, RoleChoices
+from apps.usuarios.utils import get_usuario_logado
 from .models import (
     Mundo, Step, ProgressoAluno, Submissao, NotaSaude,
-    StatusProgresso
+    StatusProgresso, UploadSubmissao
 )
+from .cache import (
+    escopo_aluno, escopo_do_usuario, etag_resposta_em_cache, gerar_etag, invalidar_alunos, resposta_em_cache
+)
+from .services import (
+    LIMITE_PADRAO_FILA, ChangesetInvalido, CursorInvalido, LoteInvalido, alunos_com_snapshot,
+    aplicar_changeset_trilha, atualizar_snapshot, carregar_trilha, clonar_trilha_base, paginar_fila_validacao,
+    resumo_estatisticas_alunos, validar_submissoes_em_lote
+)
+from .uploads import TAMANHO_MAXIMO_PARTE, UploadInvalido, anexar_parte, finalizar_upload, iniciar_upload
 
 
 def verificar_monitor(request):
     """Verifica se o usuário logado é monitor ou admin."""
-    email = request.session.get('usuario')
-    if not email:
+    if not request.session.get('usuario'):
         return None, JsonResponse({'error': 'Não autenticado'}, status=401)
     
-    try:
-        usuario = Usuario.objects.get(email=email)
-        if not usuario.pode_validar:
-            return None, JsonResponse({'error': 'Acesso negado'}, status=403)
-        return usuario, None
-    except Usuario.DoesNotExist:
+    usuario = get_usuario_logado(request)
+    if usuario is None:
         return None, JsonResponse({'error': 'Usuário não encontrado'}, status=404)
+    if not usuario.pode_validar:
+        return None, JsonResponse({'error': 'Acesso negado'}, status=403)
+    return usuario, None
+
+
+def etag_monitor(request, *args, **kwargs):
+    """ETag das listas do monitor: versão do seu escopo (ou global, se ADMIN)."""
+    monitor, error = verificar_monitor(request)
+    if error:
+        return None
+    return gerar_etag(request, escopo_do_usuario(monitor))
+
+
+def etag_monitor_aluno(request, aluno_id):
+    """ETag dos dados de um aluno vistos pelo monitor responsável (ou ADMIN)."""
+    monitor, error = verificar_monitor(request)
+    if error:
+        return None
+    alunos = Usuario.objects.filter(id=aluno_id, role=RoleChoices.ALUNO)
+    if monitor.role != RoleChoices.ADMIN:
+        alunos = alunos.filter(monitor_responsavel=monitor)
+    if not alunos.exists():
+        return None
+    return gerar_etag(request, escopo_aluno(aluno_id))
+
 
+def etag_em_cache(nome):
+    """ETag das respostas servidas por resposta_em_cache (só quando o payload está atualizado)."""
+    def _etag(request, *args, **kwargs):
+        monitor, error = verificar_monitor(request)
+        if error:
+            return None
+        return etag_resposta_em_cache(request, nome, escopo_do_usuario(monitor))
+    return _etag
 
+
+@orcamento_queries(8)
 @require_http_methods(["GET"])
+@condition(etag_func=etag_em_cache('monitor_alunos'))
 def api_monitor_alunos(request):
     """
     GET /api/monitor/alunos/
@@ -41,38 +84,34 @@ def api_monitor_alunos(request):
     if error:
         return error
     
+    return JsonResponse(resposta_em_cache(
+        'monitor_alunos', escopo_do_usuario(monitor), lambda: _payload_monitor_alunos(monitor)
+    ))
+
+
+def _payload_monitor_alunos(monitor):
+    """Monta o payload de /api/monitor/alunos/ para o monitor (ou ADMIN)."""
     alunos = Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True)
     
     # Se não for ADMIN, filtra apenas os alunos do monitor
     if monitor.role != RoleChoices.ADMIN:
         alunos = alunos.filter(monitor_responsavel=monitor)
     
-    # Busca última nota de cada aluno
+    # Dados vêm do AlunoSnapshot (uma única leitura com JOIN)
     alunos_data = []
-    for aluno in alunos:
-        nota_atual = NotaSaude.get_nota_atual(aluno)
-        cor = NotaSaude.get_cor_nota(nota_atual)
-        mundo_atual = aluno.get_mundo_atual()
-        step_atual = aluno.get_step_atual()
-        
-        # Verifica última submissão
-        ultima_submissao = Submissao.objects.filter(
-            progresso__aluno=aluno
-        ).order_by('-data_envio').first()
-        
-        # Conta submissões pendentes
-        pendentes = Submissao.objects.filter(
-            progresso__aluno=aluno,
-            aprovado__isnull=True
-        ).count()
+    for aluno in alunos_com_snapshot(alunos):
+        snapshot = aluno.snapshot
+        mundo_atual = snapshot.mundo_atual
+        step_atual = snapshot.step_atual
         
         alunos_data.append({
             'id': aluno.id,
             'nome': aluno.nome or aluno.email.split('@')[0],
             'email': aluno.email,
             'foto': aluno.foto.url if aluno.foto else None,
-            'nota': nota_atual,
-            'cor': cor,
+            'foto_thumb': aluno.foto_thumb_url,
+            'nota': snapshot.nota_atual,
+            'cor': NotaSaude.get_cor_nota(snapshot.nota_atual),
             'mundo': {
                 'numero': mundo_atual.numero,
                 'nome': mundo_atual.nome
@@ -81,11 +120,11 @@ def api_monitor_alunos(request):
                 'id': step_atual.id,
                 'titulo': step_atual.titulo
             } if step_atual else None,
-            'ultima_atividade': ultima_submissao.data_envio.isoformat() if ultima_submissao else None,
-            'submissoes_pendentes': pendentes
+            'ultima_atividade': snapshot.ultima_submissao.isoformat() if snapshot.ultima_submissao else None,
+            'submissoes_pendentes': snapshot.submissoes_pendentes
         })
     
-    return JsonResponse({
+    return {
         'alunos': alunos_data,
         'total': len(alunos_data),
         'cores_legenda': {
@@ -95,10 +134,12 @@ def api_monitor_alunos(request):
             2: {'cor': '#ff9800', 'label': 'Atenção'},
             1: {'cor': '#dc3545', 'label': 'Crítico'},
         }
-    })
+    }
 
 
+@orcamento_queries(22)
 @require_http_methods(["GET"])
+@condition(etag_func=etag_monitor_aluno)
 def api_monitor_aluno_detalhe(request, aluno_id):
     """
     GET /api/monitor/aluno/<id>/
@@ -144,46 +185,42 @@ def api_monitor_aluno_detalhe(request, aluno_id):
     ).select_related('progresso__step').order_by('-data_envio')[:5]
     
     # NOVAS CHAVES PARA O DRAWER V2
-    # 1. Todos os Mundos ordenados deste aluno específico
-    mundos_aluno = Mundo.objects.filter(aluno=aluno, ativo=True).prefetch_related('steps').order_by('numero')
-    todos_mundos = list(mundos_aluno.values('id', 'numero', 'nome'))
-    
-    # 2. Mapa de progresso para busca rápida
-    progressos_map = {
-        p.step_id: p for p in ProgressoAluno.objects.filter(aluno=aluno).prefetch_related('submissoes')
-    }
+    # 1. Todos os Mundos ordenados deste aluno específico (trilha carregada em lote)
+    trilha = carregar_trilha(aluno, com_submissoes=True)
+    todos_mundos = [{'id': m.id, 'numero': m.numero, 'nome': m.nome} for m in trilha.mundos]
     
     steps_auditoria = []
     
-    for mundo in mundos_aluno:
-        for step in mundo.steps.filter(ativo=True).order_by('ordem'):
-            prog = progressos_map.get(step.id)
-            status_progresso = prog.status if prog else StatusProgresso.BLOQUEADO
-            sub = prog.submissoes.order_by('-data_envio').first() if prog else None
-            
-            step_data = {
-                'progresso_id': prog.id if prog else None,
-                'step_id': step.id,
-                'titulo': step.titulo,
-                'mundo_id': mundo.id,
-                'mundo_numero': mundo.numero,
-                'status_progresso': status_progresso,
-                'submissao': None
+    for mundo, step in trilha.steps():
+        prog = trilha.progresso(step)
+        status_progresso = prog.status if prog else StatusProgresso.BLOQUEADO
+        sub = trilha.ultima_submissao(step)
+        
+        step_data = {
+            'progresso_id': prog.id if prog else None,
+            'step_id': step.id,
+            'titulo': step.titulo,
+            'mundo_id': mundo.id,
+            'mundo_numero': mundo.numero,
+            'status_progresso': status_progresso,
+            'submissao': None
+        }
+        
+        if sub:
+            step_data['submissao'] = {
+                'id': sub.id,
+                'data_envio': sub.data_envio.isoformat(),
+                'status': 'pendente' if sub.aprovado is None else ('aprovado' if sub.aprovado else 'reprovado'),
+                'feedback': sub.feedback,
+                'tipo_validacao': step.tipo_validacao,
+                'arquivo': sub.arquivo.url if sub.arquivo else None,
+                'arquivo_thumb': sub.arquivo_thumb_url,
+                'arquivo_medio': sub.arquivo_medio_url,
+                'resposta_texto': sub.resposta_texto,
+                'resposta_formulario': sub.resposta_formulario
             }
             
-            if sub:
-                step_data['submissao'] = {
-                    'id': sub.id,
-                    'data_envio': sub.data_envio.isoformat(),
-                    'status': 'pendente' if sub.aprovado is None else ('aprovado' if sub.aprovado else 'reprovado'),
-                    'feedback': sub.feedback,
-                    'tipo_validacao': step.tipo_validacao,
-                    'arquivo': sub.arquivo.url if sub.arquivo else None,
-                    'resposta_texto': sub.resposta_texto,
-                    'resposta_formulario': sub.resposta_formulario
-                }
-                
-            steps_auditoria.append(step_data)
+        steps_auditoria.append(step_data)
         
     return JsonResponse({
         'aluno': {
@@ -191,6 +228,7 @@ def api_monitor_aluno_detalhe(request, aluno_id):
             'nome': aluno.nome or aluno.email.split('@')[0],
             'email': aluno.email,
             'foto': aluno.foto.url if aluno.foto else None,
+            'foto_thumb': aluno.foto_thumb_url,
             'telefone': aluno.telefone,
             'data_cadastro': aluno.data_cadastro.isoformat(),
         },
@@ -245,6 +283,7 @@ def api_monitor_aluno_detalhe(request, aluno_id):
     })
 
 
+@orcamento_queries(8)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_monitor_atualizar_nota(request, aluno_id):
@@ -295,11 +334,20 @@ def api_monitor_atualizar_nota(request, aluno_id):
     })
 
 
+@orcamento_queries(5)
 @require_http_methods(["GET"])
+@condition(etag_func=etag_monitor)
 def api_monitor_submissoes_pendentes(request):
     """
     GET /api/monitor/submissoes-pendentes/
-    Lista todas as submissões pendentes de validação.
+    Fila de submissões pendentes de validação, da mais antiga para a mais nova,
+    paginada por cursor.
+
+    Query params (opcionais):
+        cursor: `proximo_cursor` da página anterior
+        limite: itens por página (padrão 50, máximo 200)
+        step, mundo: filtram por ID do step ou do mundo
+        tipo_validacao: FOTO, FORMULARIO ou TEXTO
     """
     monitor, error = verificar_monitor(request)
     if error:
@@ -312,11 +360,27 @@ def api_monitor_submissoes_pendentes(request):
     # Se não for ADMIN, filtra submissões dos alunos do monitor
     if monitor.role != RoleChoices.ADMIN:
         submissoes = submissoes.filter(progresso__aluno__monitor_responsavel=monitor)
+
+    try:
+        if request.GET.get('step'):
+            submissoes = submissoes.filter(progresso__step_id=int(request.GET['step']))
+        if request.GET.get('mundo'):
+            submissoes = submissoes.filter(progresso__step__mundo_id=int(request.GET['mundo']))
+        limite = int(request.GET.get('limite') or LIMITE_PADRAO_FILA)
+    except ValueError:
+        return JsonResponse({'error': 'step, mundo e limite devem ser números'}, status=400)
+    if request.GET.get('tipo_validacao'):
+        submissoes = submissoes.filter(progresso__step__tipo_validacao=request.GET['tipo_validacao'])
         
     submissoes = submissoes.select_related(
         'progresso__aluno', 
         'progresso__step__mundo'
-    ).order_by('data_envio')
+    )
+
+    try:
+        pagina = paginar_fila_validacao(submissoes, cursor=request.GET.get('cursor'), limite=limite)
+    except CursorInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     return JsonResponse({
         'submissoes': [
@@ -326,7 +390,8 @@ def api_monitor_submissoes_pendentes(request):
                     'id': s.progresso.aluno.id,
                     'nome': s.progresso.aluno.nome or s.progresso.aluno.email.split('@')[0],
                     'email': s.progresso.aluno.email,
-                    'foto': s.progresso.aluno.foto.url if s.progresso.aluno.foto else None
+                    'foto': s.progresso.aluno.foto.url if s.progresso.aluno.foto else None,
+                    'foto_thumb': s.progresso.aluno.foto_thumb_url
                 },
                 'step': {
                     'id': s.progresso.step.id,
@@ -336,14 +401,18 @@ def api_monitor_submissoes_pendentes(request):
                 },
                 'data_envio': s.data_envio.isoformat(),
                 'arquivo': s.arquivo.url if s.arquivo else None,
+                'arquivo_thumb': s.arquivo_thumb_url,
+                'arquivo_medio': s.arquivo_medio_url,
                 'resposta_texto': s.resposta_texto,
                 'resposta_formulario': s.resposta_formulario
-            } for s in submissoes
+            } for s in pagina.submissoes
         ],
-        'total': submissoes.count()
+        'total': pagina.total,
+        'proximo_cursor': pagina.proximo_cursor
     })
 
 
+@orcamento_queries(18)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_monitor_validar_submissao(request, submissao_id):
@@ -408,6 +477,38 @@ def api_monitor_validar_submissao(request, submissao_id):
     })
 
 
+@orcamento_queries(15)
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_monitor_validar_lote(request):
+    """
+    POST /api/monitor/submissoes/validar-lote/
+    Aprova ou reprova várias submissões numa única transação.
+    Body: {"submissoes": [{"id": 1, "aprovado": true, "feedback": "opcional"}, ...]}
+    Retorna um resultado por item, na ordem enviada.
+    """
+    monitor, error = verificar_monitor(request)
+    if error:
+        return error
+    
+    try:
+        data = json.loads(request.body)
+        resultados = validar_submissoes_em_lote(monitor, data.get('submissoes'))
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Dados inválidos'}, status=400)
+    except LoteInvalido as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    
+    validadas = sum(1 for resultado in resultados if resultado['success'])
+    return JsonResponse({
+        'success': True,
+        'validadas': validadas,
+        'falhas': len(resultados) - validadas,
+        'resultados': resultados
+    })
+
+
+@orcamento_queries(16)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_monitor_forcar_avanco(request, aluno_id):
@@ -470,7 +571,9 @@ def api_monitor_forcar_avanco(request, aluno_id):
     })
 
 
+@orcamento_queries(6)
 @require_http_methods(["GET"])
+@condition(etag_func=etag_em_cache('monitor_estatisticas'))
 def api_monitor_estatisticas(request):
     """
     GET /api/monitor/estatisticas/
@@ -480,24 +583,35 @@ def api_monitor_estatisticas(request):
     if error:
         return error
     
+    return JsonResponse(resposta_em_cache(
+        'monitor_estatisticas', escopo_do_usuario(monitor), lambda: _payload_monitor_estatisticas(monitor)
+    ))
+
+
+def _payload_monitor_estatisticas(monitor):
+    """Monta o payload de /api/monitor/estatisticas/ para o monitor (ou ADMIN)."""
     # Queryset base de alunos
     qs_alunos = Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True)
     if monitor.role != RoleChoices.ADMIN:
         qs_alunos = qs_alunos.filter(monitor_responsavel=monitor)
 
-    # Total de alunos
-    total_alunos = qs_alunos.count()
+    # Alunos inativos = sem submissão nos últimos 7 dias
+    limite_inatividade = timezone.now() - timedelta(days=7)
+    
+    # Uma única query agrupada por nota atual, mês corrente e atividade recente
+    total_alunos = 0
+    alunos_inativos = 0
+    distribuicao_notas = {nota: 0 for nota in range(1, 6)}
+    contagem_meses = {i: 0 for i in range(1, 7)}
     
-    # Distribuição por nota
-    distribuicao_notas = {}
-    for nota in range(1, 6):
-        # Conta alunos cuja última nota é igual a 'nota'
-        # Conta alunos cuja última nota é igual a 'nota'
-        count = 0
-        for aluno in qs_alunos:
-            if NotaSaude.get_nota_atual(aluno) == nota:
-                count += 1
-        distribuicao_notas[nota] = count
+    for grupo in resumo_estatisticas_alunos(qs_alunos, limite_inatividade):
+        total_alunos += grupo['total']
+        if not grupo['ativo_recente']:
+            alunos_inativos += grupo['total']
+        if grupo['nota_atual'] in distribuicao_notas:
+            distribuicao_notas[grupo['nota_atual']] += grupo['total']
+        if grupo['mundo_corrente'] in contagem_meses:
+            contagem_meses[grupo['mundo_corrente']] += grupo['total']
     
     # Submissões pendentes
     if monitor.role != RoleChoices.ADMIN:
@@ -507,52 +621,6 @@ def api_monitor_estatisticas(request):
         ).count()
     else:
         submissoes_pendentes = Submissao.objects.filter(aprovado__isnull=True).count()
-    
-    # Alunos inativos (sem submissão nos últimos 7 dias)
-    limite_inatividade = timezone.now() - timedelta(days=7)
-    
-    # Submissões de alunos do monitor (ou todos se admin)
-    qs_submissoes = Submissao.objects.filter(data_envio__gte=limite_inatividade)
-    if monitor.role != RoleChoices.ADMIN:
-        qs_submissoes = qs_submissoes.filter(progresso__aluno__monitor_responsavel=monitor)
-        
-    alunos_ativos_ids = qs_submissoes.values_list('progresso__aluno_id', flat=True).distinct()
-    
-    alunos_inativos = qs_alunos.exclude(id__in=alunos_ativos_ids).count()
-    
-    # Progresso por mundo (Agrupado por Mês 1-6)
-    contagem_meses = {i: 0 for i in range(1, 7)}
-    
-    # Itera sobre os alunos FILTRADOS para contar onde cada um está
-    # (Poderia ser otimizado com aggregation no futuro)
-    for aluno in qs_alunos:
-        # Lógica simplificada para descobrir mundo atual
-        # Mundo atual = primeiro mundo com steps não concluídos
-        # Ou último mundo se tudo concluído
-        
-        # Como get_mundo_atual pode ser complexo, vamos buscar direto
-        # Busca o primeiro mundo que tem steps não concluídos
-        mundo_atual = None
-        
-        # Otimização: Busca mundos do aluno
-        mundos_aluno = Mundo.objects.filter(aluno=aluno).order_by('numero')
-        
-        for mundo in mundos_aluno:
-            steps_pendentes = ProgressoAluno.objects.filter(
-                aluno=aluno,
-                step__mundo=mundo
-            ).exclude(status=StatusProgresso.CONCLUIDO).exists()
-            
-            if steps_pendentes:
-                mundo_atual = mundo
-                break
-        
-        # Se não achou com pendentes, pega o último (concluiu tudo)
-        if not mundo_atual and mundos_aluno.exists():
-            mundo_atual = mundos_aluno.last()
-            
-        if mundo_atual and 1 <= mundo_atual.numero <= 6:
-            contagem_meses[mundo_atual.numero] += 1
             
     progresso_mundos = []
     nomes_meses_fixos = {
@@ -569,7 +637,7 @@ def api_monitor_estatisticas(request):
             'alunos_ativos': contagem_meses[i]
         })
     
-    return JsonResponse({
+    return {
         'total_alunos': total_alunos,
         'distribuicao_notas': distribuicao_notas,
         'submissoes_pendentes': submissoes_pendentes,
@@ -578,7 +646,7 @@ def api_monitor_estatisticas(request):
         'cores_notas': {
             str(k): NotaSaude.get_cor_nota(k) for k in range(1, 6)
         }
-    })
+    }
 
 
 def enviar_alerta_whatsapp(aluno_id, mensagem=None):
@@ -612,6 +680,7 @@ def enviar_alerta_whatsapp(aluno_id, mensagem=None):
         return {'success': False, 'error': 'Aluno não encontrado'}
 
 
+@orcamento_queries(6)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_monitor_enviar_alerta(request, aluno_id):
@@ -649,20 +718,37 @@ def api_monitor_enviar_alerta(request, aluno_id):
 
 def verificar_aluno(request):
     """Verifica se o usuário logado é aluno."""
-    email = request.session.get('usuario')
-    if not email:
+    if not request.session.get('usuario'):
         return None, JsonResponse({'error': 'Não autenticado'}, status=401)
     
-    try:
-        usuario = Usuario.objects.get(email=email)
-        if usuario.role != RoleChoices.ALUNO:
-            return None, JsonResponse({'error': 'Acesso negado'}, status=403)
-        return usuario, None
-    except Usuario.DoesNotExist:
+    usuario = get_usuario_logado(request)
+    if usuario is None:
         return None, JsonResponse({'error': 'Usuário não encontrado'}, status=404)
+    if usuario.role != RoleChoices.ALUNO:
+        return None, JsonResponse({'error': 'Acesso negado'}, status=403)
+    return usuario, None
+
+
+def etag_aluno(request, *args, **kwargs):
+    """ETag das telas do aluno logado: versão do escopo do próprio aluno."""
+    aluno, error = verificar_aluno(request)
+    if error:
+        return None
+    return gerar_etag(request, escopo_aluno(aluno.id))
+
+
+def etag_aluno_step(request, step_id):
+    """Como etag_aluno, somando o escopo do dono do step (edições do CMS)."""
+    aluno, error = verificar_aluno(request)
+    if error:
+        return None
+    dono_id = Step.objects.filter(id=step_id).values_list('mundo__aluno_id', flat=True).first()
+    return gerar_etag(request, escopo_aluno(aluno.id), escopo_aluno(dono_id))
 
 
+@orcamento_queries(7)
 @require_http_methods(["GET"])
+@condition(etag_func=etag_aluno)
 def api_aluno_progresso(request):
     """
     GET /api/aluno/progresso/
@@ -678,20 +764,15 @@ def api_aluno_progresso(request):
     steps_concluidos_total = 0
     step_atual = None
     
-    for mundo in Mundo.objects.filter(aluno=aluno, ativo=True).prefetch_related('steps').order_by('numero'):
-        steps_mundo = mundo.steps.filter(ativo=True).order_by('ordem')
+    trilha = carregar_trilha(aluno)
+    
+    for mundo in trilha.mundos:
         steps_data = []
         steps_concluidos = 0
         
-        for step in steps_mundo:
+        for step in mundo.steps_ativos:
             total_steps += 1
-            
-            # Busca progresso do aluno neste step
-            try:
-                progresso = ProgressoAluno.objects.get(aluno=aluno, step=step)
-                status = progresso.status
-            except ProgressoAluno.DoesNotExist:
-                status = StatusProgresso.BLOQUEADO
+            status = trilha.status(step)
             
             if status == StatusProgresso.CONCLUIDO:
                 steps_concluidos += 1
@@ -739,7 +820,9 @@ def api_aluno_progresso(request):
     })
 
 
+@orcamento_queries(8)
 @require_http_methods(["GET"])
+@condition(etag_func=etag_aluno_step)
 def api_aluno_step_detalhe(request, step_id):
     """
     GET /api/aluno/step/<id>/
@@ -789,6 +872,7 @@ def api_aluno_step_detalhe(request, step_id):
     })
 
 
+@orcamento_queries(20)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_aluno_submeter(request):
@@ -841,10 +925,132 @@ def api_aluno_submeter(request):
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Dados do formulário inválidos'}, status=400)
     
-    submissao.save()
+    # Só as escritas abrem transação: submissão e progresso entram juntos e o
+    # snapshot do aluno é recalculado uma vez, no commit
+    with transaction.atomic():
+        submissao.save()
+        progresso.enviar_para_validacao()
     
-    # Atualiza status do progresso
-    progresso.enviar_para_validacao()
+    return JsonResponse({
+        'success': True,
+        'message': 'Submissão enviada para validação!',
+        'submissao_id': submissao.id
+    })
+
+
+def _upload_do_aluno(aluno, upload_id):
+    return UploadSubmissao.objects.filter(id=upload_id, progresso__aluno=aluno).first()
+
+
+def _status_upload(upload):
+    return {
+        'upload_id': str(upload.id),
+        'recebido': upload.recebido,
+        'tamanho': upload.tamanho_total,
+        'concluido': upload.concluido,
+        'tamanho_maximo_parte': TAMANHO_MAXIMO_PARTE,
+    }
+
+
+@orcamento_queries(6)
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_aluno_upload_iniciar(request):
+    """
+    POST /api/aluno/upload/
+    Inicia um upload em partes da foto de um step.
+    Body: {"step_id": 1, "nome_arquivo": "foto.jpg", "tamanho": 3145728}
+    """
+    aluno, error = verificar_aluno(request)
+    if error:
+        return error
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    
+    try:
+        progresso = ProgressoAluno.objects.select_related('step').get(
+            aluno=aluno, step_id=data.get('step_id'), step__ativo=True
+        )
+    except (ProgressoAluno.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({'error': 'Você ainda não iniciou este step'}, status=400)
+    
+    try:
+        upload = iniciar_upload(progresso, data.get('nome_arquivo'), data.get('tamanho'))
+    except UploadInvalido as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    
+    return JsonResponse(_status_upload(upload), status=201)
+
+
+@orcamento_queries(5)
+@require_http_methods(["GET"])
+def api_aluno_upload_status(request, upload_id):
+    """
+    GET /api/aluno/upload/<id>/
+    Quantos bytes já foram recebidos (para retomar o envio).
+    Sem ETag: a resposta muda a cada parte recebida.
+    """
+    aluno, error = verificar_aluno(request)
+    if error:
+        return error
+    
+    upload = _upload_do_aluno(aluno, upload_id)
+    if not upload:
+        return JsonResponse({'error': 'Upload não encontrado'}, status=404)
+    return JsonResponse(_status_upload(upload))
+
+
+@orcamento_queries(10)
+@csrf_exempt
+@require_http_methods(["PUT", "POST"])
+def api_aluno_upload_parte(request, upload_id):
+    """
+    PUT /api/aluno/upload/<id>/parte/?offset=<bytes já enviados>
+    Corpo bruto (application/octet-stream) com a próxima parte do arquivo.
+    """
+    aluno, error = verificar_aluno(request)
+    if error:
+        return error
+    
+    if not _upload_do_aluno(aluno, upload_id):
+        return JsonResponse({'error': 'Upload não encontrado'}, status=404)
+    
+    try:
+        offset = int(request.GET.get('offset', ''))
+    except ValueError:
+        return JsonResponse({'error': 'offset é obrigatório'}, status=400)
+    
+    try:
+        # O request é lido em blocos direto para o storage (sem request.body)
+        upload = anexar_parte(upload_id, offset, request)
+    except UploadInvalido as e:
+        return JsonResponse({'error': str(e), 'recebido': _upload_do_aluno(aluno, upload_id).recebido}, status=e.status)
+    
+    return JsonResponse(_status_upload(upload))
+
+
+@orcamento_queries(20)
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_aluno_upload_finalizar(request, upload_id):
+    """
+    POST /api/aluno/upload/<id>/finalizar/
+    Junta as partes, cria a submissão e envia o step para validação.
+    """
+    aluno, error = verificar_aluno(request)
+    if error:
+        return error
+    
+    if not _upload_do_aluno(aluno, upload_id):
+        return JsonResponse({'error': 'Upload não encontrado'}, status=404)
+    
+    try:
+        submissao = finalizar_upload(upload_id)
+    except UploadInvalido as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
     
     return JsonResponse({
         'success': True,
@@ -863,12 +1069,14 @@ def verificar_acesso_trilha(request, aluno_id):
     ADMIN: todos os alunos
     MONITOR: apenas seus alunos_responsaveis
     """
-    email = request.session.get('usuario')
-    if not email:
+    if not request.session.get('usuario'):
         return None, None, JsonResponse({'error': 'Não autenticado'}, status=401)
     
+    usuario = get_usuario_logado(request)
+    if usuario is None:
+        return None, None, JsonResponse({'error': 'Usuário não encontrado'}, status=404)
+    
     try:
-        usuario = Usuario.objects.get(email=email)
         aluno = Usuario.objects.get(id=aluno_id, role=RoleChoices.ALUNO)
         
         # ADMIN pode acessar todos
@@ -887,8 +1095,18 @@ def verificar_acesso_trilha(request, aluno_id):
         return None, None, JsonResponse({'error': 'Usuário não encontrado'}, status=404)
 
 
+def etag_trilha_aluno(request, aluno_id):
+    """ETag do CMS da trilha: versão do escopo do aluno editado."""
+    usuario, aluno, error = verificar_acesso_trilha(request, aluno_id)
+    if error:
+        return None
+    return gerar_etag(request, escopo_aluno(aluno.id))
+
+
+@orcamento_queries(8)
 @csrf_exempt
 @require_http_methods(["GET"])
+@condition(etag_func=etag_trilha_aluno)
 def api_trilha_aluno(request, aluno_id):
     """
     GET /api/trilha/{aluno_id}/
@@ -898,7 +1116,7 @@ def api_trilha_aluno(request, aluno_id):
     if error:
         return error
     
-    mundos = Mundo.objects.filter(aluno=aluno, ativo=True).prefetch_related('steps').order_by('numero')
+    trilha = carregar_trilha(aluno, com_progresso=False)
     
     data = {
         'aluno': {
@@ -909,7 +1127,7 @@ def api_trilha_aluno(request, aluno_id):
         'mundos': []
     }
     
-    for mundo in mundos:
+    for mundo in trilha.mundos:
         mundo_data = {
             'id': mundo.id,
             'numero': mundo.numero,
@@ -919,7 +1137,7 @@ def api_trilha_aluno(request, aluno_id):
             'steps': []
         }
         
-        for step in mundo.steps.filter(ativo=True).order_by('ordem'):
+        for step in mundo.steps_ativos:
             mundo_data['steps'].append({
                 'id': step.id,
                 'ordem': step.ordem,
@@ -936,6 +1154,7 @@ def api_trilha_aluno(request, aluno_id):
     return JsonResponse(data)
 
 
+@orcamento_queries(10)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_salvar_mundo(request, aluno_id):
@@ -986,6 +1205,7 @@ def api_salvar_mundo(request, aluno_id):
     })
 
 
+@orcamento_queries(12)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_salvar_step(request, aluno_id):
@@ -1048,6 +1268,7 @@ def api_salvar_step(request, aluno_id):
     })
 
 
+@orcamento_queries(10)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_reordenar_steps(request, aluno_id):
@@ -1073,13 +1294,47 @@ def api_reordenar_steps(request, aluno_id):
     except Mundo.DoesNotExist:
         return JsonResponse({'error': 'Mundo não encontrado'}, status=404)
     
-    # Atualiza a ordem de cada step
+    # Atualiza a ordem de todos os steps num único UPDATE
+    steps = {step.id: step for step in Step.objects.filter(id__in=step_ids, mundo=mundo)}
     for ordem, step_id in enumerate(step_ids, start=1):
-        Step.objects.filter(id=step_id, mundo=mundo).update(ordem=ordem)
+        if step_id in steps:
+            steps[step_id].ordem = ordem
+    Step.objects.bulk_update(steps.values(), ['ordem'])
     
+    atualizar_snapshot(aluno.id)
+    invalidar_alunos([aluno.id])
     return JsonResponse({'success': True})
 
 
+@orcamento_queries(20)
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_aplicar_changeset(request, aluno_id):
+    """
+    POST /api/trilha/{aluno_id}/changeset/
+    Aplica criações, edições, deleções e reordenações de mundos e steps numa
+    única transação (formato em services.aplicar_changeset_trilha).
+    """
+    usuario, aluno, error = verificar_acesso_trilha(request, aluno_id)
+    if error:
+        return error
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    
+    try:
+        resultado = aplicar_changeset_trilha(aluno, data)
+    except ChangesetInvalido as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except IntegrityError:
+        return JsonResponse({'error': 'Changeset conflita com a numeração existente da trilha'}, status=400)
+    
+    return JsonResponse({'success': True, **resultado})
+
+
+@orcamento_queries(10)
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def api_deletar_step(request, aluno_id, step_id):
@@ -1100,6 +1355,7 @@ def api_deletar_step(request, aluno_id, step_id):
         return JsonResponse({'error': 'Step não encontrado'}, status=404)
 
 
+@orcamento_queries(14)
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def api_deletar_mundo(request, aluno_id, mundo_id):
@@ -1117,11 +1373,14 @@ def api_deletar_mundo(request, aluno_id, mundo_id):
         mundo.save()
         # Desativa steps também
         mundo.steps.update(ativo=False)
+        atualizar_snapshot(aluno.id)
+        invalidar_alunos([aluno.id])
         return JsonResponse({'success': True})
     except Mundo.DoesNotExist:
         return JsonResponse({'error': 'Mundo não encontrado'}, status=404)
 
 
+@orcamento_queries(22)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_clonar_trilha_base(request, aluno_id):
@@ -1138,39 +1397,16 @@ def api_clonar_trilha_base(request, aluno_id):
         return JsonResponse({'error': 'Aluno já possui trilha. Delete antes de clonar.'}, status=400)
     
     # Busca trilha base (mundos sem aluno)
-    mundos_base = Mundo.objects.filter(aluno__isnull=True, ativo=True).prefetch_related('steps')
-    
-    if not mundos_base.exists():
+    if not Mundo.objects.filter(aluno__isnull=True, ativo=True).exists():
         return JsonResponse({'error': 'Nenhuma Trilha Base encontrada'}, status=404)
     
-    # Clona cada mundo e seus steps
-    mundos_criados = 0
-    steps_criados = 0
+    # Clona mundos, steps e o progresso inicial em lote
+    resultado = clonar_trilha_base([aluno.id])
+    if not resultado.alunos_clonados:
+        return JsonResponse({'error': 'Aluno possui mundos desativados com a mesma numeração da Trilha Base.'}, status=400)
     
-    for mundo_base in mundos_base:
-        novo_mundo = Mundo.objects.create(
-            aluno=aluno,
-            numero=mundo_base.numero,
-            nome=mundo_base.nome,
-            descricao=mundo_base.descricao,
-            objetivo=mundo_base.objetivo,
-            icone=mundo_base.icone,
-            cor_primaria=mundo_base.cor_primaria
-        )
-        mundos_criados += 1
-        
-        for step_base in mundo_base.steps.filter(ativo=True):
-            Step.objects.create(
-                mundo=novo_mundo,
-                ordem=step_base.ordem,
-                titulo=step_base.titulo,
-                descricao=step_base.descricao,
-                instrucoes=step_base.instrucoes,
-                tipo_validacao=step_base.tipo_validacao,
-                config_formulario=step_base.config_formulario,
-                pontos=step_base.pontos
-            )
-            steps_criados += 1
+    mundos_criados = resultado.mundos_criados
+    steps_criados = resultado.steps_criados
     
     return JsonResponse({
         'success': True,
@@ -1180,6 +1416,7 @@ def api_clonar_trilha_base(request, aluno_id):
     })
 
 
+@orcamento_queries(14)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_criar_trilha_vazia(request, aluno_id):
@@ -1204,25 +1441,28 @@ def api_criar_trilha_vazia(request, aluno_id):
         'Mês 6'
     ]
     
-    for i, nome in enumerate(nomes_mundos, start=1):
-        mundo = Mundo.objects.create(
-            aluno=aluno,
-            numero=i,
-            nome=nome,
-            descricao='',
-            objetivo=''
-        )
+    with transaction.atomic():
+        mundos = Mundo.objects.bulk_create([
+            Mundo(aluno=aluno, numero=i, nome=nome, descricao='', objetivo='')
+            for i, nome in enumerate(nomes_mundos, start=1)
+        ])
         
-        # Cria um step inicial padrão para o mundo não ficar vazio
-        Step.objects.create(
-            mundo=mundo,
-            ordem=1,
-            titulo='Boas vindas',
-            descricao=f'Bem-vindo ao {nome}!',
-            instrucoes='Clique aqui para iniciar sua jornada.',
-            tipo_validacao='TEXTO',
-            pontos=10
-        )
+        # Cria um step inicial padrão para cada mundo não ficar vazio
+        Step.objects.bulk_create([
+            Step(
+                mundo=mundo,
+                ordem=1,
+                titulo='Boas vindas',
+                descricao=f'Bem-vindo ao {mundo.nome}!',
+                instrucoes='Clique aqui para iniciar sua jornada.',
+                tipo_validacao='TEXTO',
+                pontos=10
+            )
+            for mundo in mundos
+        ])
+        # bulk_create não dispara signals
+        atualizar_snapshot(aluno.id)
+        invalidar_alunos([aluno.id])
     
     return JsonResponse({
         'success': True,
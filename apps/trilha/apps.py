@@ -5,3 +5,6 @@ class TrilhaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.trilha'
     verbose_name = 'Trilha Gamificada'
+
+    def ready(self):
+        import apps.trilha.signals
@@ -0,0 +1,170 @@
+"""
+Cache das APIs do dashboard do Monitor - Mindhub OS.
+
+Cada resposta é guardada junto com a versão do seu escopo ('global' para o ADMIN,
+'monitor:<id>' para cada monitor). Quando a versão muda, o payload antigo continua
+sendo servido enquanto uma única thread recalcula em segundo plano
+(stale-while-revalidate).
+
+As mesmas versões (mais 'aluno:<id>') geram os ETags das APIs da trilha. Elas
+ficam no banco (VersaoEscopo), não no cache: valem para todas as instâncias e
+não somem quando o cache descarta chaves, então um ETag antigo nunca volta a
+bater com uma versão reiniciada.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import F
+
+from apps.usuarios.models import Usuario, RoleChoices
+from .models import VersaoEscopo
+
+
+logger = logging.getLogger(__name__)
+
+ESCOPO_GLOBAL = 'global'
+TEMPO_LOCK = 60  # segundos que um recálculo pode segurar o lock
+IDADE_MAXIMA = 5 * 60  # mesmo sem mudanças, recalcula (inatividade depende do relógio)
+
+
+def escopo_monitor(monitor_id):
+    return f'monitor:{monitor_id}'
+
+
+def escopo_aluno(aluno_id):
+    return f'aluno:{aluno_id}'
+
+
+def escopo_do_usuario(usuario):
+    """ADMIN enxerga todos os alunos (escopo global); monitores só os seus."""
+    if usuario.role == RoleChoices.ADMIN:
+        return ESCOPO_GLOBAL
+    return escopo_monitor(usuario.id)
+
+
+def versoes(escopos):
+    """{escopo: versão atual} numa query; escopo sem linha está na versão 1."""
+    escopos = set(escopos)
+    atuais = dict(VersaoEscopo.objects.filter(escopo__in=escopos).values_list('escopo', 'versao'))
+    return {escopo: atuais.get(escopo, 1) for escopo in escopos}
+
+
+def versao(escopo):
+    """Versão atual do escopo (começa em 1)."""
+    return versoes([escopo])[escopo]
+
+
+def incrementar_versoes(escopos):
+    """Invalida os escopos informados; o próximo acesso recalcula a resposta."""
+    escopos = set(escopos)
+    existentes = set(VersaoEscopo.objects.filter(escopo__in=escopos).values_list('escopo', flat=True))
+    VersaoEscopo.objects.filter(escopo__in=existentes).update(versao=F('versao') + 1)
+    # Escopo sem linha estava na versão 1; em corrida, quem perde o insert já viu a versão mudar
+    VersaoEscopo.objects.bulk_create(
+        [VersaoEscopo(escopo=escopo, versao=2) for escopo in escopos - existentes],
+        ignore_conflicts=True,
+    )
+
+
+def invalidar_alunos(aluno_ids):
+    """
+    Incrementa a versão global, a dos próprios alunos e a dos monitores
+    responsáveis por eles, depois do commit da transação corrente.
+    """
+    aluno_ids = [aluno_id for aluno_id in aluno_ids if aluno_id]
+    if not aluno_ids:
+        return
+    
+    def _incrementar():
+        monitores = Usuario.objects.filter(id__in=aluno_ids, monitor_responsavel__isnull=False)\
+            .values_list('monitor_responsavel_id', flat=True).distinct()
+        incrementar_versoes(
+            [ESCOPO_GLOBAL]
+            + [escopo_aluno(aluno_id) for aluno_id in aluno_ids]
+            + [escopo_monitor(monitor_id) for monitor_id in monitores]
+        )
+    
+    transaction.on_commit(_incrementar)
+
+
+def invalidar_tudo():
+    """Invalida o escopo global e de todos os monitores (cargas em massa, rebuild)."""
+    monitores = Usuario.objects.filter(role=RoleChoices.MONITOR).values_list('id', flat=True)
+    incrementar_versoes([ESCOPO_GLOBAL] + [escopo_monitor(monitor_id) for monitor_id in monitores])
+
+
+def _executar_em_segundo_plano(funcao):
+    def _tarefa():
+        try:
+            funcao()
+        finally:
+            # A thread abre sua própria conexão com o banco
+            connections.close_all()
+    threading.Thread(target=_tarefa, daemon=True).start()
+
+
+def _entrada(versao_atual, payload):
+    return {'versao': versao_atual, 'payload': payload, 'calculado_em': time.time()}
+
+
+def resposta_em_cache(nome, escopo, calcular):
+    """
+    Devolve o payload `nome` do escopo, recalculando com `calcular()` quando preciso.
+
+    - Sem nada em cache: calcula na hora e guarda.
+    - Versão desatualizada (ou payload com mais de IDADE_MAXIMA): devolve o payload
+      antigo e dispara um recálculo em segundo plano, protegido por um lock
+      (cache.add) para rodar uma vez só.
+    """
+    chave = f'trilha:{nome}:{escopo}'
+    versao_atual = versao(escopo)
+    entrada = cache.get(chave)
+    
+    if entrada is None:
+        payload = calcular()
+        cache.set(chave, _entrada(versao_atual, payload), timeout=None)
+        return payload
+    
+    expirada = time.time() - entrada['calculado_em'] > IDADE_MAXIMA
+    if entrada['versao'] != versao_atual or expirada:
+        chave_lock = f'{chave}:lock'
+        if cache.add(chave_lock, 1, timeout=TEMPO_LOCK):
+            def _recalcular():
+                try:
+                    cache.set(chave, _entrada(versao_atual, calcular()), timeout=None)
+                except Exception:
+                    logger.exception('Falha ao recalcular cache %s', chave)
+                finally:
+                    cache.delete(chave_lock)
+            
+            _executar_em_segundo_plano(_recalcular)
+    
+    return entrada['payload']
+
+
+def _hash_etag(request, partes):
+    partes = [request.get_full_path()] + [str(parte) for parte in partes]
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+
+def gerar_etag(request, *escopos):
+    """ETag de um GET: caminho + query string + versão atual de cada escopo."""
+    atuais = versoes(escopos)
+    return _hash_etag(request, [f'{escopo}={atuais[escopo]}' for escopo in escopos])
+
+
+def etag_resposta_em_cache(request, nome, escopo):
+    """
+    ETag de uma resposta servida por resposta_em_cache. Só existe quando o payload
+    guardado está atualizado; se estiver velho a view roda (e dispara o recálculo).
+    """
+    entrada = cache.get(f'trilha:{nome}:{escopo}')
+    if entrada is None or entrada['versao'] != versao(escopo):
+        return None
+    if time.time() - entrada['calculado_em'] > IDADE_MAXIMA:
+        return None
+    return _hash_etag(request, [escopo, entrada['versao'], entrada['calculado_em']])
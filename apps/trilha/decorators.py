@@ -5,18 +5,7 @@ from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
 
-from apps.usuarios.models import Usuario, RoleChoices
-
-
-def get_usuario_logado(request):
-    """Retorna o usuário logado ou None."""
-    email = request.session.get('usuario')
-    if not email:
-        return None
-    try:
-        return Usuario.objects.get(email=email)
-    except Usuario.DoesNotExist:
-        return None
+from apps.usuarios.utils import get_usuario_logado
 
 
 def aluno_required(view_func):
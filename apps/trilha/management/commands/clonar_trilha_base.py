@@ -0,0 +1,72 @@
+"""
+Management command para clonar a Trilha Base para uma turma inteira.
+Usa bulk_create em transações por lote (ver services.clonar_trilha_base).
+
+Uso:
+    python manage.py clonar_trilha_base --alunos 12 13 14
+    python manage.py clonar_trilha_base --monitor monitor@mindhub.com
+    python manage.py clonar_trilha_base --monitor 7 --batch-size 100
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from apps.usuarios.models import Usuario, RoleChoices
+from apps.trilha.services import clonar_trilha_base
+
+
+class Command(BaseCommand):
+    help = 'Clona a Trilha Base (mundos sem aluno) para vários alunos de uma vez'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alunos',
+            nargs='+',
+            type=int,
+            default=[],
+            help='IDs dos alunos que recebem a trilha'
+        )
+        parser.add_argument(
+            '--monitor',
+            help='ID ou email do monitor: clona para todos os alunos ativos dele'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Quantidade de alunos por transação (padrão: 50)'
+        )
+
+    def handle(self, *args, **options):
+        aluno_ids = list(options['alunos'])
+
+        if options['monitor']:
+            filtro = Q(email__iexact=options['monitor'])
+            if options['monitor'].isdigit():
+                filtro |= Q(id=int(options['monitor']))
+            monitor = Usuario.objects.filter(filtro).first()
+            if not monitor:
+                raise CommandError(f"Monitor '{options['monitor']}' não encontrado")
+            aluno_ids += Usuario.objects.filter(
+                monitor_responsavel=monitor, role=RoleChoices.ALUNO, ativo=True
+            ).values_list('id', flat=True)
+
+        if not aluno_ids:
+            raise CommandError('Informe --alunos e/ou --monitor')
+
+        self.stdout.write(
+            self.style.NOTICE(f'Clonando Trilha Base para {len(set(aluno_ids))} alunos...')
+        )
+        resultado = clonar_trilha_base(aluno_ids, batch_size=options['batch_size'])
+
+        if resultado.alunos_ignorados:
+            self.stdout.write(self.style.WARNING(
+                f'{len(resultado.alunos_ignorados)} alunos ignorados (já possuem trilha ou não são alunos): '
+                f'{", ".join(str(aluno_id) for aluno_id in resultado.alunos_ignorados)}'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(resultado.alunos_clonados)} alunos clonados: '
+            f'{resultado.mundos_criados} mundos, {resultado.steps_criados} steps, '
+            f'{resultado.progressos_criados} progressos em {resultado.duracao:.2f}s '
+            f'({resultado.linhas_por_segundo:.0f} linhas/s)'
+        ))
@@ -0,0 +1,46 @@
+"""
+Management command para reconstruir o AlunoSnapshot de todos os alunos.
+Use após o deploy da tabela ou sempre que houver cargas feitas fora do ORM.
+
+Uso:
+    python manage.py rebuild_snapshots
+    python manage.py rebuild_snapshots --batch-size 1000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.usuarios.models import Usuario, RoleChoices
+from apps.trilha.cache import invalidar_tudo
+from apps.trilha.services import atualizar_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o snapshot desnormalizado (AlunoSnapshot) de todos os alunos'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Quantidade de alunos recalculados por query (padrão: 500)'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        inicio = time.monotonic()
+        
+        aluno_ids = list(
+            Usuario.objects.filter(role=RoleChoices.ALUNO).order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(
+            self.style.NOTICE(f'Reconstruindo snapshots de {len(aluno_ids)} alunos (lotes de {batch_size})...')
+        )
+        
+        total = atualizar_snapshots(aluno_ids, batch_size=batch_size)
+        invalidar_tudo()
+        
+        duracao = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(f'{total} snapshots gravados em {duracao:.2f}s')
+        )
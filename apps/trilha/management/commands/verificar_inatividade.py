@@ -2,23 +2,33 @@
 Management command para verificar inatividade dos alunos.
 Deve ser executado diariamente via cron/scheduler.
 
+Uma única query traz os alunos inativos com nota atual e última atividade
+(ver services.alunos_inativos); as novas notas são gravadas com bulk_create
+em lotes, cada lote na sua transação.
+
 Uso:
     python manage.py verificar_inatividade
     python manage.py verificar_inatividade --dias 7
+    python manage.py verificar_inatividade --since 2025-01-31
+    python manage.py verificar_inatividade --batch-size 2000 -v 2
     python manage.py verificar_inatividade --dry-run
 """
-from datetime import timedelta
-from django.core.management.base import BaseCommand
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Max
+from django.utils.dateparse import parse_date
 
-from apps.usuarios.models import Usuario, RoleChoices
-from apps.trilha.models import NotaSaude, Submissao
+from apps.trilha.cache import invalidar_alunos
+from apps.trilha.models import AlunoSnapshot, NotaSaude
+from apps.trilha.services import alunos_inativos
 
 
 class Command(BaseCommand):
     help = 'Verifica alunos inativos e atualiza nota de saúde para 1 (vermelho)'
-    
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--dias',
@@ -26,6 +36,10 @@ class Command(BaseCommand):
             default=7,
             help='Número de dias para considerar inatividade (padrão: 7)'
         )
+        parser.add_argument(
+            '--since',
+            help='Data (AAAA-MM-DD): inativos são os alunos sem submissões desde ela; substitui --dias'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -37,80 +51,90 @@ class Command(BaseCommand):
             default=1,
             help='Nota a ser atribuída aos inativos (padrão: 1)'
         )
-    
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Quantidade de notas gravadas por transação (padrão: 1000)'
+        )
+
     def handle(self, *args, **options):
-        dias = options['dias']
         dry_run = options['dry_run']
         nota = options['nota']
-        
-        self.stdout.write(
-            self.style.NOTICE(f'Verificando alunos inativos há mais de {dias} dias...')
-        )
-        
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size deve ser maior que zero')
+
+        if options['since']:
+            data = parse_date(options['since'])
+            if data is None:
+                raise CommandError(f"Data inválida em --since: '{options['since']}' (use AAAA-MM-DD)")
+            limite = timezone.make_aware(datetime.combine(data, datetime.min.time()))
+            descricao = f'sem submissões desde {data.strftime("%d/%m/%Y")}'
+        else:
+            limite = timezone.now() - timedelta(days=options['dias'])
+            descricao = f'inativos há mais de {options["dias"]} dias'
+
+        self.stdout.write(self.style.NOTICE(f'Verificando alunos {descricao}...'))
         if dry_run:
             self.stdout.write(self.style.WARNING('MODO DRY-RUN: Nenhuma alteração será feita'))
-        
-        limite = timezone.now() - timedelta(days=dias)
-        
-        # Busca todos os alunos ativos
-        alunos = Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True)
-        
-        # IDs de alunos com atividade recente
-        alunos_ativos_ids = Submissao.objects.filter(
-            data_envio__gte=limite
-        ).values_list('progresso__aluno_id', flat=True).distinct()
-        
-        # Filtra alunos inativos
-        alunos_inativos = alunos.exclude(id__in=alunos_ativos_ids)
-        
-        # Filtra apenas aqueles cuja nota atual NÃO é igual à nota de inatividade
-        # (para não criar registros duplicados)
-        alunos_para_atualizar = []
-        for aluno in alunos_inativos:
-            nota_atual = NotaSaude.get_nota_atual(aluno)
-            if nota_atual != nota:
-                alunos_para_atualizar.append(aluno)
-        
-        if not alunos_para_atualizar:
+
+        inicio = time.monotonic()
+        alunos = list(alunos_inativos(limite, nota_inatividade=nota).values('id', 'email', 'ultima_atividade'))
+        duracao_consulta = time.monotonic() - inicio
+
+        if not alunos:
             self.stdout.write(
                 self.style.SUCCESS('Nenhum aluno inativo encontrado (ou todos já têm nota adequada)')
             )
             return
-        
-        self.stdout.write(
-            f'Encontrados {len(alunos_para_atualizar)} alunos inativos para atualizar:'
-        )
-        
-        for aluno in alunos_para_atualizar:
-            # Busca última atividade
-            ultima_submissao = Submissao.objects.filter(
-                progresso__aluno=aluno
-            ).order_by('-data_envio').first()
-            
-            if ultima_submissao:
-                dias_inativo = (timezone.now() - ultima_submissao.data_envio).days
-                ultima_atividade = ultima_submissao.data_envio.strftime('%d/%m/%Y')
+
+        self.stdout.write(f'Encontrados {len(alunos)} alunos inativos para atualizar')
+
+        agora = timezone.now()
+        notas = []
+        for aluno in alunos:
+            if aluno['ultima_atividade']:
+                dias_inativo = (agora - aluno['ultima_atividade']).days
+                ultima_atividade = aluno['ultima_atividade'].strftime('%d/%m/%Y')
             else:
                 dias_inativo = 'N/A'
                 ultima_atividade = 'Nunca'
-            
-            self.stdout.write(
-                f'  - {aluno.email} (última atividade: {ultima_atividade}, {dias_inativo} dias)'
-            )
-            
-            if not dry_run:
-                NotaSaude.objects.create(
-                    aluno=aluno,
-                    nota=nota,
-                    automatica=True,
-                    observacao=f'Inatividade detectada ({dias_inativo} dias sem submissões)'
+
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f'  - {aluno["email"]} (última atividade: {ultima_atividade}, {dias_inativo} dias)'
                 )
-        
+            notas.append(NotaSaude(
+                aluno_id=aluno['id'],
+                nota=nota,
+                automatica=True,
+                observacao=f'Inatividade detectada ({dias_inativo} dias sem submissões)'
+            ))
+
+        inicio_gravacao = time.monotonic()
+        if not dry_run:
+            for posicao in range(0, len(notas), batch_size):
+                lote = notas[posicao:posicao + batch_size]
+                aluno_ids = [nota_saude.aluno_id for nota_saude in lote]
+                with transaction.atomic():
+                    NotaSaude.objects.bulk_create(lote)
+                    # bulk_create não dispara signals: a nota é o único campo do snapshot que muda
+                    AlunoSnapshot.objects.filter(aluno_id__in=aluno_ids).update(nota_atual=nota)
+                    invalidar_alunos(aluno_ids)
+        duracao_gravacao = time.monotonic() - inicio_gravacao
+
         if dry_run:
             self.stdout.write(
-                self.style.WARNING(f'[DRY-RUN] {len(alunos_para_atualizar)} alunos seriam atualizados')
+                self.style.WARNING(f'[DRY-RUN] {len(alunos)} alunos seriam atualizados')
             )
         else:
             self.stdout.write(
-                self.style.SUCCESS(f'Atualizados {len(alunos_para_atualizar)} alunos com nota {nota}')
+                self.style.SUCCESS(f'Atualizados {len(alunos)} alunos com nota {nota}')
             )
+
+        duracao = time.monotonic() - inicio
+        self.stdout.write(
+            f'Tempo: consulta {duracao_consulta:.2f}s, gravação {duracao_gravacao:.2f}s, '
+            f'total {duracao:.2f}s ({len(alunos) / duracao if duracao else 0:.0f} alunos/s)'
+        )
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trilha', '0003_step_pos_x_step_pos_y'),
+        ('usuarios', '0003_usuario_pode_aprovar_financeiro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlunoSnapshot',
+            fields=[
+                ('aluno', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='usuarios.usuario')),
+                ('nota_atual', models.IntegerField(default=3)),
+                ('ultima_submissao', models.DateTimeField(blank=True, null=True)),
+                ('submissoes_pendentes', models.IntegerField(default=0)),
+                ('steps_concluidos', models.IntegerField(default=0)),
+                ('pontos', models.IntegerField(default=0)),
+                ('mundo_total_steps', models.IntegerField(default=0, help_text='Total de steps do mundo atual')),
+                ('mundo_steps_concluidos', models.IntegerField(default=0, help_text='Steps concluídos no mundo atual')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('mundo_atual', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trilha.mundo')),
+                ('step_atual', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trilha.step')),
+            ],
+            options={
+                'verbose_name': 'Snapshot do Aluno',
+                'verbose_name_plural': 'Snapshots dos Alunos',
+            },
+        ),
+    ]
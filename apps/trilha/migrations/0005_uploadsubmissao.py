@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:15
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trilha', '0004_alunosnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSubmissao',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_arquivo', models.CharField(max_length=255)),
+                ('tamanho_total', models.BigIntegerField(help_text='Tamanho declarado do arquivo (bytes)')),
+                ('recebido', models.BigIntegerField(default=0, help_text='Bytes já gravados')),
+                ('partes', models.JSONField(default=list, help_text='Nomes das partes no storage, em ordem')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('progresso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='trilha.progressoaluno')),
+                ('submissao', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='trilha.submissao')),
+            ],
+            options={
+                'verbose_name': 'Upload de Submissão',
+                'verbose_name_plural': 'Uploads de Submissões',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trilha', '0005_uploadsubmissao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissao',
+            name='arquivo_variantes',
+            field=models.JSONField(blank=True, default=dict, help_text='Variantes WebP geradas do arquivo: {original, thumb, medio}'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trilha', '0006_submissao_arquivo_variantes'),
+        ('usuarios', '0005_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notasaude',
+            index=models.Index(fields=['aluno', '-data'], name='notasaude_aluno_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressoaluno',
+            index=models.Index(fields=['aluno', 'status'], name='progresso_aluno_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissao',
+            index=models.Index(fields=['aprovado', 'data_envio', 'id'], name='submissao_aprovado_envio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissao',
+            index=models.Index(fields=['progresso', '-data_envio'], name='submissao_progresso_envio_idx'),
+        ),
+        migrations.AlterField(
+            model_name='notasaude',
+            name='aluno',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notas_saude', to='usuarios.usuario'),
+        ),
+        migrations.AlterField(
+            model_name='progressoaluno',
+            name='aluno',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='progressos', to='usuarios.usuario'),
+        ),
+        migrations.AlterField(
+            model_name='submissao',
+            name='progresso',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='submissoes', to='trilha.progressoaluno'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trilha', '0007_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoEscopo',
+            fields=[
+                ('escopo', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('versao', models.PositiveBigIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Versão de escopo',
+                'verbose_name_plural': 'Versões de escopo',
+            },
+        ),
+    ]
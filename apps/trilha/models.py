@@ -1,9 +1,13 @@
 """
 Models do app Trilha - Sistema de Trilha Gamificada Mindhub OS.
 """
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.utils import timezone
 
+from apps.core.imagens import url_variante
+
 
 class TipoValidacao(models.TextChoices):
     """Tipos de validação para Steps."""
@@ -107,7 +111,8 @@ class ProgressoAluno(models.Model):
     aluno = models.ForeignKey(
         'usuarios.Usuario', 
         on_delete=models.CASCADE,
-        related_name='progressos'
+        related_name='progressos',
+        db_index=False,  # coberto por unique_together e progresso_aluno_status_idx
     )
     step = models.ForeignKey(
         Step, 
@@ -124,6 +129,9 @@ class ProgressoAluno(models.Model):
     
     class Meta:
         unique_together = ['aluno', 'step']
+        indexes = [
+            models.Index(fields=['aluno', 'status'], name='progresso_aluno_status_idx'),
+        ]
         verbose_name = 'Progresso do Aluno'
         verbose_name_plural = 'Progressos dos Alunos'
     
@@ -155,7 +163,8 @@ class Submissao(models.Model):
     progresso = models.ForeignKey(
         ProgressoAluno, 
         on_delete=models.CASCADE, 
-        related_name='submissoes'
+        related_name='submissoes',
+        db_index=False,  # coberto por submissao_progresso_envio_idx
     )
     arquivo = models.FileField(
         upload_to='submissoes/%Y/%m/', 
@@ -163,6 +172,11 @@ class Submissao(models.Model):
         blank=True,
         help_text="Arquivo enviado (foto ou documento)"
     )
+    arquivo_variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Variantes WebP geradas do arquivo: {original, thumb, medio}"
+    )
     resposta_texto = models.TextField(blank=True, help_text="Resposta em texto")
     resposta_formulario = models.JSONField(
         null=True, 
@@ -187,11 +201,26 @@ class Submissao(models.Model):
         ordering = ['-data_envio']
         verbose_name = 'Submissão'
         verbose_name_plural = 'Submissões'
+        indexes = [
+            # Fila de validação: aprovado IS NULL na ordem do cursor (data_envio, id)
+            models.Index(fields=['aprovado', 'data_envio', 'id'], name='submissao_aprovado_envio_idx'),
+            # Submissões de um progresso, a mais recente primeiro
+            models.Index(fields=['progresso', '-data_envio'], name='submissao_progresso_envio_idx'),
+        ]
     
     def __str__(self):
         status = "Pendente" if self.aprovado is None else ("Aprovado" if self.aprovado else "Reprovado")
         return f"Submissão {self.id} - {self.progresso.aluno.email} ({status})"
     
+    @property
+    def arquivo_thumb_url(self):
+        return url_variante(self.arquivo, self.arquivo_variantes, 'thumb')
+    
+    @property
+    def arquivo_medio_url(self):
+        return url_variante(self.arquivo, self.arquivo_variantes, 'medio')
+    
+    @transaction.atomic
     def aprovar(self, monitor, feedback=''):
         """Aprova a submissão e avança o aluno."""
         self.aprovado = True
@@ -201,6 +230,7 @@ class Submissao(models.Model):
         self.save()
         self.progresso.concluir()
     
+    @transaction.atomic
     def reprovar(self, monitor, feedback):
         """Reprova a submissão com feedback."""
         self.aprovado = False
@@ -221,7 +251,8 @@ class NotaSaude(models.Model):
     aluno = models.ForeignKey(
         'usuarios.Usuario', 
         on_delete=models.CASCADE, 
-        related_name='notas_saude'
+        related_name='notas_saude',
+        db_index=False,  # coberto por notasaude_aluno_data_idx
     )
     nota = models.IntegerField(
         help_text="Nota de 1 (vermelho) a 5 (verde)"
@@ -237,6 +268,10 @@ class NotaSaude(models.Model):
         ordering = ['-data']
         verbose_name = 'Nota de Saúde'
         verbose_name_plural = 'Notas de Saúde'
+        indexes = [
+            # Nota atual e histórico do aluno
+            models.Index(fields=['aluno', '-data'], name='notasaude_aluno_data_idx'),
+        ]
     
     def __str__(self):
         tipo = "Auto" if self.automatica else "Manual"
@@ -259,3 +294,101 @@ class NotaSaude(models.Model):
             1: '#dc3545',  # Vermelho
         }
         return cores.get(nota, '#6c757d')  # Cinza como fallback
+
+
+class AlunoSnapshot(models.Model):
+    """
+    Fotografia desnormalizada do estado do aluno na trilha (uma linha por aluno).
+    Mantida pelos signals de progresso, submissões e notas; reconstruída com
+    `python manage.py rebuild_snapshots`.
+    """
+    aluno = models.OneToOneField(
+        'usuarios.Usuario',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot'
+    )
+    nota_atual = models.IntegerField(default=3)
+    mundo_atual = models.ForeignKey(
+        Mundo,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    step_atual = models.ForeignKey(
+        Step,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    ultima_submissao = models.DateTimeField(null=True, blank=True)
+    submissoes_pendentes = models.IntegerField(default=0)
+    steps_concluidos = models.IntegerField(default=0)
+    pontos = models.IntegerField(default=0)
+    mundo_total_steps = models.IntegerField(default=0, help_text="Total de steps do mundo atual")
+    mundo_steps_concluidos = models.IntegerField(default=0, help_text="Steps concluídos no mundo atual")
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Snapshot do Aluno'
+        verbose_name_plural = 'Snapshots dos Alunos'
+    
+    def __str__(self):
+        return f"Snapshot {self.aluno_id} (nota {self.nota_atual})"
+
+
+class VersaoEscopo(models.Model):
+    """
+    Versão de um escopo do cache e dos ETags das APIs ('global', 'monitor:<id>',
+    'aluno:<id>'; ver trilha.cache). Fica no banco para valer em todas as
+    instâncias e nunca ser descartada: um escopo sem linha está na versão 1.
+    """
+    escopo = models.CharField(max_length=40, primary_key=True)
+    versao = models.PositiveBigIntegerField(default=1)
+    
+    class Meta:
+        verbose_name = 'Versão de escopo'
+        verbose_name_plural = 'Versões de escopo'
+    
+    def __str__(self):
+        return f"{self.escopo}={self.versao}"
+
+
+class UploadSubmissao(models.Model):
+    """
+    Upload em partes (resumível) da foto de uma submissão.
+    Cada parte é gravada no storage como um objeto separado; ao finalizar as
+    partes são concatenadas no arquivo da Submissao e removidas.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    progresso = models.ForeignKey(
+        ProgressoAluno,
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    nome_arquivo = models.CharField(max_length=255)
+    tamanho_total = models.BigIntegerField(help_text="Tamanho declarado do arquivo (bytes)")
+    recebido = models.BigIntegerField(default=0, help_text="Bytes já gravados")
+    partes = models.JSONField(default=list, help_text="Nomes das partes no storage, em ordem")
+    submissao = models.OneToOneField(
+        Submissao,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload'
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Upload de Submissão'
+        verbose_name_plural = 'Uploads de Submissões'
+    
+    def __str__(self):
+        return f"Upload {self.id} ({self.recebido}/{self.tamanho_total} bytes)"
+    
+    @property
+    def concluido(self):
+        return self.submissao_id is not None
@@ -3,7 +3,7 @@ from django.shortcuts import redirect, render
 
 from apps.comercial.forms import ParecerPropostaFinanceiraForm
 from apps.comercial.services import notificacoes_internas, propostas_pendentes_para_usuario, submissoes_pendentes_para_usuario
-from apps.usuarios.models import Usuario
+from apps.core.orcamento import orcamento_queries
 from apps.usuarios.utils import get_usuario_logado
 
 
@@ -16,20 +16,16 @@ def verificar_acesso_monitor(request):
 
 def bloquear_comercial(view_func):
     def wrapper(request, *args, **kwargs):
-        email = request.session.get("usuario")
-        if email:
-            try:
-                usuario = Usuario.objects.get(email=email)
-                if usuario.is_comercial:
-                    messages.error(request, "Acesso restrito.")
-                    return redirect("usuarios:gerenciar_acessos")
-            except Usuario.DoesNotExist:
-                pass
+        usuario = get_usuario_logado(request)
+        if usuario and usuario.is_comercial:
+            messages.error(request, "Acesso restrito.")
+            return redirect("usuarios:gerenciar_acessos")
         return view_func(request, *args, **kwargs)
 
     return wrapper
 
 
+@orcamento_queries(6)
 @bloquear_comercial
 def monitor_notificacoes(request):
     usuario = verificar_acesso_monitor(request)
@@ -0,0 +1,757 @@
+"""
+Serviços de consulta do app Trilha - Mindhub OS.
+Concentra as consultas em conjunto (set-based) usadas pelas telas do Monitor
+e as operações em massa sobre trilhas (clonagem da Trilha Base).
+"""
+import base64
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField, Case, Count, Exists, IntegerField, Max, Min, OuterRef, Prefetch, Q, Subquery, Sum, TextField,
+    Value, When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.comercial.contadores import variar_submissoes_pendentes
+from apps.usuarios.models import Usuario, RoleChoices
+from .cache import invalidar_alunos
+from .models import AlunoSnapshot, Mundo, NotaSaude, ProgressoAluno, Step, Submissao, StatusProgresso
+
+
+NOTA_PADRAO = 3
+STATUS_EM_CURSO = [StatusProgresso.EM_ANDAMENTO, StatusProgresso.PENDENTE_VALIDACAO]
+CAMPOS_SNAPSHOT = [
+    'nota_atual', 'mundo_atual', 'step_atual', 'ultima_submissao', 'submissoes_pendentes',
+    'steps_concluidos', 'pontos', 'mundo_total_steps', 'mundo_steps_concluidos', 'atualizado_em',
+]
+
+
+def _primeiro(queryset, campo):
+    """Subquery que devolve o campo do primeiro registro do queryset."""
+    return Subquery(queryset.values(campo)[:1])
+
+
+def _agregado(queryset, expressao):
+    """Subquery escalar com um agregado (COUNT/SUM) do queryset correlacionado."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(agrupador=Value(1)).annotate(valor=expressao).values('valor'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def _agregado_ou_nulo(queryset, expressao):
+    """Como _agregado, mas devolve NULL quando não há linhas (MIN/MAX)."""
+    return Subquery(
+        queryset.order_by().values(agrupador=Value(1)).annotate(valor=expressao).values('valor'),
+        output_field=IntegerField()
+    )
+
+
+def anotar_resumo_alunos(alunos):
+    """
+    Anota em um queryset de Usuario os dados do Graph View em uma única query:
+    nota atual, mundo atual, step atual, última atividade e submissões pendentes.
+
+    Replica as regras de NotaSaude.get_nota_atual, Usuario.get_mundo_atual e
+    Usuario.get_step_atual usando subqueries correlacionadas.
+    """
+    progressos = ProgressoAluno.objects.filter(aluno=OuterRef('pk'))
+
+    # Mundo atual: step mais avançado em curso, senão o último concluído
+    em_curso_desc = progressos.filter(status__in=STATUS_EM_CURSO)\
+        .order_by('-step__mundo__numero', '-step__ordem')
+    concluido_desc = progressos.filter(status=StatusProgresso.CONCLUIDO)\
+        .order_by('-step__mundo__numero', '-step__ordem')
+
+    # Step atual: primeiro step em curso, senão o próximo não concluído da trilha
+    em_curso_asc = progressos.filter(status__in=STATUS_EM_CURSO)\
+        .order_by('step__mundo__numero', 'step__ordem')
+    concluidos_ids = ProgressoAluno.objects.filter(
+        aluno=OuterRef(OuterRef('pk')),
+        status=StatusProgresso.CONCLUIDO
+    ).values('step_id')
+    proximos = Step.objects.filter(mundo__aluno=OuterRef('pk'), ativo=True)\
+        .exclude(id__in=concluidos_ids)\
+        .order_by('mundo__numero', 'ordem')
+
+    submissoes = Submissao.objects.filter(progresso__aluno=OuterRef('pk'))
+
+    return alunos.annotate(
+        nota_atual=Coalesce(
+            _primeiro(NotaSaude.objects.filter(aluno=OuterRef('pk')), 'nota'),
+            Value(NOTA_PADRAO)
+        ),
+        mundo_atual_id=Coalesce(
+            _primeiro(em_curso_desc, 'step__mundo_id'),
+            _primeiro(concluido_desc, 'step__mundo_id'),
+            output_field=BigIntegerField()
+        ),
+        mundo_atual_numero=Coalesce(
+            _primeiro(em_curso_desc, 'step__mundo__numero'),
+            _primeiro(concluido_desc, 'step__mundo__numero')
+        ),
+        mundo_atual_nome=Coalesce(
+            _primeiro(em_curso_desc, 'step__mundo__nome'),
+            _primeiro(concluido_desc, 'step__mundo__nome')
+        ),
+        step_atual_id=Coalesce(
+            _primeiro(em_curso_asc, 'step_id'),
+            _primeiro(proximos, 'id'),
+            output_field=BigIntegerField()
+        ),
+        step_atual_titulo=Coalesce(
+            _primeiro(em_curso_asc, 'step__titulo'),
+            _primeiro(proximos, 'titulo')
+        ),
+        ultima_atividade=_primeiro(submissoes.order_by('-data_envio'), 'data_envio'),
+        submissoes_pendentes=_agregado(submissoes.filter(aprovado__isnull=True), Count('pk')),
+    )
+
+
+def resumo_estatisticas_alunos(alunos, desde):
+    """
+    Agrupa os alunos por (nota atual, mês corrente, ativo desde `desde`) numa única query.
+
+    O mês corrente segue a regra do dashboard: menor número de mundo do aluno com
+    progresso não concluído; se não houver, o maior número entre os mundos do aluno.
+    Retorna dicts com nota_atual, mundo_corrente, ativo_recente e total.
+    """
+    pendentes = ProgressoAluno.objects.filter(
+        aluno=OuterRef('pk'),
+        step__mundo__aluno=OuterRef('pk')
+    ).exclude(status=StatusProgresso.CONCLUIDO)
+
+    return alunos.order_by().annotate(
+        nota_atual=Coalesce(
+            _primeiro(NotaSaude.objects.filter(aluno=OuterRef('pk')), 'nota'),
+            Value(NOTA_PADRAO)
+        ),
+        mundo_corrente=Coalesce(
+            _agregado_ou_nulo(pendentes, Min('step__mundo__numero')),
+            _agregado_ou_nulo(Mundo.objects.filter(aluno=OuterRef('pk')), Max('numero'))
+        ),
+        ativo_recente=Exists(Submissao.objects.filter(progresso__aluno=OuterRef('pk'), data_envio__gte=desde)),
+    ).values('nota_atual', 'mundo_corrente', 'ativo_recente').annotate(total=Count('id'))
+
+
+def alunos_inativos(limite, nota_inatividade=None):
+    """
+    Alunos ativos sem submissões desde `limite`, numa única query, anotados com
+    `nota_atual` e `ultima_atividade` (None para quem nunca enviou nada).
+    Com `nota_inatividade`, deixa de fora quem já está com essa nota.
+    """
+    submissoes = Submissao.objects.filter(progresso__aluno=OuterRef('pk'))
+    alunos = Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True)\
+        .filter(~Exists(submissoes.filter(data_envio__gte=limite)))\
+        .annotate(
+            nota_atual=Coalesce(
+                _primeiro(NotaSaude.objects.filter(aluno=OuterRef('pk')), 'nota'),
+                Value(NOTA_PADRAO)
+            ),
+            ultima_atividade=_primeiro(submissoes.order_by('-data_envio'), 'data_envio'),
+        )
+    if nota_inatividade is not None:
+        alunos = alunos.exclude(nota_atual=nota_inatividade)
+    return alunos.order_by('id')
+
+
+def anotar_snapshot_alunos(alunos):
+    """
+    Estende anotar_resumo_alunos com os totais guardados no AlunoSnapshot:
+    steps concluídos, pontos e andamento dentro do mundo atual.
+    """
+    concluidos = ProgressoAluno.objects.filter(aluno=OuterRef('pk'), status=StatusProgresso.CONCLUIDO)
+    return anotar_resumo_alunos(alunos).annotate(
+        steps_concluidos=_agregado(concluidos, Count('pk')),
+        pontos=_agregado(concluidos, Sum('step__pontos')),
+        mundo_total_steps=_agregado(Step.objects.filter(mundo=OuterRef('mundo_atual_id')), Count('pk')),
+        mundo_steps_concluidos=_agregado(
+            concluidos.filter(step__mundo=OuterRef('mundo_atual_id')),
+            Count('pk')
+        ),
+    )
+
+
+def atualizar_snapshots(aluno_ids, batch_size=500):
+    """
+    Recalcula e grava (upsert) o AlunoSnapshot dos alunos informados.
+    Cada lote custa uma query de leitura e um INSERT ... ON CONFLICT.
+    """
+    aluno_ids = list(dict.fromkeys(aluno_id for aluno_id in aluno_ids if aluno_id))
+    atualizados = 0
+    
+    for inicio in range(0, len(aluno_ids), batch_size):
+        lote = aluno_ids[inicio:inicio + batch_size]
+        alunos = anotar_snapshot_alunos(
+            Usuario.objects.filter(id__in=lote, role=RoleChoices.ALUNO)
+        ).only('id')
+        
+        snapshots = [
+            AlunoSnapshot(
+                aluno_id=aluno.id,
+                nota_atual=aluno.nota_atual,
+                mundo_atual_id=aluno.mundo_atual_id,
+                step_atual_id=aluno.step_atual_id,
+                ultima_submissao=aluno.ultima_atividade,
+                submissoes_pendentes=aluno.submissoes_pendentes,
+                steps_concluidos=aluno.steps_concluidos,
+                pontos=aluno.pontos,
+                mundo_total_steps=aluno.mundo_total_steps,
+                mundo_steps_concluidos=aluno.mundo_steps_concluidos,
+            )
+            for aluno in alunos
+        ]
+        AlunoSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['aluno'],
+            update_fields=CAMPOS_SNAPSHOT,
+        )
+        atualizados += len(snapshots)
+    
+    return atualizados
+
+
+def atualizar_snapshot(aluno_id):
+    """Recalcula o snapshot de um único aluno."""
+    return atualizar_snapshots([aluno_id])
+
+
+def alunos_com_snapshot(alunos):
+    """
+    Retorna a lista de alunos com `snapshot` (mundo e step atuais) já carregados.
+    Alunos ainda sem snapshot são calculados na hora e a lista é relida.
+    """
+    alunos = alunos.select_related('snapshot__mundo_atual', 'snapshot__step_atual')
+    lista = list(alunos)
+    faltantes = [aluno.id for aluno in lista if not hasattr(aluno, 'snapshot')]
+    if faltantes:
+        atualizar_snapshots(faltantes)
+        lista = list(alunos.all())
+    return lista
+
+
+LIMITE_PADRAO_FILA = 50
+LIMITE_MAXIMO_FILA = 200
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação malformado."""
+
+
+def codificar_cursor(submissao):
+    """Cursor opaco com a chave (data_envio, id) da última submissão da página."""
+    bruto = json.dumps([submissao.data_envio.isoformat(), submissao.id])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data_envio, submissao_id = json.loads(bruto)
+        return datetime.fromisoformat(data_envio), int(submissao_id)
+    except (ValueError, TypeError):
+        raise CursorInvalido('Cursor inválido')
+
+
+@dataclass(frozen=True)
+class PaginaFila:
+    submissoes: list
+    total: int
+    proximo_cursor: str | None
+
+
+def paginar_fila_validacao(submissoes, cursor=None, limite=LIMITE_PADRAO_FILA):
+    """
+    Página da fila de validação com paginação por chave (keyset) em (data_envio, id).
+
+    O total da fila (sem o cursor) vem como subquery escalar na mesma query da
+    página; só quando a página volta vazia é preciso um COUNT à parte.
+    """
+    limite = max(1, min(limite, LIMITE_MAXIMO_FILA))
+    pagina = submissoes.annotate(total_fila=_agregado(submissoes, Count('id')))
+    if cursor:
+        data_envio, submissao_id = decodificar_cursor(cursor)
+        pagina = pagina.filter(
+            Q(data_envio__gt=data_envio) | Q(data_envio=data_envio, id__gt=submissao_id)
+        )
+
+    # Um item a mais só para saber se existe próxima página
+    itens = list(pagina.order_by('data_envio', 'id')[:limite + 1])
+    tem_mais = len(itens) > limite
+    itens = itens[:limite]
+
+    if itens:
+        total = itens[0].total_fila
+    else:
+        total = submissoes.count() if cursor else 0
+
+    return PaginaFila(
+        submissoes=itens,
+        total=total,
+        proximo_cursor=codificar_cursor(itens[-1]) if tem_mais else None,
+    )
+
+
+@dataclass(frozen=True)
+class TrilhaAluno:
+    """
+    Árvore da trilha de um aluno já carregada em memória.
+
+    `mundos` são os mundos ativos em ordem, cada um com `steps_ativos` (steps
+    ativos ordenados). `progressos` mapeia step_id → ProgressoAluno; quando
+    carregado com submissões, cada progresso traz `submissoes_ordenadas`.
+    """
+    aluno: Usuario
+    mundos: list
+    progressos: dict
+
+    def steps(self):
+        """Itera (mundo, step) na ordem da trilha."""
+        for mundo in self.mundos:
+            for step in mundo.steps_ativos:
+                yield mundo, step
+
+    def progresso(self, step):
+        return self.progressos.get(step.id)
+
+    def status(self, step):
+        progresso = self.progressos.get(step.id)
+        return progresso.status if progresso else StatusProgresso.BLOQUEADO
+
+    def ultima_submissao(self, step):
+        progresso = self.progressos.get(step.id)
+        if not progresso:
+            return None
+        submissoes = progresso.submissoes_ordenadas
+        return submissoes[0] if submissoes else None
+
+
+def carregar_trilha(aluno, mundo_id=None, com_progresso=True, com_submissoes=False):
+    """
+    Carrega mundos, steps ativos e progresso do aluno em no máximo quatro queries
+    (mundos, steps, progressos e, se pedido, submissões).
+
+    `mundo_id` restringe a árvore a um único mundo (mapa interno do mês).
+    """
+    mundos = Mundo.objects.filter(aluno=aluno, ativo=True).prefetch_related(
+        Prefetch('steps', queryset=Step.objects.filter(ativo=True).order_by('ordem'), to_attr='steps_ativos')
+    ).order_by('numero')
+    if mundo_id is not None:
+        mundos = mundos.filter(id=mundo_id)
+    mundos = list(mundos)
+    
+    progressos = {}
+    if com_progresso and mundos:
+        qs_progressos = ProgressoAluno.objects.filter(aluno=aluno)
+        if mundo_id is not None:
+            qs_progressos = qs_progressos.filter(step__mundo_id=mundo_id)
+        if com_submissoes:
+            qs_progressos = qs_progressos.prefetch_related(
+                Prefetch('submissoes', queryset=Submissao.objects.order_by('-data_envio'), to_attr='submissoes_ordenadas')
+            )
+        progressos = {progresso.step_id: progresso for progresso in qs_progressos}
+    
+    return TrilhaAluno(aluno=aluno, mundos=mundos, progressos=progressos)
+
+
+@dataclass(frozen=True)
+class ResultadoClonagem:
+    """Resumo de uma clonagem em massa da Trilha Base."""
+    alunos_clonados: list = field(default_factory=list)
+    alunos_ignorados: list = field(default_factory=list)
+    mundos_criados: int = 0
+    steps_criados: int = 0
+    progressos_criados: int = 0
+    duracao: float = 0.0
+
+    @property
+    def linhas_criadas(self):
+        return self.mundos_criados + self.steps_criados + self.progressos_criados
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas_criadas / self.duracao if self.duracao else 0.0
+
+
+def clonar_trilha_base(aluno_ids, batch_size=50):
+    """
+    Clona a Trilha Base (mundos com aluno=null) para vários alunos com bulk_create.
+
+    Cada lote de `batch_size` alunos roda numa transação: mundos, steps ativos e o
+    ProgressoAluno EM_ANDAMENTO do primeiro step. Alunos que já têm mundo com algum
+    dos números da base são ignorados (unique aluno+numero). Como bulk_create não
+    dispara signals, snapshots e caches dos alunos clonados são atualizados no fim.
+    """
+    inicio = time.monotonic()
+    mundos_base = list(
+        Mundo.objects.filter(aluno__isnull=True, ativo=True).prefetch_related(
+            Prefetch('steps', queryset=Step.objects.filter(ativo=True).order_by('ordem'), to_attr='steps_ativos')
+        ).order_by('numero')
+    )
+    numeros_base = [mundo.numero for mundo in mundos_base]
+    
+    candidatos = list(
+        Usuario.objects.filter(id__in=aluno_ids, role=RoleChoices.ALUNO)
+        .order_by('id').values_list('id', flat=True)
+    ) if mundos_base else []
+    com_conflito = set(
+        Mundo.objects.filter(aluno_id__in=candidatos, numero__in=numeros_base)
+        .values_list('aluno_id', flat=True)
+    )
+    clonados = [aluno_id for aluno_id in candidatos if aluno_id not in com_conflito]
+    ignorados = sorted(set(aluno_ids) - set(clonados))
+    
+    mundos_criados = steps_criados = progressos_criados = 0
+    # (numero do mundo, ordem) do primeiro step ativo da base
+    primeiro_step = next(((mundo.numero, step.ordem) for mundo in mundos_base for step in mundo.steps_ativos), None)
+    agora = timezone.now()
+    
+    for posicao in range(0, len(clonados), batch_size):
+        lote = clonados[posicao:posicao + batch_size]
+        with transaction.atomic():
+            novos_mundos = Mundo.objects.bulk_create([
+                Mundo(
+                    aluno_id=aluno_id,
+                    numero=mundo_base.numero,
+                    nome=mundo_base.nome,
+                    descricao=mundo_base.descricao,
+                    objetivo=mundo_base.objetivo,
+                    icone=mundo_base.icone,
+                    cor_primaria=mundo_base.cor_primaria
+                )
+                for aluno_id in lote
+                for mundo_base in mundos_base
+            ])
+            
+            novos_steps = []
+            for novo_mundo, mundo_base in zip(novos_mundos, mundos_base * len(lote)):
+                for step_base in mundo_base.steps_ativos:
+                    novos_steps.append(Step(
+                        mundo=novo_mundo,
+                        ordem=step_base.ordem,
+                        titulo=step_base.titulo,
+                        descricao=step_base.descricao,
+                        instrucoes=step_base.instrucoes,
+                        tipo_validacao=step_base.tipo_validacao,
+                        config_formulario=step_base.config_formulario,
+                        pontos=step_base.pontos
+                    ))
+            novos_steps = Step.objects.bulk_create(novos_steps, batch_size=1000)
+            
+            # O primeiro step clonado de cada aluno já começa em andamento
+            progressos = []
+            if primeiro_step:
+                progressos = ProgressoAluno.objects.bulk_create([
+                    ProgressoAluno(
+                        aluno_id=step.mundo.aluno_id,
+                        step=step,
+                        status=StatusProgresso.EM_ANDAMENTO,
+                        data_inicio=agora
+                    )
+                    for step in novos_steps
+                    if (step.mundo.numero, step.ordem) == primeiro_step
+                ])
+            
+            invalidar_alunos(lote)
+        
+        atualizar_snapshots(lote)
+        mundos_criados += len(novos_mundos)
+        steps_criados += len(novos_steps)
+        progressos_criados += len(progressos)
+    
+    return ResultadoClonagem(
+        alunos_clonados=clonados,
+        alunos_ignorados=ignorados,
+        mundos_criados=mundos_criados,
+        steps_criados=steps_criados,
+        progressos_criados=progressos_criados,
+        duracao=time.monotonic() - inicio,
+    )
+
+
+class ChangesetInvalido(Exception):
+    """Erro de validação de um changeset da trilha (status HTTP sugerido em `status`)."""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+CAMPOS_MUNDO_EDITAVEIS = ['nome', 'descricao', 'objetivo', 'numero']
+CAMPOS_STEP_EDITAVEIS = ['titulo', 'descricao', 'instrucoes', 'tipo_validacao', 'config_formulario', 'pontos']
+
+
+def _secao(changeset, nome):
+    secao = changeset.get(nome) or {}
+    if not isinstance(secao, dict):
+        raise ChangesetInvalido(f"'{nome}' deve ser um objeto")
+    for chave in ('criar', 'atualizar', 'deletar'):
+        if not isinstance(secao.get(chave, []), list):
+            raise ChangesetInvalido(f"'{nome}.{chave}' deve ser uma lista")
+    return secao.get('criar', []), secao.get('atualizar', []), secao.get('deletar', [])
+
+
+def aplicar_changeset_trilha(aluno, changeset):
+    """
+    Aplica de uma vez um conjunto de alterações na trilha do aluno (CMS).
+
+    Formato:
+        {
+          "mundos": {"criar": [{"ref": "m1", "nome": ...}], "atualizar": [{"id": 1, ...}], "deletar": [2]},
+          "steps": {"criar": [{"ref": "s1", "mundo_id": 1 | "mundo_ref": "m1", ...}],
+                    "atualizar": [{"id": 5, ...}], "deletar": [6]},
+          "ordem": [{"mundo_id": 1 | "mundo_ref": "m1", "step_ids": [5, "s1", 4]}]
+        }
+
+    Tudo roda numa transação, com um bulk_create/bulk_update por tipo de objeto.
+    Deleções são soft delete (ativo=False), como nos endpoints individuais.
+    Retorna os ids criados por `ref` e os totais; erros levantam ChangesetInvalido.
+    """
+    if not isinstance(changeset, dict):
+        raise ChangesetInvalido('Changeset deve ser um objeto JSON')
+    mundos_criar, mundos_atualizar, mundos_deletar = _secao(changeset, 'mundos')
+    steps_criar, steps_atualizar, steps_deletar = _secao(changeset, 'steps')
+    ordens = changeset.get('ordem') or []
+    if not isinstance(ordens, list):
+        raise ChangesetInvalido("'ordem' deve ser uma lista")
+    
+    with transaction.atomic():
+        # Trava os mundos do aluno: edições concorrentes da mesma trilha ficam em fila
+        mundos = {mundo.id: mundo for mundo in Mundo.objects.select_for_update().filter(aluno=aluno)}
+        steps = {step.id: step for step in Step.objects.filter(mundo__aluno=aluno)}
+        
+        def _buscar(objetos, objeto_id, nome):
+            try:
+                return objetos[int(objeto_id)]
+            except (KeyError, TypeError, ValueError):
+                raise ChangesetInvalido(f'{nome} {objeto_id} não encontrado', status=404)
+        
+        # Mundos
+        proximo_numero = max((mundo.numero for mundo in mundos.values()), default=0) + 1
+        novos_mundos, refs_mundos = [], {}
+        for dados in mundos_criar:
+            mundo = Mundo(
+                aluno=aluno,
+                numero=proximo_numero,
+                nome=dados.get('nome', f'Mundo {proximo_numero}'),
+                descricao=dados.get('descricao', ''),
+                objetivo=dados.get('objetivo', '')
+            )
+            proximo_numero += 1
+            novos_mundos.append(mundo)
+            if dados.get('ref'):
+                refs_mundos[str(dados['ref'])] = mundo
+        
+        mundos_alterados = {}
+        for dados in mundos_atualizar:
+            mundo = _buscar(mundos, dados.get('id'), 'Mundo')
+            for campo in CAMPOS_MUNDO_EDITAVEIS:
+                if campo in dados:
+                    setattr(mundo, campo, dados[campo])
+            mundos_alterados[mundo.id] = mundo
+        
+        ids_mundos_deletados = [_buscar(mundos, mundo_id, 'Mundo').id for mundo_id in mundos_deletar]
+        
+        Mundo.objects.bulk_create(novos_mundos)
+        if mundos_alterados:
+            Mundo.objects.bulk_update(mundos_alterados.values(), CAMPOS_MUNDO_EDITAVEIS)
+        
+        def _mundo(dados):
+            if dados.get('mundo_ref') is not None:
+                try:
+                    return refs_mundos[str(dados['mundo_ref'])]
+                except KeyError:
+                    raise ChangesetInvalido(f"Mundo '{dados['mundo_ref']}' não encontrado no changeset", status=404)
+            return _buscar(mundos, dados.get('mundo_id'), 'Mundo')
+        
+        # Steps
+        ultima_ordem = {}
+        for step in steps.values():
+            ultima_ordem[step.mundo_id] = max(ultima_ordem.get(step.mundo_id, 0), step.ordem)
+        
+        novos_steps, refs_steps = [], {}
+        for dados in steps_criar:
+            mundo = _mundo(dados)
+            ordem = ultima_ordem.get(mundo.id, 0) + 1
+            ultima_ordem[mundo.id] = ordem
+            step = Step(
+                mundo=mundo,
+                ordem=ordem,
+                titulo=dados.get('titulo', 'Novo Step'),
+                descricao=dados.get('descricao', ''),
+                instrucoes=dados.get('instrucoes', ''),
+                tipo_validacao=dados.get('tipo_validacao', 'FOTO'),
+                config_formulario=dados.get('config_formulario'),
+                pontos=dados.get('pontos', 10)
+            )
+            novos_steps.append(step)
+            if dados.get('ref'):
+                refs_steps[str(dados['ref'])] = step
+        
+        steps_alterados = {}
+        for dados in steps_atualizar:
+            step = _buscar(steps, dados.get('id'), 'Step')
+            for campo in CAMPOS_STEP_EDITAVEIS:
+                if campo in dados:
+                    setattr(step, campo, dados[campo])
+            steps_alterados[step.id] = step
+        
+        ids_steps_deletados = [_buscar(steps, step_id, 'Step').id for step_id in steps_deletar]
+        
+        # Reordenação: a posição na lista vira a nova ordem (ids existentes ou refs novas)
+        for item in ordens:
+            mundo = _mundo(item)
+            for ordem, step_id in enumerate(item.get('step_ids', []), start=1):
+                step = refs_steps.get(str(step_id)) or _buscar(steps, step_id, 'Step')
+                if step.mundo_id != mundo.id:
+                    raise ChangesetInvalido(f'Step {step_id} não pertence ao mundo informado')
+                step.ordem = ordem
+                if step.id:
+                    steps_alterados[step.id] = step
+        
+        Step.objects.bulk_create(novos_steps)
+        if steps_alterados:
+            Step.objects.bulk_update(steps_alterados.values(), CAMPOS_STEP_EDITAVEIS + ['ordem'])
+        
+        if ids_mundos_deletados:
+            Mundo.objects.filter(id__in=ids_mundos_deletados).update(ativo=False)
+            Step.objects.filter(mundo_id__in=ids_mundos_deletados).update(ativo=False)
+        if ids_steps_deletados:
+            Step.objects.filter(id__in=ids_steps_deletados).update(ativo=False)
+        
+        invalidar_alunos([aluno.id])
+    
+    # bulk_* não dispara signals
+    atualizar_snapshot(aluno.id)
+    
+    return {
+        'mundos_criados': {ref: mundo.id for ref, mundo in refs_mundos.items()},
+        'steps_criados': {ref: step.id for ref, step in refs_steps.items()},
+        'totais': {
+            'mundos_criados': len(novos_mundos),
+            'mundos_atualizados': len(mundos_alterados),
+            'mundos_deletados': len(ids_mundos_deletados),
+            'steps_criados': len(novos_steps),
+            'steps_atualizados': len(steps_alterados),
+            'steps_deletados': len(ids_steps_deletados),
+        }
+    }
+
+
+LIMITE_LOTE_VALIDACAO = 500
+
+
+class LoteInvalido(Exception):
+    """Erro no corpo de uma validação em lote (status HTTP sugerido em `status`)."""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def validar_submissoes_em_lote(monitor, itens):
+    """
+    Aprova/reprova várias submissões de uma vez: [{"id", "aprovado", "feedback"}, ...].
+
+    Uma query carrega (e trava) as submissões com o monitor responsável de cada
+    aluno; as transições são UPDATEs em conjunto (submissões aprovadas e reprovadas,
+    progressos concluídos e devolvidos) na mesma transação. Itens inválidos, sem
+    acesso ou já validados não impedem os demais e voltam com `error`.
+    Retorna os resultados na ordem recebida.
+    """
+    if not isinstance(itens, list) or not itens:
+        raise LoteInvalido('Informe uma lista de submissões')
+    if len(itens) > LIMITE_LOTE_VALIDACAO:
+        raise LoteInvalido(f'Máximo de {LIMITE_LOTE_VALIDACAO} submissões por lote', status=413)
+    
+    resultados = []
+    pedidos = {}
+    for item in itens:
+        submissao_id = item.get('id') if isinstance(item, dict) else None
+        resultado = {'id': submissao_id, 'success': False}
+        resultados.append(resultado)
+        if not isinstance(submissao_id, int) or isinstance(submissao_id, bool):
+            resultado['error'] = 'id inválido'
+        elif not isinstance(item.get('aprovado'), bool):
+            resultado['error'] = 'Campo aprovado é obrigatório'
+        elif not item['aprovado'] and not item.get('feedback'):
+            resultado['error'] = 'Feedback é obrigatório para reprovação'
+        elif submissao_id in pedidos:
+            resultado['error'] = 'Submissão repetida no lote'
+        else:
+            pedidos[submissao_id] = (item['aprovado'], str(item.get('feedback') or ''), resultado)
+    
+    aluno_ids = set()
+    with transaction.atomic():
+        submissoes = {
+            dados['id']: dados
+            for dados in Submissao.objects.select_for_update(of=('self',)).filter(id__in=pedidos).values(
+                'id', 'aprovado', 'progresso_id', 'progresso__aluno_id',
+                'progresso__aluno__monitor_responsavel_id'
+            )
+        }
+        
+        aprovadas, reprovadas = {}, {}
+        for submissao_id, (aprovado, feedback, resultado) in pedidos.items():
+            dados = submissoes.get(submissao_id)
+            if dados is None:
+                resultado['error'] = 'Submissão não encontrada'
+            elif dados['aprovado'] is not None:
+                resultado['error'] = 'Submissão já foi validada'
+            elif (monitor.role != RoleChoices.ADMIN
+                  and dados['progresso__aluno__monitor_responsavel_id'] != monitor.id):
+                resultado['error'] = 'Acesso negado a esta submissão'
+            else:
+                (aprovadas if aprovado else reprovadas)[submissao_id] = (dados, feedback)
+                aluno_ids.add(dados['progresso__aluno_id'])
+        
+        agora = timezone.now()
+        for validadas, aprovado, status_progresso in (
+            (aprovadas, True, StatusProgresso.CONCLUIDO),
+            (reprovadas, False, StatusProgresso.EM_ANDAMENTO),
+        ):
+            if not validadas:
+                continue
+            Submissao.objects.filter(id__in=validadas).update(
+                aprovado=aprovado,
+                validado_por=monitor,
+                data_validacao=agora,
+                feedback=Case(
+                    *[When(id=submissao_id, then=Value(feedback)) for submissao_id, (_, feedback) in validadas.items()],
+                    default=Value(''),
+                    output_field=TextField()
+                )
+            )
+            progressos = ProgressoAluno.objects.filter(id__in=[dados['progresso_id'] for dados, _ in validadas.values()])
+            if aprovado:
+                progressos.update(status=status_progresso, data_conclusao=agora)
+            else:
+                # Volta para em andamento para o aluno tentar novamente
+                progressos.update(status=status_progresso)
+            
+            for submissao_id in validadas:
+                resultado = pedidos[submissao_id][2]
+                resultado.update(success=True, aprovado=aprovado, step_status=status_progresso)
+                resultado['data_validacao'] = agora.isoformat()
+        
+        invalidar_alunos(aluno_ids)
+        
+        pendentes_por_monitor = {}
+        for dados, _ in [*aprovadas.values(), *reprovadas.values()]:
+            monitor_id = dados['progresso__aluno__monitor_responsavel_id']
+            pendentes_por_monitor[monitor_id] = pendentes_por_monitor.get(monitor_id, 0) - 1
+        variar_submissoes_pendentes(pendentes_por_monitor)
+    
+    # update() não dispara signals
+    atualizar_snapshots(aluno_ids)
+    
+    return resultados
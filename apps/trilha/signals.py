@@ -0,0 +1,125 @@
+"""
+Signals do app Trilha - mantêm o AlunoSnapshot sincronizado, invalidam
+o cache das APIs do dashboard do Monitor e geram as variantes das fotos enviadas.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.imagens import agendar_variantes
+from apps.usuarios.models import Usuario
+from apps.usuarios.signals import CAMPOS_ACESSO
+from .cache import ESCOPO_GLOBAL, escopo_aluno, escopo_monitor, incrementar_versoes, invalidar_alunos
+from .models import Mundo, NotaSaude, ProgressoAluno, Step, Submissao
+from .services import atualizar_snapshots
+
+
+def _pendentes(conexao):
+    """Alunos, progressos e mundos alterados e ainda não processados, por conexão (thread)."""
+    if getattr(conexao, 'snapshots_pendentes', None) is None:
+        conexao.snapshots_pendentes = {'aluno': set(), 'progresso': set(), 'mundo': set()}
+    return conexao.snapshots_pendentes
+
+
+def _atualizar_pendentes():
+    """
+    Recalcula de uma vez os snapshots anotados até o commit. O primeiro callback
+    da transação processa tudo; os demais encontram a fila vazia.
+    """
+    conexao = transaction.get_connection()
+    pendentes = _pendentes(conexao)
+    conexao.snapshots_pendentes = None
+    aluno_ids = set(pendentes['aluno'])
+    if pendentes['progresso']:
+        aluno_ids.update(
+            ProgressoAluno.objects.filter(id__in=pendentes['progresso']).values_list('aluno_id', flat=True)
+        )
+    if pendentes['mundo']:
+        aluno_ids.update(Mundo.objects.filter(id__in=pendentes['mundo']).values_list('aluno_id', flat=True))
+    aluno_ids.discard(None)
+    if aluno_ids:
+        atualizar_snapshots(sorted(aluno_ids))
+        invalidar_alunos(sorted(aluno_ids))
+
+
+def _alterado(aluno_id=None, progresso_id=None, mundo_id=None):
+    """
+    Anota a alteração e adia o recálculo para o commit: vários saves do mesmo
+    aluno na transação (submeter salva progresso e submissão) custam um recálculo só.
+    """
+    pendentes = _pendentes(transaction.get_connection())
+    for chave, valor in (('aluno', aluno_id), ('progresso', progresso_id), ('mundo', mundo_id)):
+        if valor:
+            pendentes[chave].add(valor)
+    transaction.on_commit(_atualizar_pendentes)
+
+
+def _cascata_de_usuario(kwargs):
+    """True quando o delete vem da exclusão do próprio usuário (o snapshot cai junto)."""
+    return isinstance(kwargs.get('origin'), Usuario)
+
+
+@receiver(post_save, sender=ProgressoAluno)
+@receiver(post_delete, sender=ProgressoAluno)
+def atualizar_snapshot_apos_progresso(sender, instance, **kwargs):
+    if _cascata_de_usuario(kwargs):
+        return
+    _alterado(aluno_id=instance.aluno_id)
+
+
+@receiver(post_save, sender=Submissao)
+def gerar_variantes_da_submissao(sender, instance, **kwargs):
+    agendar_variantes(instance, 'arquivo', 'arquivo_variantes', campo_aluno='progresso__aluno_id')
+
+
+@receiver(post_save, sender=Submissao)
+@receiver(post_delete, sender=Submissao)
+def atualizar_snapshot_apos_submissao(sender, instance, **kwargs):
+    if _cascata_de_usuario(kwargs):
+        return
+    _alterado(progresso_id=instance.progresso_id)
+
+
+@receiver(post_save, sender=NotaSaude)
+@receiver(post_delete, sender=NotaSaude)
+def atualizar_snapshot_apos_nota(sender, instance, **kwargs):
+    if _cascata_de_usuario(kwargs):
+        return
+    _alterado(aluno_id=instance.aluno_id)
+
+
+@receiver(post_save, sender=Step)
+def atualizar_snapshot_apos_step(sender, instance, **kwargs):
+    _alterado(mundo_id=instance.mundo_id)
+
+
+@receiver(post_save, sender=Mundo)
+def atualizar_snapshot_apos_mundo(sender, instance, **kwargs):
+    _alterado(aluno_id=instance.aluno_id)
+
+
+def _escopos_alterados(instance, anteriores):
+    """
+    Escopos que um save do Usuario invalida. Só login, role, ativo e monitor
+    mudam listas de outros escopos: aí entram o global e os monitores antigo e
+    novo; perfil, telefone e foto só mexem no escopo do próprio aluno.
+    """
+    escopos = {escopo_aluno(instance.pk)}
+    atuais = {campo: getattr(instance, campo) for campo in CAMPOS_ACESSO}
+    if anteriores == atuais:
+        return escopos
+    escopos |= {ESCOPO_GLOBAL, escopo_monitor(instance.pk)}
+    monitores = {atuais['monitor_responsavel_id'], (anteriores or {}).get('monitor_responsavel_id')}
+    return escopos | {escopo_monitor(monitor_id) for monitor_id in monitores if monitor_id}
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_cache_apos_usuario(sender, instance, **kwargs):
+    escopos = _escopos_alterados(instance, getattr(instance, 'valores_anteriores', None))
+    transaction.on_commit(lambda: incrementar_versoes(escopos))
+
+
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_apos_excluir_usuario(sender, instance, **kwargs):
+    escopos = _escopos_alterados(instance, None)
+    transaction.on_commit(lambda: incrementar_versoes(escopos))
@@ -0,0 +1,1381 @@
+import json
+import tempfile
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from apps.core.consultas import atualizar_estatisticas, planos_das_queries
+from apps.core.imagens import gerar_variantes
+from apps.usuarios.models import RoleChoices, Usuario
+
+from .models import (
+    AlunoSnapshot, Mundo, NotaSaude, ProgressoAluno, StatusProgresso, Step, Submissao, TipoValidacao, UploadSubmissao,
+    VersaoEscopo,
+)
+from .cache import versoes
+from .services import atualizar_snapshots, carregar_trilha, clonar_trilha_base
+from .uploads import UploadInvalido, anexar_parte
+
+
+def semear_alunos(monitor, quantidade, prefixo="aluno"):
+    """Cria `quantidade` alunos com trilha, progresso, submissões e notas via bulk_create."""
+    alunos = Usuario.objects.bulk_create(
+        [
+            Usuario(
+                email=f"{prefixo}{indice}@mindhub.com",
+                senha="123",
+                role=RoleChoices.ALUNO,
+                nome=f"Aluno {indice}",
+                monitor_responsavel=monitor,
+            )
+            for indice in range(quantidade)
+        ]
+    )
+    mundos = Mundo.objects.bulk_create(
+        [
+            Mundo(aluno=aluno, numero=numero, nome=f"Mês {numero}")
+            for aluno in alunos
+            for numero in (1, 2)
+        ]
+    )
+    steps = Step.objects.bulk_create(
+        [
+            Step(mundo=mundo, ordem=ordem, titulo=f"Step {ordem}", instrucoes="-", tipo_validacao=TipoValidacao.TEXTO)
+            for mundo in mundos
+            for ordem in (1, 2)
+        ]
+    )
+
+    steps_por_aluno = {}
+    for step in steps:
+        steps_por_aluno.setdefault(step.mundo.aluno_id, []).append(step)
+
+    progressos = []
+    for indice, aluno in enumerate(alunos):
+        steps_aluno = steps_por_aluno[aluno.id]
+        # Varia o ponto da trilha: nenhum, alguns concluídos, um em andamento ou tudo concluído
+        concluidos = indice % (len(steps_aluno) + 1)
+        for posicao, step in enumerate(steps_aluno[:concluidos]):
+            progressos.append(ProgressoAluno(aluno=aluno, step=step, status=StatusProgresso.CONCLUIDO))
+        if concluidos < len(steps_aluno) and indice % 3:
+            status = StatusProgresso.PENDENTE_VALIDACAO if indice % 2 else StatusProgresso.EM_ANDAMENTO
+            progressos.append(ProgressoAluno(aluno=aluno, step=steps_aluno[concluidos], status=status))
+    progressos = ProgressoAluno.objects.bulk_create(progressos)
+
+    Submissao.objects.bulk_create(
+        [
+            Submissao(
+                progresso=progresso,
+                resposta_texto="ok",
+                aprovado=None if progresso.status == StatusProgresso.PENDENTE_VALIDACAO else True,
+            )
+            for progresso in progressos
+            if progresso.status != StatusProgresso.EM_ANDAMENTO
+        ]
+    )
+    NotaSaude.objects.bulk_create(
+        [NotaSaude(aluno=aluno, nota=(indice % 5) + 1) for indice, aluno in enumerate(alunos) if indice % 4]
+    )
+    # bulk_create não dispara signals: recalcula os snapshots como faria o rebuild_snapshots
+    atualizar_snapshots([aluno.id for aluno in alunos])
+    return alunos
+
+
+def semear_alunos_sem_trilha(monitor, quantidade, prefixo="novo"):
+    """Cria `quantidade` alunos do monitor ainda sem nenhum mundo."""
+    return Usuario.objects.bulk_create(
+        [
+            Usuario(email=f"{prefixo}{indice}@mindhub.com", senha="123", role=RoleChoices.ALUNO, monitor_responsavel=monitor)
+            for indice in range(quantidade)
+        ]
+    )
+
+
+class MonitorAlunosApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(
+            email="monitor@mindhub.com",
+            senha="123",
+            role=RoleChoices.MONITOR,
+            nome="Monitor",
+        )
+        self.login_as(self.monitor)
+
+    def login_as(self, usuario: Usuario):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+
+    def contar_queries(self):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse("trilha:api_monitor_alunos"))
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries), response.json()
+
+    def test_payload_igual_aos_metodos_por_aluno(self):
+        alunos = semear_alunos(self.monitor, 12)
+        primeiro = alunos[1]
+        NotaSaude.objects.create(aluno=primeiro, nota=2)
+        progresso = ProgressoAluno.objects.filter(aluno=primeiro).first()
+        Submissao.objects.filter(progresso=progresso).update(data_envio=timezone.now() - timedelta(days=3))
+        atualizar_snapshots([primeiro.id])
+
+        _, payload = self.contar_queries()
+        por_id = {item["id"]: item for item in payload["alunos"]}
+
+        self.assertEqual(payload["total"], len(alunos))
+        for aluno in Usuario.objects.filter(id__in=[a.id for a in alunos]):
+            item = por_id[aluno.id]
+            mundo = aluno.get_mundo_atual()
+            step = aluno.get_step_atual()
+            ultima = Submissao.objects.filter(progresso__aluno=aluno).order_by("-data_envio").first()
+
+            self.assertEqual(item["nota"], NotaSaude.get_nota_atual(aluno))
+            self.assertEqual(item["cor"], NotaSaude.get_cor_nota(item["nota"]))
+            self.assertEqual(item["mundo"], {"numero": mundo.numero, "nome": mundo.nome} if mundo else None)
+            self.assertEqual(item["step"], {"id": step.id, "titulo": step.titulo} if step else None)
+            self.assertEqual(item["ultima_atividade"], ultima.data_envio.isoformat() if ultima else None)
+            self.assertEqual(
+                item["submissoes_pendentes"],
+                Submissao.objects.filter(progresso__aluno=aluno, aprovado__isnull=True).count(),
+            )
+
+    def test_numero_de_queries_constante(self):
+        contagens = {}
+        total = 0
+        for quantidade in (10, 100, 1000):
+            semear_alunos(self.monitor, quantidade - total, prefixo=f"lote{quantidade}_")
+            total = quantidade
+            cache.clear()
+            contagens[quantidade], payload = self.contar_queries()
+            self.assertEqual(payload["total"], quantidade)
+
+        self.assertEqual(contagens[10], contagens[100])
+        self.assertEqual(contagens[100], contagens[1000])
+        self.assertLessEqual(contagens[1000], 5)
+
+
+class AlunoSnapshotTests(TestCase):
+    def setUp(self):
+        self.monitor = Usuario.objects.create(
+            email="monitor@mindhub.com",
+            senha="123",
+            role=RoleChoices.MONITOR,
+        )
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com",
+            senha="123",
+            role=RoleChoices.ALUNO,
+            monitor_responsavel=self.monitor,
+        )
+        self.mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mês 1")
+        self.step_1 = Step.objects.create(mundo=self.mundo, ordem=1, titulo="Primeiro", instrucoes="-", pontos=10)
+        self.step_2 = Step.objects.create(mundo=self.mundo, ordem=2, titulo="Segundo", instrucoes="-", pontos=20)
+
+    def snapshot(self):
+        return AlunoSnapshot.objects.get(aluno=self.aluno)
+
+    def test_snapshot_acompanha_fluxo_de_submissao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            progresso = ProgressoAluno.objects.create(aluno=self.aluno, step=self.step_1)
+            progresso.iniciar()
+        self.assertEqual(self.snapshot().step_atual, self.step_1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submissao = Submissao.objects.create(progresso=progresso, resposta_texto="feito")
+            progresso.enviar_para_validacao()
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.submissoes_pendentes, 1)
+        self.assertEqual(snapshot.ultima_submissao, submissao.data_envio)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submissao.aprovar(self.monitor)
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.submissoes_pendentes, 0)
+        self.assertEqual(snapshot.steps_concluidos, 1)
+        self.assertEqual(snapshot.pontos, 10)
+        self.assertEqual(snapshot.mundo_atual, self.mundo)
+        self.assertEqual(snapshot.step_atual, self.step_2)
+        self.assertEqual((snapshot.mundo_steps_concluidos, snapshot.mundo_total_steps), (1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotaSaude.objects.create(aluno=self.aluno, nota=5)
+        self.assertEqual(self.snapshot().nota_atual, 5)
+
+    def test_snapshot_recalculado_uma_vez_no_commit(self):
+        with mock.patch("apps.trilha.signals.atualizar_snapshots", wraps=atualizar_snapshots) as recalculo:
+            with self.captureOnCommitCallbacks(execute=True):
+                progresso = ProgressoAluno.objects.create(aluno=self.aluno, step=self.step_1)
+                progresso.iniciar()
+                Submissao.objects.create(progresso=progresso, resposta_texto="feito")
+                progresso.enviar_para_validacao()
+                recalculo.assert_not_called()
+        recalculo.assert_called_once_with([self.aluno.id])
+        self.assertEqual(self.snapshot().submissoes_pendentes, 1)
+
+    def test_rebuild_snapshots_recalcula_cargas_sem_signals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            progresso = ProgressoAluno.objects.create(
+                aluno=self.aluno, step=self.step_1, status=StatusProgresso.CONCLUIDO
+            )
+        ProgressoAluno.objects.filter(id=progresso.id).update(status=StatusProgresso.EM_ANDAMENTO)
+        NotaSaude.objects.bulk_create([NotaSaude(aluno=self.aluno, nota=2)])
+        self.assertEqual(self.snapshot().steps_concluidos, 1)
+
+        call_command("rebuild_snapshots", stdout=StringIO())
+
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.steps_concluidos, 0)
+        self.assertEqual(snapshot.nota_atual, 2)
+        self.assertEqual(snapshot.step_atual, self.step_1)
+
+
+class MonitorEstatisticasApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(
+            email="monitor@mindhub.com",
+            senha="123",
+            role=RoleChoices.MONITOR,
+        )
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+
+    def estatisticas(self):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse("trilha:api_monitor_estatisticas"))
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries), response.json()
+
+    def esperado_por_aluno(self, alunos):
+        """Regras originais do endpoint, calculadas aluno a aluno."""
+        limite = timezone.now() - timedelta(days=7)
+        notas = {str(nota): 0 for nota in range(1, 6)}
+        meses = {numero: 0 for numero in range(1, 7)}
+        inativos = 0
+        for aluno in alunos:
+            nota = NotaSaude.get_nota_atual(aluno)
+            if str(nota) in notas:
+                notas[str(nota)] += 1
+            if not Submissao.objects.filter(progresso__aluno=aluno, data_envio__gte=limite).exists():
+                inativos += 1
+            mundos = Mundo.objects.filter(aluno=aluno).order_by("numero")
+            atual = next(
+                (
+                    mundo for mundo in mundos
+                    if ProgressoAluno.objects.filter(aluno=aluno, step__mundo=mundo)
+                    .exclude(status=StatusProgresso.CONCLUIDO).exists()
+                ),
+                mundos.last(),
+            )
+            if atual and atual.numero in meses:
+                meses[atual.numero] += 1
+        return notas, meses, inativos
+
+    def test_payload_igual_ao_calculo_por_aluno(self):
+        alunos = semear_alunos(self.monitor, 15)
+        Submissao.objects.filter(progresso__aluno__in=alunos[:4]).update(
+            data_envio=timezone.now() - timedelta(days=10)
+        )
+        Mundo.objects.create(aluno=alunos[0], numero=7, nome="Mês 7")
+        semear_alunos(Usuario.objects.create(email="outro@mindhub.com", senha="1", role=RoleChoices.MONITOR), 3, "outro")
+
+        _, payload = self.estatisticas()
+        notas, meses, inativos = self.esperado_por_aluno(alunos)
+
+        self.assertEqual(payload["total_alunos"], len(alunos))
+        self.assertEqual(payload["distribuicao_notas"], notas)
+        self.assertEqual(payload["alunos_inativos"], inativos)
+        self.assertEqual({item["numero"]: item["alunos_ativos"] for item in payload["progresso_mundos"]}, meses)
+        self.assertEqual(
+            payload["submissoes_pendentes"],
+            Submissao.objects.filter(progresso__aluno__in=alunos, aprovado__isnull=True).count(),
+        )
+
+    def test_numero_de_queries_constante(self):
+        contagens = {}
+        total = 0
+        for quantidade in (10, 100, 500):
+            semear_alunos(self.monitor, quantidade - total, prefixo=f"lote{quantidade}_")
+            total = quantidade
+            cache.clear()
+            contagens[quantidade], payload = self.estatisticas()
+            self.assertEqual(payload["total_alunos"], quantidade)
+
+        self.assertEqual(contagens[10], contagens[100])
+        self.assertEqual(contagens[100], contagens[500])
+        self.assertLessEqual(contagens[500], 5)
+
+
+class MonitorDashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.admin = Usuario.objects.create(email="admin@mindhub.com", senha="123", role=RoleChoices.ADMIN)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com",
+            senha="123",
+            role=RoleChoices.ALUNO,
+            monitor_responsavel=self.monitor,
+        )
+        self.recalculos = []
+        patcher = mock.patch("apps.trilha.cache._executar_em_segundo_plano", self.recalculos.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, usuario, rota="trilha:api_monitor_alunos"):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+        return self.client.get(reverse(rota)).json()
+
+    def nota_do_aluno(self, payload):
+        return payload["alunos"][0]["nota"]
+
+    def test_serve_payload_antigo_e_recalcula_em_segundo_plano(self):
+        self.assertEqual(self.nota_do_aluno(self.get(self.monitor)), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotaSaude.objects.create(aluno=self.aluno, nota=1)
+
+        # Versão mudou: resposta antiga imediata e um único recálculo agendado
+        self.assertEqual(self.nota_do_aluno(self.get(self.monitor)), 3)
+        self.assertEqual(self.nota_do_aluno(self.get(self.monitor)), 3)
+        self.assertEqual(len(self.recalculos), 1)
+
+        self.recalculos.pop()()
+        self.assertEqual(self.nota_do_aluno(self.get(self.monitor)), 1)
+        self.assertEqual(self.recalculos, [])
+
+    def test_escopos_de_monitor_e_admin_sao_invalidados(self):
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.get(self.monitor, "trilha:api_monitor_estatisticas")
+        self.get(self.admin, "trilha:api_monitor_estatisticas")
+        self.get(outro, "trilha:api_monitor_estatisticas")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotaSaude.objects.create(aluno=self.aluno, nota=5)
+
+        self.get(self.monitor, "trilha:api_monitor_estatisticas")
+        self.get(self.admin, "trilha:api_monitor_estatisticas")
+        self.get(outro, "trilha:api_monitor_estatisticas")
+        self.assertEqual(len(self.recalculos), 2)
+
+        for recalcular in self.recalculos:
+            recalcular()
+        payload = self.get(self.admin, "trilha:api_monitor_estatisticas")
+        self.assertEqual(payload["distribuicao_notas"]["5"], 1)
+
+    def test_salvar_usuario_so_invalida_os_escopos_afetados(self):
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        terceiro = Usuario.objects.create(email="terceiro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        escopos = [
+            "global", f"aluno:{self.aluno.id}", f"monitor:{self.monitor.id}", f"monitor:{outro.id}", f"monitor:{terceiro.id}"
+        ]
+        antes = versoes(escopos)
+
+        # Perfil e telefone não mudam a lista de ninguém
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aluno.telefone = "(11) 97777-0000"
+            self.aluno.save()
+        self.assertEqual(versoes(escopos), antes | {f"aluno:{self.aluno.id}": 2})
+
+        # Troca de monitor: global e os monitores antigo e novo, nenhum outro
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aluno.monitor_responsavel = outro
+            self.aluno.save()
+        depois = versoes(escopos)
+        self.assertEqual(
+            {escopo for escopo in escopos if depois[escopo] != antes[escopo]},
+            {"global", f"aluno:{self.aluno.id}", f"monitor:{self.monitor.id}", f"monitor:{outro.id}"},
+        )
+
+
+class CarregarTrilhaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com",
+            senha="123",
+            role=RoleChoices.ALUNO,
+            monitor_responsavel=self.monitor,
+        )
+
+    def login_as(self, usuario):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+
+    def montar_trilha(self, steps_por_mundo):
+        """Dois mundos ativos; o primeiro concluído, o segundo com um step em andamento."""
+        Mundo.objects.filter(aluno=self.aluno).delete()
+        for numero in (1, 2):
+            mundo = Mundo.objects.create(aluno=self.aluno, numero=numero, nome=f"Mês {numero}")
+            for ordem in range(1, steps_por_mundo + 1):
+                step = Step.objects.create(mundo=mundo, ordem=ordem, titulo=f"Step {ordem}", instrucoes="-")
+                if numero == 1:
+                    progresso = ProgressoAluno.objects.create(
+                        aluno=self.aluno, step=step, status=StatusProgresso.CONCLUIDO
+                    )
+                    Submissao.objects.create(progresso=progresso, resposta_texto="ok", aprovado=True)
+                elif ordem == 1:
+                    ProgressoAluno.objects.create(aluno=self.aluno, step=step, status=StatusProgresso.EM_ANDAMENTO)
+            Step.objects.create(mundo=mundo, ordem=99, titulo="Inativo", instrucoes="-", ativo=False)
+        return Mundo.objects.get(aluno=self.aluno, numero=2)
+
+    def contar_queries(self, usuario, url):
+        self.login_as(usuario)
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries)
+
+    def test_carregar_trilha_agrupa_steps_e_progresso(self):
+        self.montar_trilha(3)
+        with self.assertNumQueries(4):
+            trilha = carregar_trilha(self.aluno, com_submissoes=True)
+            passos = list(trilha.steps())
+
+        self.assertEqual([mundo.numero for mundo in trilha.mundos], [1, 2])
+        self.assertEqual(len(passos), 6)
+        self.assertTrue(all(step.ativo for _, step in passos))
+        mundo_1, primeiro = passos[0]
+        self.assertEqual(trilha.status(primeiro), StatusProgresso.CONCLUIDO)
+        self.assertTrue(trilha.ultima_submissao(primeiro).aprovado)
+        self.assertEqual(trilha.status(passos[4][1]), StatusProgresso.BLOQUEADO)
+        self.assertIsNone(trilha.ultima_submissao(passos[4][1]))
+
+    def test_views_da_trilha_nao_crescem_com_numero_de_steps(self):
+        rotas = [
+            (self.aluno, lambda mundo: reverse("trilha:home_trilha")),
+            (self.aluno, lambda mundo: reverse("trilha:detalhe_mes", args=[mundo.id])),
+            (self.aluno, lambda mundo: reverse("trilha:api_aluno_progresso")),
+            (self.monitor, lambda mundo: reverse("trilha:api_trilha_aluno", args=[self.aluno.id])),
+            (self.monitor, lambda mundo: reverse("trilha:api_monitor_aluno_detalhe", args=[self.aluno.id])),
+        ]
+        for usuario, url in rotas:
+            mundo = self.montar_trilha(2)
+            poucos = self.contar_queries(usuario, url(mundo))
+            mundo = self.montar_trilha(8)
+            muitos = self.contar_queries(usuario, url(mundo))
+            self.assertEqual(poucos, muitos, url(mundo))
+
+    def test_api_aluno_progresso_reflete_status_dos_steps(self):
+        self.montar_trilha(2)
+        self.login_as(self.aluno)
+        payload = self.client.get(reverse("trilha:api_aluno_progresso")).json()
+
+        self.assertEqual(payload["total_steps"], 4)
+        self.assertEqual(payload["steps_concluidos"], 2)
+        self.assertEqual(
+            [[step["status"] for step in mundo["steps"]] for mundo in payload["mundos"]],
+            [
+                [StatusProgresso.CONCLUIDO, StatusProgresso.CONCLUIDO],
+                [StatusProgresso.EM_ANDAMENTO, StatusProgresso.BLOQUEADO],
+            ],
+        )
+        self.assertEqual(payload["step_atual"]["mundo"], 2)
+
+
+class EtagApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com",
+            senha="123",
+            role=RoleChoices.ALUNO,
+            monitor_responsavel=self.monitor,
+        )
+        self.mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mês 1")
+        self.step_1 = Step.objects.create(mundo=self.mundo, ordem=1, titulo="Primeiro", instrucoes="-")
+        self.step_2 = Step.objects.create(mundo=self.mundo, ordem=2, titulo="Segundo", instrucoes="-")
+
+    def login_as(self, usuario):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+
+    def test_progresso_do_aluno_responde_304_ate_haver_mudanca(self):
+        self.login_as(self.aluno)
+        url = reverse("trilha:api_aluno_progresso")
+        primeira = self.client.get(url)
+        etag = primeira["ETag"]
+
+        with CaptureQueriesContext(connection) as contexto:
+            repetida = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.status_code, 304)
+        self.assertFalse(any("trilha_mundo" in query["sql"] for query in contexto.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProgressoAluno.objects.create(aluno=self.aluno, step=self.step_1, status=StatusProgresso.EM_ANDAMENTO)
+
+        atualizada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(atualizada.status_code, 200)
+        self.assertNotEqual(atualizada["ETag"], etag)
+        self.assertEqual(atualizada.json()["step_atual"]["id"], self.step_1.id)
+
+    def test_etag_antigo_nao_volta_a_valer_quando_o_cache_descarta_chaves(self):
+        self.login_as(self.aluno)
+        url = reverse("trilha:api_aluno_progresso")
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProgressoAluno.objects.create(aluno=self.aluno, step=self.step_1, status=StatusProgresso.EM_ANDAMENTO)
+        # Como um LocMem que descartou chaves ou outra instância: a versão não recomeça
+        cache.clear()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(VersaoEscopo.objects.get(escopo=f"aluno:{self.aluno.id}").versao, 2)
+
+    def test_escrita_no_cms_muda_etag_da_trilha(self):
+        self.login_as(self.monitor)
+        url = reverse("trilha:api_trilha_aluno", args=[self.aluno.id])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("trilha:api_reordenar_steps", args=[self.aluno.id]),
+                data=json.dumps({"mundo_id": self.mundo.id, "step_ids": [self.step_2.id, self.step_1.id]}),
+                content_type="application/json",
+            )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([step["id"] for step in response.json()["mundos"][0]["steps"]], [self.step_2.id, self.step_1.id])
+
+    def test_dashboard_em_cache_so_tem_etag_com_payload_atualizado(self):
+        self.login_as(self.monitor)
+        url = reverse("trilha:api_monitor_estatisticas")
+        self.assertFalse(self.client.get(url).has_header("ETag"))
+
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with mock.patch("apps.trilha.cache._executar_em_segundo_plano"):
+            with self.captureOnCommitCallbacks(execute=True):
+                NotaSaude.objects.create(aluno=self.aluno, nota=1)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sem_permissao_nao_recebe_304(self):
+        self.login_as(self.monitor)
+        url = reverse("trilha:api_monitor_aluno_detalhe", args=[self.aluno.id])
+        etag = self.client.get(url)["ETag"]
+
+        intruso = Usuario.objects.create(email="intruso@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.login_as(intruso)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+
+class FilaValidacaoApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(
+            email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR, nome="Monitor"
+        )
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+
+        semear_alunos(self.monitor, 40)
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        semear_alunos(outro, 6, prefixo="alheio")
+
+        # Metade das submissões com o mesmo data_envio para exercitar o desempate por id
+        self.pendentes = list(
+            Submissao.objects.filter(aprovado__isnull=True, progresso__aluno__monitor_responsavel=self.monitor)
+        )
+        base = timezone.now() - timedelta(days=1)
+        for indice, submissao in enumerate(self.pendentes):
+            Submissao.objects.filter(id=submissao.id).update(data_envio=base + timedelta(minutes=indice // 2))
+
+    def buscar(self, **params):
+        response = self.client.get(reverse("trilha:api_monitor_submissoes_pendentes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_percorre_a_fila_inteira_sem_repetir(self):
+        vistos = []
+        cursor = None
+        while True:
+            params = {"limite": 3}
+            if cursor:
+                params["cursor"] = cursor
+            pagina = self.buscar(**params)
+            self.assertEqual(pagina["total"], len(self.pendentes))
+            self.assertLessEqual(len(pagina["submissoes"]), 3)
+            vistos += [item["id"] for item in pagina["submissoes"]]
+            cursor = pagina["proximo_cursor"]
+            if not cursor:
+                break
+
+        esperado = list(
+            Submissao.objects.filter(id__in=[s.id for s in self.pendentes])
+            .order_by("data_envio", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(vistos, esperado)
+
+    def test_pagina_e_total_na_mesma_query(self):
+        with CaptureQueriesContext(connection) as contexto:
+            self.buscar(limite=5)
+        selects = [q["sql"] for q in contexto.captured_queries if "trilha_submissao" in q["sql"]]
+        self.assertEqual(len(selects), 1)
+
+    def test_filtros_por_step_mundo_e_tipo(self):
+        submissao = self.pendentes[0]
+        step = submissao.progresso.step
+
+        por_step = self.buscar(step=step.id)
+        self.assertEqual([item["id"] for item in por_step["submissoes"]], [submissao.id])
+        self.assertEqual(por_step["total"], 1)
+
+        por_mundo = self.buscar(mundo=step.mundo_id)
+        self.assertEqual(por_mundo["total"], 1)
+
+        self.assertEqual(self.buscar(tipo_validacao=TipoValidacao.TEXTO)["total"], len(self.pendentes))
+        vazio = self.buscar(tipo_validacao=TipoValidacao.FOTO)
+        self.assertEqual((vazio["submissoes"], vazio["total"], vazio["proximo_cursor"]), ([], 0, None))
+
+    def test_parametros_invalidos(self):
+        url = reverse("trilha:api_monitor_submissoes_pendentes")
+        self.assertEqual(self.client.get(url, {"cursor": "nao-e-cursor"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"limite": "muitos"}).status_code, 400)
+
+
+class ValidarLoteApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(
+            email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR, nome="Monitor"
+        )
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+
+        semear_alunos(self.monitor, 60)
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        semear_alunos(outro, 6, prefixo="alheio")
+        self.pendentes = list(
+            Submissao.objects.filter(aprovado__isnull=True, progresso__aluno__monitor_responsavel=self.monitor)
+            .order_by("id")
+        )
+        self.alheia = Submissao.objects.filter(aprovado__isnull=True, progresso__aluno__monitor_responsavel=outro).first()
+        self.validada = Submissao.objects.filter(aprovado=True).first()
+
+    def enviar(self, itens):
+        return self.client.post(
+            reverse("trilha:api_monitor_validar_lote"),
+            data=json.dumps({"submissoes": itens}),
+            content_type="application/json",
+        )
+
+    def test_resultados_por_item(self):
+        aprovar, reprovar, sem_feedback = self.pendentes[:3]
+        response = self.enviar([
+            {"id": aprovar.id, "aprovado": True},
+            {"id": reprovar.id, "aprovado": False, "feedback": "Foto ilegível"},
+            {"id": sem_feedback.id, "aprovado": False},
+            {"id": self.alheia.id, "aprovado": True},
+            {"id": self.validada.id, "aprovado": True},
+            {"id": 999999, "aprovado": True},
+            {"id": aprovar.id, "aprovado": False, "feedback": "repetida"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual((payload["validadas"], payload["falhas"]), (2, 5))
+        erros = [resultado.get("error") for resultado in payload["resultados"]]
+        self.assertEqual(erros, [
+            None,
+            None,
+            "Feedback é obrigatório para reprovação",
+            "Acesso negado a esta submissão",
+            "Submissão já foi validada",
+            "Submissão não encontrada",
+            "Submissão repetida no lote",
+        ])
+
+        aprovar.refresh_from_db()
+        reprovar.refresh_from_db()
+        self.assertEqual((aprovar.aprovado, aprovar.validado_por, aprovar.feedback), (True, self.monitor, ""))
+        self.assertEqual((reprovar.aprovado, reprovar.feedback), (False, "Foto ilegível"))
+        self.assertEqual(aprovar.progresso.status, StatusProgresso.CONCLUIDO)
+        self.assertIsNotNone(aprovar.progresso.data_conclusao)
+        self.assertEqual(reprovar.progresso.status, StatusProgresso.EM_ANDAMENTO)
+        self.assertIsNone(Submissao.objects.get(id=self.alheia.id).aprovado)
+        self.assertIsNone(Submissao.objects.get(id=sem_feedback.id).aprovado)
+
+        # Snapshot recalculado mesmo sem signals
+        self.assertEqual(AlunoSnapshot.objects.get(aluno_id=aprovar.progresso.aluno_id).submissoes_pendentes, 0)
+
+    def test_numero_de_queries_nao_cresce_com_o_lote(self):
+        contagens = []
+        for lote in (self.pendentes[:2], self.pendentes[2:12]):
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.enviar([{"id": s.id, "aprovado": True, "feedback": f"ok {s.id}"} for s in lote])
+            self.assertEqual(response.json()["validadas"], len(lote))
+            contagens.append(len(contexto.captured_queries))
+        self.assertEqual(contagens[0], contagens[1])
+        self.assertEqual(
+            set(Submissao.objects.filter(id__in=[s.id for s in self.pendentes[:12]]).values_list("feedback", flat=True)),
+            {f"ok {s.id}" for s in self.pendentes[:12]},
+        )
+
+    def test_corpo_invalido(self):
+        self.assertEqual(self.enviar([]).status_code, 400)
+        response = self.client.post(
+            reverse("trilha:api_monitor_validar_lote"), data="[]", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class VerificarInatividadeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+
+    def semear(self, quantidade, prefixo):
+        alunos = semear_alunos(self.monitor, quantidade, prefixo=prefixo)
+        # Metade dos alunos com submissões só de 20 dias atrás
+        antigos = [aluno.id for indice, aluno in enumerate(alunos) if indice % 2]
+        Submissao.objects.filter(progresso__aluno_id__in=antigos).update(data_envio=timezone.now() - timedelta(days=20))
+        return alunos
+
+    def esperados(self, limite, nota=1):
+        """Regra antiga, aluno a aluno."""
+        recentes = Submissao.objects.filter(data_envio__gte=limite).values_list("progresso__aluno_id", flat=True)
+        return {
+            aluno.id
+            for aluno in Usuario.objects.filter(role=RoleChoices.ALUNO, ativo=True).exclude(id__in=recentes)
+            if NotaSaude.get_nota_atual(aluno) != nota
+        }
+
+    def executar(self, *args):
+        saida = StringIO()
+        call_command("verificar_inatividade", *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_grava_notas_dos_inativos_em_lotes(self):
+        self.semear(30, "aluno")
+        esperados = self.esperados(timezone.now() - timedelta(days=7))
+        self.assertTrue(esperados)
+
+        saida = self.executar("--batch-size", "4")
+
+        criadas = NotaSaude.objects.filter(automatica=True)
+        self.assertEqual(set(criadas.values_list("aluno_id", flat=True)), esperados)
+        self.assertEqual(criadas.count(), len(esperados))
+        self.assertEqual(
+            set(AlunoSnapshot.objects.filter(aluno_id__in=esperados).values_list("nota_atual", flat=True)), {1}
+        )
+        self.assertIn(f"Atualizados {len(esperados)} alunos", saida)
+        self.assertIn("alunos/s", saida)
+
+        # Segunda execução não duplica notas
+        self.assertIn("Nenhum aluno inativo", self.executar())
+
+    def test_numero_de_queries_nao_cresce_com_os_alunos(self):
+        contagens = []
+        for quantidade, prefixo in ((10, "a"), (60, "b")):
+            self.semear(quantidade, prefixo)
+            NotaSaude.objects.filter(automatica=True).delete()
+            with CaptureQueriesContext(connection) as contexto:
+                self.executar("--batch-size", "5000")
+            contagens.append(len(contexto.captured_queries))
+        self.assertEqual(contagens[0], contagens[1])
+
+    def test_since_e_dry_run(self):
+        self.semear(12, "aluno")
+
+        for dias in (30, 7):
+            desde = timezone.localdate() - timedelta(days=dias)
+            limite = timezone.make_aware(datetime.combine(desde, datetime.min.time()))
+            saida = self.executar("--since", desde.isoformat(), "--dry-run", "-v", "2")
+            self.assertIn(f"[DRY-RUN] {len(self.esperados(limite))} alunos seriam atualizados", saida)
+
+        self.assertGreater(len(self.esperados(limite)), 1)
+        self.assertFalse(NotaSaude.objects.filter(automatica=True).exists())
+
+
+class IndicesConsultasTests(TestCase):
+    """Confere via EXPLAIN que as queries quentes da API usam os índices compostos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create(email="admin@mindhub.com", senha="123", role=RoleChoices.ADMIN)
+        cls.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        cls.alunos = semear_alunos(cls.monitor, 200)
+        semear_alunos(outro, 200, prefixo="alheio")
+        NotaSaude.objects.bulk_create(
+            [NotaSaude(aluno=aluno, nota=(dia % 5) + 1) for aluno in cls.alunos for dia in range(10)]
+        )
+        atualizar_estatisticas()
+
+    def setUp(self):
+        cache.clear()
+
+    def planos(self, usuario, url, tabela=None, metodo="get", **kwargs):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+        with CaptureQueriesContext(connection) as contexto:
+            response = getattr(self.client, metodo)(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return planos_das_queries(contexto.captured_queries, tabela)
+
+    def assertSemVarredura(self, planos, *tabelas):
+        for plano in planos:
+            for tabela in tabelas:
+                self.assertNotIn(tabela, plano.varreduras, f"{tabela} lida por inteiro:\n{plano.sql}\n{plano.texto}")
+
+    def indices(self, planos):
+        return set().union(*(plano.indices for plano in planos))
+
+    def test_fila_de_validacao(self):
+        url = reverse("trilha:api_monitor_submissoes_pendentes")
+
+        planos = self.planos(self.admin, url, "trilha_submissao")
+        self.assertSemVarredura(planos, "trilha_submissao")
+        self.assertIn("submissao_aprovado_envio_idx", self.indices(planos))
+        # A página sai na ordem do índice, sem ordenar a fila inteira
+        self.assertFalse(any(plano.ordena_em_memoria for plano in planos))
+
+        planos = self.planos(self.monitor, url, "trilha_submissao")
+        self.assertSemVarredura(planos, "trilha_submissao", "trilha_progressoaluno")
+
+    def test_detalhe_do_aluno(self):
+        aluno = self.alunos[5]
+        planos = self.planos(self.monitor, reverse("trilha:api_monitor_aluno_detalhe", args=[aluno.id]))
+
+        self.assertSemVarredura(planos, "trilha_notasaude", "trilha_progressoaluno", "trilha_submissao")
+        indices = self.indices(planos)
+        self.assertIn("notasaude_aluno_data_idx", indices)
+        self.assertIn("progresso_aluno_status_idx", indices)
+
+    def test_step_do_aluno(self):
+        aluno = self.alunos[5]
+        step_id = ProgressoAluno.objects.filter(aluno=aluno).values_list("step_id", flat=True).first()
+        planos = self.planos(aluno, reverse("trilha:api_aluno_step_detalhe", args=[step_id]), "trilha_submissao")
+
+        self.assertSemVarredura(planos, "trilha_submissao")
+        self.assertIn("submissao_progresso_envio_idx", self.indices(planos))
+
+    def test_login_por_email_sem_diferenciar_maiusculas(self):
+        planos = self.planos(
+            self.alunos[5],
+            reverse("usuarios:login_endpoint"),
+            "usuarios_usuario",
+            metodo="post",
+            data=json.dumps({"email": "  ALUNO5@MindHub.com ", "senha": "123"}),
+            content_type="application/json",
+        )
+
+        self.assertSemVarredura(planos, "usuarios_usuario")
+        self.assertIn("usuario_email_upper_idx", self.indices(planos))
+        self.assertEqual(self.client.session["usuario"], "aluno5@mindhub.com")
+
+
+@override_settings(ORCAMENTO_QUERIES="erro")
+class OrcamentoQueriesTests(TestCase):
+    """Cada view da trilha cabe no seu @orcamento_queries com uma base de alunos semeada."""
+
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.alunos = semear_alunos(self.monitor, 30)
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        semear_alunos(outro, 10, prefixo="alheio")
+        self.aluno = next(aluno for aluno in self.alunos if ProgressoAluno.objects.filter(aluno=aluno).exists())
+        self.aluno.telefone = "(11) 98888-0000"
+        self.aluno.save()
+        self.mundo = Mundo.objects.filter(aluno=self.aluno).first()
+        self.step = self.mundo.steps.first()
+
+    def chamar(self, usuario, nome, *args, metodo="get", dados=None, **kwargs):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+        if dados is not None:
+            kwargs.update(data=json.dumps(dados), content_type="application/json")
+        response = getattr(self.client, metodo)(reverse(f"trilha:{nome}", args=args), **kwargs)
+        self.assertLess(response.status_code, 500)
+        self.assertIn("Server-Timing", response)
+        return response
+
+    def test_paginas_e_apis_do_monitor(self):
+        for nome in (
+            "monitor_dashboard",
+            "monitor_graph",
+            "monitor_notificacoes",
+            "monitor_validar",
+            "monitor_lista_alunos",
+            "monitor_funil_progresso",
+            "api_monitor_alunos",
+            "api_monitor_submissoes_pendentes",
+            "api_monitor_estatisticas",
+        ):
+            self.chamar(self.monitor, nome)
+        for nome in ("gerenciar_trilha", "api_monitor_aluno_detalhe", "api_trilha_aluno"):
+            self.chamar(self.monitor, nome, self.aluno.id)
+
+    def test_paginas_e_apis_do_aluno(self):
+        for nome in ("aluno_mapa", "home_trilha", "api_aluno_progresso"):
+            self.chamar(self.aluno, nome)
+        self.chamar(self.aluno, "detalhe_mes", self.mundo.id)
+        self.chamar(self.aluno, "api_aluno_step_detalhe", self.step.id)
+
+    def test_acoes_do_monitor(self):
+        self.chamar(self.monitor, "api_monitor_atualizar_nota", self.aluno.id, metodo="post", dados={"nota": 4})
+        self.chamar(self.monitor, "api_monitor_enviar_alerta", self.aluno.id, metodo="post", dados={})
+        concluidos = ProgressoAluno.objects.filter(aluno=self.aluno, status=StatusProgresso.CONCLUIDO)
+        alvo = Step.objects.filter(mundo__aluno=self.aluno).exclude(id__in=concluidos.values("step_id")).first()
+        response = self.chamar(
+            self.monitor,
+            "api_monitor_forcar_avanco",
+            self.aluno.id,
+            metodo="post",
+            dados={"step_id": alvo.id, "motivo": "Conferido em reunião"},
+        )
+        self.assertEqual(response.status_code, 200)
+        pendente = Submissao.objects.filter(
+            aprovado__isnull=True, progresso__aluno__monitor_responsavel=self.monitor
+        ).first()
+        self.chamar(
+            self.monitor, "api_monitor_validar_submissao", pendente.id, metodo="post", dados={"aprovado": True}
+        )
+
+    def test_aluno_submete_step(self):
+        progresso = ProgressoAluno.objects.filter(aluno=self.aluno).first()
+        progresso.status = StatusProgresso.EM_ANDAMENTO
+        progresso.save()
+        self.chamar(
+            self.aluno,
+            "api_aluno_submeter",
+            metodo="post",
+            data={"step_id": progresso.step_id, "resposta_texto": "Feito"},
+        )
+
+    def test_edicao_da_trilha(self):
+        aluno_id = self.aluno.id
+        self.chamar(self.monitor, "api_salvar_mundo", aluno_id, metodo="post", dados={"nome": "Extra"})
+        self.chamar(
+            self.monitor,
+            "api_salvar_step",
+            aluno_id,
+            metodo="post",
+            dados={"mundo_id": self.mundo.id, "titulo": "Novo", "instrucoes": "-"},
+        )
+        self.chamar(self.monitor, "api_deletar_step", aluno_id, self.step.id, metodo="delete")
+        self.chamar(self.monitor, "api_deletar_mundo", aluno_id, self.mundo.id, metodo="delete")
+
+        sem_trilha = semear_alunos_sem_trilha(self.monitor, 1)[0]
+        self.chamar(self.monitor, "api_criar_trilha_vazia", sem_trilha.id, metodo="post")
+
+
+class UsuarioLogadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = semear_alunos(self.monitor, 1)[0]
+        self.login_as(self.aluno)
+
+    def login_as(self, usuario):
+        session = self.client.session
+        session["usuario"] = usuario.email
+        session.save()
+
+    def buscas_por_email(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400)
+        return sum(
+            1 for query in contexto.captured_queries
+            if 'FROM "usuarios_usuario"' in query["sql"] and '"usuarios_usuario"."email" =' in query["sql"]
+        )
+
+    def test_uma_busca_do_usuario_por_request(self):
+        # bloquear_inadimplente + aluno_required + view
+        self.assertEqual(self.buscas_por_email(reverse("trilha:home_trilha")), 1)
+        # etag_func + view
+        self.assertEqual(self.buscas_por_email(reverse("trilha:api_aluno_progresso")), 1)
+
+        self.login_as(self.monitor)
+        # bloquear_comercial + verificar_acesso_monitor
+        self.assertEqual(self.buscas_por_email(reverse("trilha:monitor_dashboard")), 1)
+
+    @override_settings(USUARIO_LOGADO_CACHE_TTL=30)
+    def test_cache_por_sessao(self):
+        url = reverse("trilha:api_aluno_progresso")
+        self.assertEqual(self.buscas_por_email(url), 1)
+        self.assertEqual(self.buscas_por_email(url), 0)
+
+        # Outro login na mesma sessão não reaproveita o usuário anterior
+        self.login_as(self.monitor)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.get(reverse("usuarios:logout"))
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    @override_settings(USUARIO_LOGADO_CACHE_TTL=30)
+    def test_salvar_o_usuario_descarta_o_cache(self):
+        url = reverse("trilha:api_aluno_progresso")
+        self.assertEqual(self.buscas_por_email(url), 1)
+
+        # Trocar o role vale no request seguinte, sem esperar o TTL
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aluno.role = RoleChoices.MONITOR
+            self.aluno.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        # A sessão com o e-mail antigo não acha mais o usuário
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aluno.role = RoleChoices.ALUNO
+            self.aluno.save()
+        self.assertEqual(self.buscas_por_email(url), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aluno.email = "novo.email@mindhub.com"
+            self.aluno.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ClonarTrilhaBaseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        for numero in (1, 2):
+            mundo = Mundo.objects.create(numero=numero, nome=f"Mês {numero}")
+            Step.objects.create(mundo=mundo, ordem=2, titulo=f"M{numero} segundo", instrucoes="-", pontos=20)
+            Step.objects.create(mundo=mundo, ordem=1, titulo=f"M{numero} primeiro", instrucoes="-")
+            Step.objects.create(mundo=mundo, ordem=3, titulo="Inativo", instrucoes="-", ativo=False)
+        self.alunos = semear_alunos_sem_trilha(self.monitor, 5)
+
+    def test_clona_em_lotes_com_progresso_inicial(self):
+        resultado = clonar_trilha_base([aluno.id for aluno in self.alunos], batch_size=2)
+
+        self.assertEqual(len(resultado.alunos_clonados), 5)
+        self.assertEqual((resultado.mundos_criados, resultado.steps_criados, resultado.progressos_criados), (10, 20, 5))
+        self.assertEqual(resultado.linhas_criadas, 35)
+        for aluno in self.alunos:
+            self.assertEqual(
+                list(Step.objects.filter(mundo__aluno=aluno).values_list("mundo__numero", "ordem", "titulo")),
+                [(1, 1, "M1 primeiro"), (1, 2, "M1 segundo"), (2, 1, "M2 primeiro"), (2, 2, "M2 segundo")],
+            )
+            progresso = ProgressoAluno.objects.get(aluno=aluno)
+            self.assertEqual((progresso.step.titulo, progresso.status), ("M1 primeiro", StatusProgresso.EM_ANDAMENTO))
+            self.assertEqual(AlunoSnapshot.objects.get(aluno=aluno).step_atual, progresso.step)
+
+    def test_queries_por_lote_nao_dependem_do_tamanho_da_turma(self):
+        with CaptureQueriesContext(connection) as pequena:
+            clonar_trilha_base([aluno.id for aluno in self.alunos[:1]])
+        with CaptureQueriesContext(connection) as grande:
+            clonar_trilha_base([aluno.id for aluno in self.alunos[1:]])
+        self.assertEqual(len(pequena.captured_queries), len(grande.captured_queries))
+
+    def test_ignora_quem_ja_tem_trilha(self):
+        Mundo.objects.create(aluno=self.alunos[0], numero=1, nome="Mês 1", ativo=False)
+        resultado = clonar_trilha_base([aluno.id for aluno in self.alunos] + [self.monitor.id])
+
+        self.assertEqual(resultado.alunos_ignorados, sorted([self.alunos[0].id, self.monitor.id]))
+        self.assertEqual(Mundo.objects.filter(aluno=self.alunos[0]).count(), 1)
+
+    def test_comando_clona_alunos_do_monitor(self):
+        saida = StringIO()
+        call_command("clonar_trilha_base", "--monitor", self.monitor.email, stdout=saida)
+
+        self.assertIn("5 alunos clonados", saida.getvalue())
+        self.assertIn("linhas/s", saida.getvalue())
+        self.assertEqual(Mundo.objects.filter(aluno__in=self.alunos).count(), 10)
+
+    def test_api_clonar_usa_o_servico(self):
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+        url = reverse("trilha:api_clonar_trilha", args=[self.alunos[0].id])
+
+        response = self.client.post(url)
+        self.assertEqual(response.json()["mundos_criados"], 2)
+        self.assertEqual(response.json()["steps_criados"], 4)
+        self.assertTrue(ProgressoAluno.objects.filter(aluno=self.alunos[0]).exists())
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+
+class ChangesetTrilhaApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com",
+            senha="123",
+            role=RoleChoices.ALUNO,
+            monitor_responsavel=self.monitor,
+        )
+        self.mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mês 1")
+        self.steps = [
+            Step.objects.create(mundo=self.mundo, ordem=ordem, titulo=f"Step {ordem}", instrucoes="-")
+            for ordem in range(1, 61)
+        ]
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+
+    def enviar(self, changeset):
+        return self.client.post(
+            reverse("trilha:api_aplicar_changeset", args=[self.aluno.id]),
+            data=json.dumps(changeset),
+            content_type="application/json",
+        )
+
+    def test_aplica_changeset_completo(self):
+        ids_invertidos = [step.id for step in reversed(self.steps[2:])]
+        response = self.enviar({
+            "mundos": {
+                "criar": [{"ref": "novo", "nome": "Mês 2"}],
+                "atualizar": [{"id": self.mundo.id, "objetivo": "Organizar a casa"}],
+            },
+            "steps": {
+                "criar": [
+                    {"ref": "a", "mundo_ref": "novo", "titulo": "Abertura", "tipo_validacao": TipoValidacao.TEXTO},
+                    {"ref": "b", "mundo_ref": "novo", "titulo": "Fechamento"},
+                ],
+                "atualizar": [{"id": self.steps[2].id, "titulo": "Renomeado", "pontos": 50}],
+                "deletar": [self.steps[0].id, self.steps[1].id],
+            },
+            "ordem": [
+                {"mundo_id": self.mundo.id, "step_ids": ids_invertidos},
+                {"mundo_ref": "novo", "step_ids": ["b", "a"]},
+            ],
+        })
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload["totais"]["steps_criados"], 2)
+        self.assertEqual(payload["totais"]["steps_deletados"], 2)
+
+        novo = Mundo.objects.get(id=payload["mundos_criados"]["novo"])
+        self.assertEqual((novo.numero, novo.aluno), (2, self.aluno))
+        self.assertEqual(list(novo.steps.order_by("ordem").values_list("titulo", flat=True)), ["Fechamento", "Abertura"])
+        self.mundo.refresh_from_db()
+        self.assertEqual(self.mundo.objetivo, "Organizar a casa")
+        ativos = list(self.mundo.steps.filter(ativo=True).order_by("ordem").values_list("id", flat=True))
+        self.assertEqual(ativos, ids_invertidos)
+        renomeado = Step.objects.get(id=self.steps[2].id)
+        self.assertEqual((renomeado.titulo, renomeado.pontos, renomeado.ordem), ("Renomeado", 50, 58))
+
+    def test_reordenar_sessenta_steps_em_poucas_queries(self):
+        ordem = [step.id for step in reversed(self.steps)]
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.enviar({"ordem": [{"mundo_id": self.mundo.id, "step_ids": ordem}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(contexto.captured_queries), 20)
+        self.assertEqual(list(self.mundo.steps.order_by("ordem").values_list("id", flat=True)), ordem)
+
+    def test_erro_desfaz_todo_o_changeset(self):
+        outro = Usuario.objects.create(email="outro@mindhub.com", senha="123", role=RoleChoices.ALUNO)
+        step_alheio = Step.objects.create(
+            mundo=Mundo.objects.create(aluno=outro, numero=1, nome="Mês 1"), ordem=1, titulo="Alheio", instrucoes="-"
+        )
+        response = self.enviar({
+            "steps": {"atualizar": [{"id": self.steps[0].id, "titulo": "Não salva"}], "deletar": [step_alheio.id]},
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Step.objects.get(id=self.steps[0].id).titulo, "Step 1")
+        self.assertTrue(Step.objects.get(id=step_alheio.id).ativo)
+
+    def test_reordenar_legado_usa_um_unico_update(self):
+        ordem = [step.id for step in reversed(self.steps)]
+        with CaptureQueriesContext(connection) as contexto:
+            self.client.post(
+                reverse("trilha:api_reordenar_steps", args=[self.aluno.id]),
+                data=json.dumps({"mundo_id": self.mundo.id, "step_ids": ordem}),
+                content_type="application/json",
+            )
+        updates = [q for q in contexto.captured_queries if q["sql"].startswith('UPDATE "trilha_step"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(list(self.mundo.steps.order_by("ordem").values_list("id", flat=True)), ordem)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="mindhub-uploads-"))
+class UploadEmPartesApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.aluno = Usuario.objects.create(email="aluno@mindhub.com", senha="123", role=RoleChoices.ALUNO)
+        mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mês 1")
+        self.step = Step.objects.create(mundo=mundo, ordem=1, titulo="Foto", instrucoes="-", tipo_validacao=TipoValidacao.FOTO)
+        self.progresso = ProgressoAluno.objects.create(aluno=self.aluno, step=self.step, status=StatusProgresso.EM_ANDAMENTO)
+        session = self.client.session
+        session["usuario"] = self.aluno.email
+        session.save()
+        self.conteudo = bytes(range(256)) * 40
+        patcher = mock.patch("apps.core.imagens._executar_em_segundo_plano", lambda funcao, *args: funcao(*args))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def iniciar(self, tamanho=None):
+        response = self.client.post(
+            reverse("trilha:api_aluno_upload_iniciar"),
+            data=json.dumps({"step_id": self.step.id, "nome_arquivo": "foto.jpg", "tamanho": tamanho or len(self.conteudo)}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["upload_id"]
+
+    def enviar_parte(self, upload_id, offset, dados):
+        return self.client.put(
+            reverse("trilha:api_aluno_upload_parte", args=[upload_id]) + f"?offset={offset}",
+            data=dados,
+            content_type="application/octet-stream",
+        )
+
+    def test_upload_retomado_e_finalizado(self):
+        upload_id = self.iniciar()
+        self.assertEqual(self.enviar_parte(upload_id, 0, self.conteudo[:4000]).json()["recebido"], 4000)
+
+        # Conexão caiu: o cliente reenviou do zero e recebe o offset correto
+        repetida = self.enviar_parte(upload_id, 0, self.conteudo[:4000])
+        self.assertEqual(repetida.status_code, 409)
+        self.assertEqual(repetida.json()["recebido"], 4000)
+        status = self.client.get(reverse("trilha:api_aluno_upload_status", args=[upload_id])).json()
+        self.assertEqual(status["recebido"], 4000)
+
+        incompleto = self.client.post(reverse("trilha:api_aluno_upload_finalizar", args=[upload_id]))
+        self.assertEqual(incompleto.status_code, 409)
+
+        self.assertEqual(self.enviar_parte(upload_id, 4000, self.conteudo[4000:]).json()["recebido"], len(self.conteudo))
+        upload = UploadSubmissao.objects.get(id=upload_id)
+        self.assertEqual(len(upload.partes), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("trilha:api_aluno_upload_finalizar", args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+
+        submissao = Submissao.objects.get(id=response.json()["submissao_id"])
+        with submissao.arquivo.open("rb") as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+        self.progresso.refresh_from_db()
+        self.assertEqual(self.progresso.status, StatusProgresso.PENDENTE_VALIDACAO)
+        self.assertFalse(any(default_storage.exists(nome) for nome in upload.partes))
+
+    def test_parte_que_perde_a_corrida_e_apagada(self):
+        upload_id = self.iniciar()
+
+        class ParteLenta(BytesIO):
+            # Enquanto esta parte é lida, outra requisição registra o mesmo offset
+            def read(self, *args):
+                UploadSubmissao.objects.filter(id=upload_id).update(recebido=10, partes=["uploads/outra"])
+                return super().read(*args)
+
+        with self.assertRaises(UploadInvalido) as erro:
+            anexar_parte(upload_id, 0, ParteLenta(self.conteudo[:4000]))
+        self.assertEqual(erro.exception.status, 409)
+        _, arquivos = default_storage.listdir(f"uploads/{upload_id}")
+        self.assertEqual(arquivos, [])
+        self.assertEqual(UploadSubmissao.objects.get(id=upload_id).partes, ["uploads/outra"])
+
+    def test_parte_alem_do_tamanho_declarado_e_recusada(self):
+        upload_id = self.iniciar(tamanho=100)
+        response = self.enviar_parte(upload_id, 0, b"x" * 101)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(UploadSubmissao.objects.get(id=upload_id).recebido, 0)
+
+    def test_upload_de_outro_aluno_nao_e_acessivel(self):
+        upload_id = self.iniciar()
+        intruso = Usuario.objects.create(email="intruso@mindhub.com", senha="123", role=RoleChoices.ALUNO)
+        session = self.client.session
+        session["usuario"] = intruso.email
+        session.save()
+        self.assertEqual(self.enviar_parte(upload_id, 0, b"abc").status_code, 404)
+
+
+def imagem_png(largura=2000, altura=1000):
+    buffer = BytesIO()
+    Image.new("RGB", (largura, altura), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="mindhub-variantes-"))
+class VariantesImagemTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.monitor = Usuario.objects.create(email="monitor@mindhub.com", senha="123", role=RoleChoices.MONITOR)
+        self.aluno = Usuario.objects.create(
+            email="aluno@mindhub.com", senha="123", role=RoleChoices.ALUNO, monitor_responsavel=self.monitor
+        )
+        mundo = Mundo.objects.create(aluno=self.aluno, numero=1, nome="Mês 1")
+        step = Step.objects.create(mundo=mundo, ordem=1, titulo="Foto", instrucoes="-")
+        self.progresso = ProgressoAluno.objects.create(
+            aluno=self.aluno, step=step, status=StatusProgresso.PENDENTE_VALIDACAO
+        )
+        patcher = mock.patch("apps.core.imagens._executar_em_segundo_plano", lambda funcao, *args: funcao(*args))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_upload_gera_variantes_e_api_devolve_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            submissao = Submissao.objects.create(
+                progresso=self.progresso, arquivo=SimpleUploadedFile("prova.png", imagem_png())
+            )
+        submissao.refresh_from_db()
+
+        variantes = submissao.arquivo_variantes
+        self.assertEqual(variantes["original"], submissao.arquivo.name)
+        self.assertTrue(variantes["thumb"].endswith(".thumb.webp"))
+        with default_storage.open(variantes["thumb"]) as arquivo:
+            self.assertEqual(Image.open(arquivo).size, (320, 160))
+        with default_storage.open(variantes["medio"]) as arquivo:
+            self.assertEqual(Image.open(arquivo).format, "WEBP")
+
+        session = self.client.session
+        session["usuario"] = self.monitor.email
+        session.save()
+        item = self.client.get(reverse("trilha:api_monitor_submissoes_pendentes")).json()["submissoes"][0]
+        self.assertEqual(item["arquivo"], submissao.arquivo.url)
+        self.assertEqual(item["arquivo_thumb"], default_storage.url(variantes["thumb"]))
+        self.assertEqual(item["arquivo_medio"], default_storage.url(variantes["medio"]))
+
+    def test_variantes_prontas_invalidam_o_cache_do_aluno(self):
+        # As variantes são gravadas com update(), sem signals: a invalidação é explícita
+        with mock.patch("apps.trilha.cache.invalidar_alunos") as invalidar:
+            with self.captureOnCommitCallbacks(execute=True):
+                Submissao.objects.create(progresso=self.progresso, arquivo=SimpleUploadedFile("prova.png", imagem_png()))
+        self.assertEqual(list(invalidar.call_args.args[0]), [self.aluno.id])
+
+    def test_imagem_grande_demais_fica_sem_variantes(self):
+        nome = default_storage.save("submissoes/enorme.png", BytesIO(imagem_png()))
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            self.assertEqual(gerar_variantes(nome), {"original": nome})
+
+    def test_sem_variante_a_url_cai_para_o_original(self):
+        submissao = Submissao.objects.bulk_create(
+            [Submissao(progresso=self.progresso, arquivo=default_storage.save("submissoes/doc.pdf", BytesIO(b"%PDF")))]
+        )[0]
+        self.assertEqual(submissao.arquivo_thumb_url, submissao.arquivo.url)
+        self.assertEqual(gerar_variantes(submissao.arquivo.name), {"original": submissao.arquivo.name})
+
+    def test_comando_gera_variantes_de_arquivos_existentes(self):
+        nome = default_storage.save("submissoes/2024/01/antiga.png", BytesIO(imagem_png(900, 900)))
+        submissao = Submissao.objects.bulk_create([Submissao(progresso=self.progresso, arquivo=nome)])[0]
+        foto = default_storage.save("fotos_usuarios/perfil.png", BytesIO(imagem_png(600, 600)))
+        Usuario.objects.filter(id=self.aluno.id).update(foto=foto)
+
+        call_command("gerar_variantes_imagens", "--workers", "1", stdout=StringIO())
+
+        submissao.refresh_from_db()
+        self.aluno.refresh_from_db()
+        self.assertEqual(submissao.arquivo_variantes["original"], nome)
+        self.assertTrue(default_storage.exists(submissao.arquivo_variantes["medio"]))
+        self.assertEqual(self.aluno.foto_thumb_url, default_storage.url(self.aluno.foto_variantes["thumb"]))
@@ -0,0 +1,181 @@
+"""
+Upload resumível em partes das fotos de submissão - Mindhub OS.
+
+Fluxo: iniciar → anexar partes (cada uma vira um objeto no storage) → finalizar
+(concatena as partes no arquivo da Submissao e envia o step para validação).
+Nenhuma etapa carrega o arquivo inteiro em memória.
+"""
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import StatusProgresso, Submissao, UploadSubmissao
+
+
+TAMANHO_MAXIMO_ARQUIVO = 25 * 1024 * 1024
+TAMANHO_MAXIMO_PARTE = 5 * 1024 * 1024  # abaixo do limite de request do Cloud Run
+EXTENSOES_PERMITIDAS = {'.jpg', '.jpeg', '.png', '.heic', '.heif', '.webp', '.pdf'}
+
+
+class UploadInvalido(Exception):
+    """Erro de upload com o status HTTP sugerido em `status`."""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class _ParteRecebida(File):
+    """Lê o corpo do request em blocos, contando bytes e barrando partes grandes demais."""
+
+    def __init__(self, stream, limite):
+        super().__init__(stream, name='parte')
+        self.limite = limite
+        self.lidos = 0
+
+    def chunks(self, chunk_size=None):
+        while True:
+            dados = self.file.read(chunk_size or self.DEFAULT_CHUNK_SIZE)
+            if not dados:
+                break
+            self.lidos += len(dados)
+            if self.lidos > self.limite:
+                raise UploadInvalido('Parte maior que o permitido', status=413)
+            yield dados
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+
+class _PartesConcatenadas(File):
+    """Arquivo virtual que lê, em sequência, as partes gravadas no storage."""
+
+    def __init__(self, nomes, nome_final, tamanho):
+        super().__init__(None, name=nome_final)
+        self.nomes = nomes
+        self.size = tamanho
+
+    def chunks(self, chunk_size=None):
+        for nome in self.nomes:
+            with default_storage.open(nome, 'rb') as parte:
+                yield from parte.chunks(chunk_size)
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+    def open(self, mode=None):
+        return self
+
+    def close(self):
+        pass
+
+
+def iniciar_upload(progresso, nome_arquivo, tamanho_total):
+    """Cria a sessão de upload para um step FOTO em andamento."""
+    if progresso.step.tipo_validacao != 'FOTO':
+        raise UploadInvalido('Este step não recebe arquivos')
+    if progresso.status != StatusProgresso.EM_ANDAMENTO:
+        raise UploadInvalido('Este step não está em andamento')
+
+    nome_arquivo = os.path.basename(nome_arquivo or '').strip()
+    if os.path.splitext(nome_arquivo)[1].lower() not in EXTENSOES_PERMITIDAS:
+        raise UploadInvalido('Tipo de arquivo não permitido')
+    try:
+        tamanho_total = int(tamanho_total)
+    except (TypeError, ValueError):
+        raise UploadInvalido('tamanho é obrigatório')
+    if not 0 < tamanho_total <= TAMANHO_MAXIMO_ARQUIVO:
+        raise UploadInvalido('Arquivo vazio ou maior que o permitido', status=413)
+
+    return UploadSubmissao.objects.create(
+        progresso=progresso,
+        nome_arquivo=nome_arquivo,
+        tamanho_total=tamanho_total
+    )
+
+
+def _conferir_offset(upload, offset):
+    if upload.concluido:
+        raise UploadInvalido('Upload já finalizado', status=409)
+    if offset != upload.recebido:
+        raise UploadInvalido(f'Offset esperado: {upload.recebido}', status=409)
+
+
+def anexar_parte(upload_id, offset, stream):
+    """
+    Grava a próxima parte do upload direto no storage.
+    `offset` precisa ser igual ao total já recebido; em caso de conexão perdida o
+    cliente consulta o status e retoma a partir de `recebido`.
+
+    A leitura do request (que pode levar minutos num celular) acontece fora de
+    qualquer transação. Só o registro da parte trava a linha do upload e confere
+    o offset de novo: se outra parte chegou antes, esta é apagada do storage.
+    """
+    upload = UploadSubmissao.objects.get(id=upload_id)
+    _conferir_offset(upload, offset)
+
+    restante = upload.tamanho_total - upload.recebido
+    parte = _ParteRecebida(stream, limite=min(TAMANHO_MAXIMO_PARTE, restante))
+    # Nome único por tentativa: duas partes no mesmo offset não se sobrescrevem
+    nome = f'uploads/{upload.id}/{offset:012d}-{uuid.uuid4().hex[:8]}'
+    try:
+        nome = default_storage.save(nome, parte)
+    except UploadInvalido:
+        if default_storage.exists(nome):
+            default_storage.delete(nome)
+        raise
+
+    if parte.lidos == 0:
+        default_storage.delete(nome)
+        raise UploadInvalido('Parte vazia')
+
+    try:
+        with transaction.atomic():
+            upload = UploadSubmissao.objects.select_for_update().get(id=upload_id)
+            _conferir_offset(upload, offset)
+            upload.partes = upload.partes + [nome]
+            upload.recebido += parte.lidos
+            upload.save(update_fields=['partes', 'recebido', 'atualizado_em'])
+    except UploadInvalido:
+        default_storage.delete(nome)
+        raise
+    return upload
+
+
+@transaction.atomic
+def finalizar_upload(upload_id):
+    """Monta o arquivo final, cria a Submissao e envia o step para validação."""
+    upload = UploadSubmissao.objects.select_for_update().select_related('progresso__step').get(id=upload_id)
+    if upload.concluido:
+        raise UploadInvalido('Upload já finalizado', status=409)
+    if upload.recebido != upload.tamanho_total:
+        raise UploadInvalido(f'Upload incompleto: {upload.recebido}/{upload.tamanho_total} bytes', status=409)
+
+    progresso = upload.progresso
+    if progresso.status != StatusProgresso.EM_ANDAMENTO:
+        raise UploadInvalido('Este step não está em andamento')
+
+    submissao = Submissao(progresso=progresso)
+    submissao.arquivo.save(
+        upload.nome_arquivo,
+        _PartesConcatenadas(upload.partes, upload.nome_arquivo, upload.tamanho_total),
+        save=False
+    )
+    submissao.save()
+    progresso.enviar_para_validacao()
+
+    upload.submissao = submissao
+    upload.save(update_fields=['submissao', 'atualizado_em'])
+
+    partes = list(upload.partes)
+    transaction.on_commit(lambda: remover_partes(partes))
+    return submissao
+
+
+def remover_partes(nomes):
+    for nome in nomes:
+        if default_storage.exists(nome):
+            default_storage.delete(nome)
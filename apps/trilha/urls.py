@@ -29,18 +29,24 @@ urlpatterns = [
     path('api/monitor/aluno/<int:aluno_id>/forcar-avanco/', api.api_monitor_forcar_avanco, name='api_monitor_forcar_avanco'),
     path('api/monitor/submissoes-pendentes/', api.api_monitor_submissoes_pendentes, name='api_monitor_submissoes_pendentes'),
     path('api/monitor/submissao/<int:submissao_id>/validar/', api.api_monitor_validar_submissao, name='api_monitor_validar_submissao'),
+    path('api/monitor/submissoes/validar-lote/', api.api_monitor_validar_lote, name='api_monitor_validar_lote'),
     path('api/monitor/estatisticas/', api.api_monitor_estatisticas, name='api_monitor_estatisticas'),
     
     # API endpoints para Aluno
     path('api/aluno/progresso/', api.api_aluno_progresso, name='api_aluno_progresso'),
     path('api/aluno/step/<int:step_id>/', api.api_aluno_step_detalhe, name='api_aluno_step_detalhe'),
     path('api/aluno/submeter/', api.api_aluno_submeter, name='api_aluno_submeter'),
+    path('api/aluno/upload/', api.api_aluno_upload_iniciar, name='api_aluno_upload_iniciar'),
+    path('api/aluno/upload/<uuid:upload_id>/', api.api_aluno_upload_status, name='api_aluno_upload_status'),
+    path('api/aluno/upload/<uuid:upload_id>/parte/', api.api_aluno_upload_parte, name='api_aluno_upload_parte'),
+    path('api/aluno/upload/<uuid:upload_id>/finalizar/', api.api_aluno_upload_finalizar, name='api_aluno_upload_finalizar'),
     
     # API endpoints para Gerenciamento de Trilhas (CMS)
     path('api/trilha/<int:aluno_id>/', api.api_trilha_aluno, name='api_trilha_aluno'),
     path('api/trilha/<int:aluno_id>/mundo/', api.api_salvar_mundo, name='api_salvar_mundo'),
     path('api/trilha/<int:aluno_id>/step/', api.api_salvar_step, name='api_salvar_step'),
     path('api/trilha/<int:aluno_id>/reordenar/', api.api_reordenar_steps, name='api_reordenar_steps'),
+    path('api/trilha/<int:aluno_id>/changeset/', api.api_aplicar_changeset, name='api_aplicar_changeset'),
     path('api/trilha/<int:aluno_id>/step/<int:step_id>/', api.api_deletar_step, name='api_deletar_step'),
     path('api/trilha/<int:aluno_id>/mundo/<int:mundo_id>/', api.api_deletar_mundo, name='api_deletar_mundo'),
     path('api/trilha/<int:aluno_id>/clonar/', api.api_clonar_trilha_base, name='api_clonar_trilha'),
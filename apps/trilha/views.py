@@ -4,12 +4,13 @@ Views do app Trilha - Mindhub OS.
 import json
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db.models import Prefetch
 
+from apps.core.orcamento import orcamento_queries
 from apps.usuarios.models import Usuario, RoleChoices
 from apps.usuarios.utils import get_usuario_logado
 from .models import Mundo, Step, ProgressoAluno, StatusProgresso, NotaSaude, NotaSaude
 from .decorators import aluno_required
+from .services import alunos_com_snapshot, carregar_trilha
 from apps.financeiro.decorators import bloquear_inadimplente
 
 
@@ -24,19 +25,15 @@ def verificar_acesso_monitor(request):
 def bloquear_comercial(view_func):
     """Decorator para bloquear acesso de usuários COMERCIAL."""
     def wrapper(request, *args, **kwargs):
-        email = request.session.get('usuario')
-        if email:
-            try:
-                usuario = Usuario.objects.get(email=email)
-                if usuario.is_comercial:
-                    messages.error(request, 'Acesso Restrito: Você não tem permissão para acessar esta página.')
-                    return redirect('usuarios:gerenciar_acessos')
-            except Usuario.DoesNotExist:
-                pass
+        usuario = get_usuario_logado(request)
+        if usuario and usuario.is_comercial:
+            messages.error(request, 'Acesso Restrito: Você não tem permissão para acessar esta página.')
+            return redirect('usuarios:gerenciar_acessos')
         return view_func(request, *args, **kwargs)
     return wrapper
 
 
+@orcamento_queries(4)
 @bloquear_comercial
 def monitor_dashboard(request):
     """
@@ -53,6 +50,7 @@ def monitor_dashboard(request):
     })
 
 
+@orcamento_queries(4)
 @bloquear_comercial
 def monitor_graph(request):
     """
@@ -69,6 +67,7 @@ def monitor_graph(request):
     })
 
 
+@orcamento_queries(6)
 @bloquear_comercial
 def monitor_validar(request):
     return redirect('trilha:monitor_notificacoes')
@@ -78,6 +77,7 @@ def monitor_validar(request):
 # ÁREA DO ALUNO - NAVEGAÇÃO DOIS NÍVEIS
 # ========================================
 
+@orcamento_queries(4)
 @bloquear_inadimplente
 @aluno_required
 def aluno_mapa(request):
@@ -85,6 +85,7 @@ def aluno_mapa(request):
     return redirect('trilha:home_trilha')
 
 
+@orcamento_queries(8)
 @bloquear_inadimplente
 @aluno_required
 def home_trilha(request):
@@ -95,37 +96,27 @@ def home_trilha(request):
     """
     aluno = request.usuario
     
-    # Otimização de Query (Prefetch steps filtrados)
-    steps_prefetch = Prefetch(
-        'steps', 
-        queryset=Step.objects.filter(ativo=True).order_by('ordem')
-    )
-    meses = Mundo.objects.filter(aluno=aluno, ativo=True)\
-        .prefetch_related(steps_prefetch)\
-        .order_by('numero')
+    # Mundos, steps ativos e progresso em lote (3 queries)
+    trilha = carregar_trilha(aluno)
     
     # Prepara dados dos meses com status
     meses_data = []
     mes_atual = None
     
-    for mes in meses:
-        # Usa .all() para aproveitar o prefetch
-        steps = mes.steps.all()
+    for mes in trilha.mundos:
+        steps = mes.steps_ativos
         total_steps = len(steps)
         
         # Conta steps concluídos
         concluidos = 0
         tem_em_andamento = False
         
-        # Otimização: Buscar progressos em lote seria ideal, mas complexo aqui.
-        # Mantendo loop simples por enquanto, mas steps já estão na memória.
         for step in steps:
-            progresso = ProgressoAluno.objects.filter(aluno=aluno, step=step).first()
-            if progresso:
-                if progresso.status == StatusProgresso.CONCLUIDO:
-                    concluidos += 1
-                elif progresso.status in [StatusProgresso.EM_ANDAMENTO, StatusProgresso.PENDENTE_VALIDACAO]:
-                    tem_em_andamento = True
+            status_step = trilha.status(step)
+            if status_step == StatusProgresso.CONCLUIDO:
+                concluidos += 1
+            elif status_step in [StatusProgresso.EM_ANDAMENTO, StatusProgresso.PENDENTE_VALIDACAO]:
+                tem_em_andamento = True
         
         # Determina status do mês
         if concluidos == total_steps and total_steps > 0:
@@ -160,6 +151,7 @@ def home_trilha(request):
     })
 
 
+@orcamento_queries(14)
 @bloquear_inadimplente
 @aluno_required
 def detalhe_mes(request, mes_id):
@@ -169,16 +161,13 @@ def detalhe_mes(request, mes_id):
     """
     aluno = request.usuario
     
-    try:
-        mes = Mundo.objects.get(id=mes_id, aluno=aluno, ativo=True)
-    except Mundo.DoesNotExist:
+    trilha = carregar_trilha(aluno, mundo_id=mes_id)
+    if not trilha.mundos:
         return redirect('trilha:home_trilha')
-    
-    # Busca steps do mês
-    steps = mes.steps.filter(ativo=True).order_by('ordem')
+    mes = trilha.mundos[0]
 
     # Auto-Repair: Se não tem nenhum step (trilha criada vazia antes do fix), cria um padrão
-    if not steps.exists():
+    if not mes.steps_ativos:
         Step.objects.create(
             mundo=mes,
             ordem=1,
@@ -189,19 +178,18 @@ def detalhe_mes(request, mes_id):
             pontos=10
         )
         # Recarrega steps
-        steps = mes.steps.filter(ativo=True).order_by('ordem')
+        trilha = carregar_trilha(aluno, mundo_id=mes_id)
+        mes = trilha.mundos[0]
     
     # Prepara dados dos steps com status
+    steps_por_id = {step.id: step for step in mes.steps_ativos}
     steps_data = []
-    for step in steps:
-        progresso = ProgressoAluno.objects.filter(aluno=aluno, step=step).first()
-        status = progresso.status if progresso else StatusProgresso.BLOQUEADO
-        
+    for step in mes.steps_ativos:
         steps_data.append({
             'id': step.id,
             'ordem': step.ordem,
             'titulo': step.titulo,
-            'status': status,
+            'status': trilha.status(step),
             'pontos': step.pontos,
         })
     
@@ -210,10 +198,9 @@ def detalhe_mes(request, mes_id):
         for s in steps_data:
             if s['status'] == StatusProgresso.BLOQUEADO:
                 # Inicializa o progresso
-                step_obj = Step.objects.get(id=s['id'])
                 progresso, _ = ProgressoAluno.objects.get_or_create(
                     aluno=aluno,
-                    step=step_obj,
+                    step=steps_por_id[s['id']],
                     defaults={'status': StatusProgresso.EM_ANDAMENTO}
                 )
                 if progresso.status == StatusProgresso.BLOQUEADO:
@@ -240,6 +227,7 @@ def detalhe_mes(request, mes_id):
 # CMS - GERENCIAMENTO DE TRILHAS
 # ========================================
 
+@orcamento_queries(5)
 @bloquear_comercial
 def gerenciar_trilha(request, aluno_id):
     """
@@ -267,6 +255,7 @@ def gerenciar_trilha(request, aluno_id):
     })
 
 
+@orcamento_queries(4)
 @bloquear_comercial
 def monitor_lista_alunos(request):
     """
@@ -282,6 +271,7 @@ def monitor_lista_alunos(request):
     })
 
 
+@orcamento_queries(5)
 @bloquear_comercial
 def monitor_funil_progresso(request):
     """
@@ -300,22 +290,20 @@ def monitor_funil_progresso(request):
         
     alunos_data = []
     
-    for aluno in alunos_qs:
-        mundo_atual = aluno.get_mundo_atual()
-        step_atual = aluno.get_step_atual()
-        nota_atual = NotaSaude.get_nota_atual(aluno)
+    # Mundo, step, nota e andamento vêm do AlunoSnapshot (uma única leitura)
+    for aluno in alunos_com_snapshot(alunos_qs):
+        snapshot = aluno.snapshot
+        mundo_atual = snapshot.mundo_atual
+        step_atual = snapshot.step_atual
+        nota_atual = snapshot.nota_atual
         
         # Progresso no mundo atual
         porcentagem = 0
         progresso_texto = "N/A"
         if mundo_atual:
-            total_steps = mundo_atual.steps.count()
+            total_steps = snapshot.mundo_total_steps
             if total_steps > 0:
-                steps_concluidos = ProgressoAluno.objects.filter(
-                    aluno=aluno,
-                    step__mundo=mundo_atual,
-                    status=StatusProgresso.CONCLUIDO
-                ).count()
+                steps_concluidos = snapshot.mundo_steps_concluidos
                 porcentagem = round((steps_concluidos / total_steps) * 100)
                 
                 # Exemplo: Step 2 de 4
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_usuario_pode_aprovar_financeiro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='foto_variantes',
+            field=models.JSONField(blank=True, default=dict, help_text='Variantes WebP geradas da foto: {original, thumb, medio}'),
+        ),
+    ]
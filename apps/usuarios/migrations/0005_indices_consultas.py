@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_usuario_foto_variantes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='usuario_email_upper_idx'),
+        ),
+    ]
@@ -2,8 +2,11 @@
 Models do app Usuarios - Mindhub OS.
 """
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.hashers import make_password, check_password
 
+from apps.core.imagens import url_variante
+
 
 class RoleChoices(models.TextChoices):
     """Tipos de usuário no sistema."""
@@ -32,6 +35,11 @@ class Usuario(models.Model):
         blank=True,
         help_text="Foto de perfil do usuário"
     )
+    foto_variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Variantes WebP geradas da foto: {original, thumb, medio}"
+    )
     telefone = models.CharField(max_length=20, blank=True, help_text="WhatsApp para alertas")
     monitor_responsavel = models.ForeignKey(
         'self',
@@ -49,9 +57,18 @@ class Usuario(models.Model):
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
+        indexes = [
+            # Login por e-mail sem diferenciar maiúsculas (ver buscar_por_email)
+            models.Index(Upper('email'), name='usuario_email_upper_idx'),
+        ]
     
     def __str__(self):
         return f"{self.email} ({self.role})"
+    
+    @property
+    def foto_thumb_url(self):
+        """Miniatura WebP da foto (ou a original, enquanto a variante não existe)."""
+        return url_variante(self.foto, self.foto_variantes, 'thumb')
         
     @property
     def telefone_sem_formatacao(self):
@@ -0,0 +1,48 @@
+"""
+Signals do app Usuarios - geram as variantes WebP da foto de perfil, guardam os
+valores anteriores dos campos de acesso e descartam o usuário do cache de sessão.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.core.imagens import agendar_variantes
+from .models import Usuario
+from .utils import chave_cache_usuario
+
+# Campos que mudam quem o usuário é para o sistema: login, permissões e carteira do monitor
+CAMPOS_ACESSO = ('email', 'role', 'ativo', 'monitor_responsavel_id')
+
+
+@receiver(pre_save, sender=Usuario)
+def guardar_valores_anteriores(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Deixa em `instance.valores_anteriores` os CAMPOS_ACESSO como estão no banco
+    (None para usuário novo), para os receivers de post_save compararem.
+    Um save com update_fields sem nenhum desses campos não consulta o banco.
+    """
+    if raw or instance.pk is None:
+        instance.valores_anteriores = None
+        return
+    if update_fields is not None and not {*CAMPOS_ACESSO, 'monitor_responsavel'} & set(update_fields):
+        instance.valores_anteriores = {campo: getattr(instance, campo) for campo in CAMPOS_ACESSO}
+        return
+    instance.valores_anteriores = Usuario.objects.filter(pk=instance.pk).values(*CAMPOS_ACESSO).first()
+
+
+@receiver(post_save, sender=Usuario)
+def gerar_variantes_da_foto(sender, instance, **kwargs):
+    agendar_variantes(instance, 'foto', 'foto_variantes')
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def esquecer_usuario_no_cache(sender, instance, **kwargs):
+    # Desativar, trocar role ou e-mail vale no próximo request, não só depois do TTL
+    if not getattr(settings, 'USUARIO_LOGADO_CACHE_TTL', 0):
+        return
+    anteriores = getattr(instance, 'valores_anteriores', None) or {}
+    chaves = {chave_cache_usuario(email) for email in (instance.email, anteriores.get('email')) if email}
+    transaction.on_commit(lambda: cache.delete_many(chaves))
@@ -1,17 +1,61 @@
 """
 Utilitários para o app de Usuários.
 """
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Value
+from django.db.models.functions import Upper
+
 from .models import Usuario
 
+
+def buscar_por_email(email):
+    """
+    Busca o usuário pelo e-mail sem diferenciar maiúsculas (levanta DoesNotExist).
+    Compara UPPER(email), a expressão do índice usuario_email_upper_idx: o
+    email__iexact vira LIKE no SQLite e não usaria índice nenhum.
+    """
+    return Usuario.objects.alias(email_upper=Upper('email')).get(email_upper=Upper(Value(email.strip())))
+
+
+def chave_cache_usuario(email):
+    return f'usuarios:logado:{email}'
+
+
 def get_usuario_logado(request):
     """
     Retorna o usuário logado na sessão ou None.
     Substitui lógica repetida em views.
+
+    O resultado fica guardado no request: decorators, helpers e a view que
+    perguntam pelo usuário no mesmo request fazem no máximo uma query.
+    Com USUARIO_LOGADO_CACHE_TTL > 0 ele também é guardado no cache, pelo
+    e-mail, durante esse número de segundos; salvar ou excluir o Usuario
+    descarta a cópia (signals do app), então role e ativo valem na hora.
     """
     email = request.session.get('usuario')
     if not email:
         return None
-    try:
-        return Usuario.objects.get(email=email)
-    except Usuario.DoesNotExist:
-        return None
+
+    guardado = getattr(request, '_usuario_logado', None)
+    if guardado is not None and guardado[0] == email:
+        return guardado[1]
+
+    ttl = getattr(settings, 'USUARIO_LOGADO_CACHE_TTL', 0)
+    usuario = cache.get(chave_cache_usuario(email)) if ttl else None
+
+    if usuario is None:
+        usuario = Usuario.objects.filter(email=email).first()
+        if usuario is not None and ttl:
+            cache.set(chave_cache_usuario(email), usuario, ttl)
+
+    request._usuario_logado = (email, usuario)
+    return usuario
+
+
+def esquecer_usuario_logado(request):
+    """Descarta o usuário guardado (login, logout ou troca de dados do próprio usuário)."""
+    request._usuario_logado = None
+    email = request.session.get('usuario')
+    if email:
+        cache.delete(chave_cache_usuario(email))
@@ -12,7 +12,7 @@ import secrets
 import string
 
 from .models import Usuario, RoleChoices
-from .utils import get_usuario_logado
+from .utils import buscar_por_email, esquecer_usuario_logado, get_usuario_logado
 
 def landing_page(request):
     """
@@ -62,7 +62,7 @@ def login_endpoint(request):
             }, status=401)
         
         try:
-            usuario = Usuario.objects.get(email__iexact=email.strip())
+            usuario = buscar_por_email(email)
             if usuario.verificar_senha(senha):
                 # Salva usuário na sessão (igual ao Flask)
                 request.session['usuario'] = usuario.email
@@ -90,6 +90,7 @@ def logout(request):
     Rota: /logout (Flask)
     Limpa sessão e redireciona para login
     """
+    esquecer_usuario_logado(request)
     request.session.pop('usuario', None)
     return redirect('usuarios:index')
 
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.OrcamentoQueriesMiddleware',  # queries por view x @orcamento_queries (dev/testes)
     'corsheaders.middleware.CorsMiddleware',  # CORS - equivalente ao Flask-CORS
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -135,6 +136,26 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_NAME = 'sessionid'
 SESSION_COOKIE_HTTPONLY = True
 
+# Cache em memória local (uma instância do Cloud Run) - usado pelas APIs do dashboard do Monitor
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mindhub-os',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Segundos que o Usuario da sessão fica no cache entre requests (0 = só dentro do request)
+USUARIO_LOGADO_CACHE_TTL = int(os.getenv('USUARIO_LOGADO_CACHE_TTL', '0'))
+
+# Broker do stream SSE do badge de notificações (comercial.eventos): "banco" funciona com
+# vários workers e instâncias; "memoria" só enxerga o próprio processo (runserver)
+NOTIFICACOES_BROKER = os.getenv('NOTIFICACOES_BROKER', 'memoria' if DEBUG else 'banco')
+
+# Orçamento de queries por view (apps.core.orcamento): "" desliga, "log" avisa, "erro" levanta exceção
+ORCAMENTO_QUERIES = os.getenv('ORCAMENTO_QUERIES', 'log' if DEBUG else '')
+
 # Security settings for production
 CSRF_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_SECURE = not DEBUG
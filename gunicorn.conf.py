@@ -0,0 +1,21 @@
+"""
+Configuração do Gunicorn em produção (Cloud Run).
+
+O Gunicorn lê este arquivo sozinho quando roda a partir da raiz do projeto, então
+o comando do Dockerfile continua `gunicorn --bind :$PORT config.wsgi:application`.
+
+Worker gthread: o stream SSE do badge de notificações (comercial.views) ocupa uma
+thread por aba de monitor aberta durante até DURACAO_MAXIMA_STREAM segundos; com o
+worker sync padrão uma única aba seguraria o worker inteiro. WEB_CONCURRENCY x
+GUNICORN_THREADS deve acompanhar o --concurrency do serviço no Cloud Run (80 por padrão).
+"""
+import os
+
+bind = f":{os.getenv('PORT', '8080')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '40'))
+# No gthread o timeout vigia o worker, não cada request: streams longos não o derrubam
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+accesslog = '-'